@@ -19,6 +19,7 @@ TON_WALLET = os.environ.get("TON_WALLET", "UQAYH3MHNSUABi73Z6HwIcuXkmws1tBDDN-lW
 
 # ============== FRAGMENT data =============
 FRAGMENT_API_HASH = os.environ.get("FRAGMENT_API_HASH", "38f80e92d2dbe5065b")
+FRAGMENT_REFRESH_INTERVAL = int(os.environ.get("FRAGMENT_REFRESH_INTERVAL", "600"))  # seconds between pool refreshes
 
 # ============== GUARD (standalone number checker — own cookies/session) =============
 GUARD_HASH = os.environ.get("GUARD_HASH", "38f80e92d2dbe5065b")
@@ -26,6 +27,11 @@ GUARD_STEL_SSID = os.environ.get("GUARD_STEL_SSID", "884240f6dbe482b02a_53082853
 GUARD_STEL_TOKEN = os.environ.get("GUARD_STEL_TOKEN", "")
 GUARD_STEL_TON_TOKEN = os.environ.get("GUARD_STEL_TON_TOKEN", "xxgsv9mztTU-BGBYhydE4mJHB3JCNmAJNMtQTxCzs-guGtXGEDyWX2_R34L3nM64DE4Iqq1Vpg8kFRezUhCLavT5aZzERq-qBzOAmeHQiO5nvarAeTbpjWXWSjn3jJL1JhHecWeOZJZtA_zNQgT8Za1VpqHxMh9Gh41mwbJGC7CTAr3q_wnU6zpF3r7CcHyCHuv3eMnb")
 GUARD_CACHE_TTL = int(os.environ.get("GUARD_CACHE_TTL", "300"))
+GUARD_CONCURRENCY = int(os.environ.get("GUARD_CONCURRENCY", "8"))  # parallel checks in guard_check_many
+
+# Opt-in near-cache for number:/rental:/user: hashes, kept coherent by Redis CLIENT TRACKING (Redis >= 6)
+NEAR_CACHE = os.environ.get("NEAR_CACHE", "false").lower() in ("1", "true", "yes")
+NEAR_CACHE_SIZE = int(os.environ.get("NEAR_CACHE_SIZE", "50000"))
 
 # ============== Other Configs =============
 D30_RATE = float(os.environ.get("D30_RATE", "80.0"))
@@ -1,6 +1,7 @@
 #(©) @Hybrid_Vamp - https://github.com/hybridvamp
 
 import sys
+import time
 import logging
 import asyncio
 
@@ -17,6 +18,7 @@ from datetime import datetime
 from logging.handlers import RotatingFileHandler
 
 from hybrid.plugins.temp import temp
+from hybrid.plugins.pool import LISTED, AVAILABLE, RENTED, UNAVAILABLE, RESTRICTED
 from hybrid.plugins.func import get_restart_data
 from hybrid.plugins.db import client as redis_client
 
@@ -69,112 +71,191 @@ def gen_4letters():
     import string
     return ''.join(random.choices(string.ascii_letters, k=4))
 
+async def _hydrate_pool_numbers(numbers):
+    """
+    Read Redis state for `numbers` in pipelined batches, create default records for unknown ones,
+    and return (rented, available, defaults_created, timings).
+    """
+    from hybrid.plugins.db import get_pool_state_bulk, save_number_infos_bulk
+    t0 = time.monotonic()
+    states = await get_pool_state_bulk(list(numbers))
+    t_read = time.monotonic()
+
+    missing = [num for num, (info, _) in states.items() if not info]
+    if missing:
+        created = await save_number_infos_bulk(missing, D30_RATE, D60_RATE, D90_RATE, available=True)
+        for num, info in created.items():
+            states[num] = (info, states[num][1])
+    t_write = time.monotonic()
+
+    rented, available = set(), set()
+    for num, (info, owner) in states.items():
+        if owner:
+            rented.add(num)
+        elif info and info.get("available", True):
+            available.add(num)
+    return rented, available, len(missing), (t_read - t0, t_write - t_read)
+
+
 async def load_num_data():
     """
-    Load numbers from Fragment at startup. Runs sync get_fragment_numbers() in a thread
-    so the event loop is not blocked, and we keep the same cookie/request behavior that
-    was working before (httpx async path can differ re cookies and may return empty).
+    Load numbers from Fragment at startup via the async fetch on the shared Fragment session
+    (no executor thread, no blocking sleeps). Redis state for the whole pool is then read/written
+    in pipelined batches (no per-number round-trips).
     """
     logging.info("🚀 [STARTUP] Loading numbers from Fragment API...")
-    from hybrid.plugins.fragment import get_fragment_numbers
-    loop = asyncio.get_event_loop()
+    from hybrid.plugins.fragment import get_fragment_numbers_async
+    t_start = time.monotonic()
     try:
-        NU_MS, stat = await loop.run_in_executor(None, lambda: get_fragment_numbers())
+        NU_MS, stat = await get_fragment_numbers_async()
     except Exception as e:
         logging.error("Failed to load numbers from Fragment API: %s", e, exc_info=True)
         return
     if not stat or stat.get("message") != "OK":
         logging.error("Failed to load numbers from Fragment API (stat: %s).", stat)
         return
-    temp.NUMBE_RS_SET = set(temp.NUMBE_RS)
-    for n in NU_MS:
-        if n not in temp.NUMBE_RS_SET:
-            temp.NUMBE_RS.append(n)
-            temp.NUMBE_RS_SET.add(n)
-    from hybrid.plugins.db import get_number_data, get_number_info, save_number_info
-    for num in temp.NUMBE_RS:
-        info = await get_number_info(num)
-        if not info:
-            await save_number_info(num, D30_RATE, D60_RATE, D90_RATE, available=True)
-            info = await get_number_info(num)
-        rented = await get_number_data(num)
-        if rented and rented.get("user_id"):
-            temp.RENTED_NUMS.add(num)
-        elif info and info.get("available", True):
-            temp.AVAILABLE_NUM.add(num)
-    logging.info("🚀 [STARTUP] Loaded %d numbers | %d available | %d rented", len(temp.NUMBE_RS), len(temp.AVAILABLE_NUM), len(temp.RENTED_NUMS))
+    numbers = temp.POOL.add(LISTED, NU_MS).members(LISTED)
+    t_fetch = time.monotonic()
+
+    rented, available, created, (t_read, t_write) = await _hydrate_pool_numbers(numbers)
+    t_fill = time.monotonic()
+    snap = temp.POOL.apply(add={RENTED: rented, AVAILABLE: available})
+    t_done = time.monotonic()
+
+    logging.info("🚀 [STARTUP] Loaded %d numbers | %d available | %d rented | %d defaults created", snap.count(LISTED), snap.count(AVAILABLE), snap.count(RENTED), created)
+    logging.info(
+        "🚀 [STARTUP] Pool hydration timings: fetch=%.0fms read=%.0fms write=%.0fms fill=%.0fms total=%.0fms",
+        (t_fetch - t_start) * 1000, t_read * 1000, t_write * 1000,
+        (t_done - t_fill) * 1000, (t_done - t_start) * 1000,
+    )
 
 
-from hybrid.plugins.db import get_number_data, get_remaining_rent_days, is_restricted_del_enabled, remove_number, remove_number_data, save_restricted_number, get_all_rentals, get_expired_numbers
+async def refresh_number_pool(client):
+    """
+    Background: re-fetch the Fragment number list every FRAGMENT_REFRESH_INTERVAL seconds (conditional
+    GET, so an unchanged page is a cheap 304) and apply only the diff against the listed pool.
+    Added numbers get Redis records + in-memory classification; removed ones leave pool:numbers and
+    the listing bitsets (an active rental keeps its RENTED bit until it expires).
+    """
+    from hybrid.plugins.fragment import get_fragment_numbers_async
+    from hybrid.plugins.db import remove_pool_numbers
+    while True:
+        await asyncio.sleep(FRAGMENT_REFRESH_INTERVAL)
+        try:
+            numbers, stat = await get_fragment_numbers_async()
+            if not stat or stat.get("message") != "OK" or stat.get("not_modified"):
+                continue
+            if not numbers:
+                # An empty page almost always means a broken session, not an empty account.
+                logging.warning("Pool refresh: Fragment returned no numbers; keeping current pool.")
+                continue
+            fetched = set(numbers)
+            snap = temp.POOL.snapshot()
+            added = [n for n in numbers if not snap.has(LISTED, n)]
+            removed = [n for n in snap.members(LISTED) if n not in fetched]
+            if not added and not removed:
+                continue
+            rented, available = set(), set()
+            if added:
+                rented, available, _, _ = await _hydrate_pool_numbers(added)
+            if removed:
+                await remove_pool_numbers(removed)
+            snap = temp.POOL.apply(
+                remove={LISTED: removed, AVAILABLE: removed, UNAVAILABLE: removed},
+                add={LISTED: added, RENTED: rented, AVAILABLE: available},
+            )
+            logging.info("Pool refresh: +%d / -%d numbers (pool now %d).", len(added), len(removed), snap.count(LISTED))
+        except Exception as e:
+            logging.error(f"refresh_number_pool error: {e}")
+
+
+from hybrid.plugins.db import get_number_data, get_remaining_rent_days, is_restricted_del_enabled, release_rental, save_restricted_number, get_expired_numbers
 from hybrid.plugins.func import get_current_datetime, check_number_conn, delete_account
 
+REMINDER_THRESHOLDS = [
+    (72 * 3600, "72h"),
+    (24 * 3600, "24h"),
+    (6 * 3600, "6h"),
+    (1 * 3600, "1h"),
+]
+# Upper bound on a scheduler sleep so rentals created mid-sleep (e.g. a fresh 1-day rental that is
+# already inside the 24h window) are still picked up promptly.
+REMINDER_MAX_SLEEP = 60
+
+
+def _send_reminder(client, number, label, doc):
+    from hybrid.plugins.func import format_remaining_time, t
+    from hybrid.plugins.db import mark_reminder_sent
+    from hybrid.plugins.outbox import outbox, PRIORITY_NOTICE
+    user_id = doc["user_id"]
+    remaining_str = format_remaining_time(doc.get("rent_date"), doc.get("hours", 0))
+    text = (t(user_id, "expire_soon")).format(
+        number=number,
+        remaining_days=remaining_str
+    )
+    keyboard = InlineKeyboardMarkup([[
+        InlineKeyboardButton(
+            t(user_id, "renew"),
+            callback_data=f"renew_{number}"
+        )
+    ]])
+
+    async def _sent():
+        try:
+            await mark_reminder_sent(number, label)
+            logging.info(f"Sent {label} reminder to {user_id} for {number}")
+        except Exception as e:
+            logging.error(f"Failed to mark {label} reminder for {number}: {e}")
+
+    # Queued, not awaited: a FloodWait keeps the reminder in the outbox (retried there) while the
+    # reminder loop moves on; the marker is written once the message is actually delivered.
+    outbox.post_message(client, user_id, text, priority=PRIORITY_NOTICE, reply_markup=keyboard, on_sent=_sent)
+
+
 async def schedule_reminders(client):
     """
     Send reminders at 72h, 24h, 6h, and 1h before expiry.
-    Runs every 15 minutes. Uses Redis to track which reminders have been sent.
+    Driven by the rentals:expiry zset: each pass only reads rentals whose expiry crossed a threshold
+    since the previous pass (per-threshold watermark), then sleeps until the next crossing.
+    Uses Redis markers (reminder:{number}:{label}) to track which reminders have been sent.
     """
-    from hybrid.plugins.func import format_remaining_time, t
-    REMINDER_THRESHOLDS = [
-        (72 * 3600, "72h"),
-        (24 * 3600, "24h"),
-        (6 * 3600, "6h"),
-        (1 * 3600, "1h"),
-    ]
+    from hybrid.plugins.db import get_rentals_expiring_between, get_next_expiry_after, get_sent_reminders, get_rental_doc
+    # On startup look back one legacy check interval so reminders due during a restart are not lost.
+    start = get_current_datetime().replace(tzinfo=timezone.utc).timestamp() - 15 * 60
+    watermarks = {label: start for _, label in REMINDER_THRESHOLDS}
     while True:
+        sleep_for = REMINDER_MAX_SLEEP
         try:
-            now = get_current_datetime().replace(tzinfo=timezone.utc)
-            rented = await get_all_rentals()
-            for doc in rented:
-                number = doc["number"]
-                user_id = doc["user_id"]
-                expiry = doc.get("expiry_date")
-                if not expiry:
-                    continue
-                if isinstance(expiry, str):
-                    expiry = datetime.fromisoformat(expiry.replace("Z", "+00:00"))
-                if expiry.tzinfo is None:
-                    expiry = expiry.replace(tzinfo=timezone.utc)
-                remaining_secs = (expiry - now).total_seconds()
-                if remaining_secs <= 0:
-                    continue
-                for threshold_secs, label in REMINDER_THRESHOLDS:
-                    # Only fire if within threshold window (threshold to threshold - 15min check interval)
-                    window = 15 * 60
-                    if threshold_secs >= remaining_secs > (threshold_secs - window):
-                        # Check if already sent this reminder
-                        redis_key = f"reminder:{number}:{label}"
-                        already_sent = await redis_client.get(redis_key)
-                        if already_sent:
-                            continue
-                        try:
-                            remaining_str = format_remaining_time(doc.get("rent_date"), doc.get("hours", 0))
-                            text = (t(user_id, "expire_soon")).format(
-                                number=number,
-                                remaining_days=remaining_str
-                            )
-                            keyboard = InlineKeyboardMarkup([[
-                                InlineKeyboardButton(
-                                    t(user_id, "renew"),
-                                    callback_data=f"renew_{number}"
-                                )
-                            ]])
-                            try:
-                                await client.send_message(user_id, text, reply_markup=keyboard)
-                                # Mark as sent with a 7-day TTL to prevent duplicate reminders across restarts
-                                await redis_client.set(redis_key, "1", ex=7 * 24 * 3600)
-                                logging.info(f"Sent {label} reminder to {user_id} for {number}")
-                            except FloodWait as e:
-                                await asyncio.sleep(e.value + 1)
-                                try:
-                                    await client.send_message(user_id, text, reply_markup=keyboard)
-                                    await redis_client.set(redis_key, "1", ex=7 * 24 * 3600)
-                                except Exception as e:
-                                    logging.debug(f"schedule_reminders send_message failed user_id={user_id} number={number} label={label}: {e}")
-                        except Exception as e:
-                            logging.error(f"Failed to send {label} reminder to {user_id} for {number}: {e}")
+            now_ts = get_current_datetime().replace(tzinfo=timezone.utc).timestamp()
+            due = []
+            for threshold_secs, label in REMINDER_THRESHOLDS:
+                # Crossed threshold since watermark: wm < expiry - T <= now, and not yet expired.
+                lo = max(watermarks[label] + threshold_secs, now_ts)
+                for number, _ in await get_rentals_expiring_between(lo, now_ts + threshold_secs):
+                    due.append((number, label))
+                watermarks[label] = now_ts
+            if due:
+                already_sent = await get_sent_reminders(due)
+
+                async def _remind(number, label):
+                    try:
+                        doc = await get_rental_doc(number)
+                        if not doc or not doc.get("user_id"):
+                            return
+                        _send_reminder(client, number, label, doc)
+                    except Exception as e:
+                        logging.error(f"Failed to send {label} reminder for {number}: {e}")
+
+                await asyncio.gather(*[_remind(n, l) for n, l in due if (n, l) not in already_sent])
+            # Sleep until the next rental crosses any threshold.
+            now_ts = get_current_datetime().replace(tzinfo=timezone.utc).timestamp()
+            for threshold_secs, _ in REMINDER_THRESHOLDS:
+                nxt = await get_next_expiry_after(now_ts + threshold_secs)
+                if nxt is not None:
+                    sleep_for = min(sleep_for, nxt - threshold_secs - now_ts)
         except Exception as e:
             logging.error(f"schedule_reminders error: {e}")
-        await asyncio.sleep(900)  # Run every 15 minutes
+        await asyncio.sleep(max(sleep_for, 0.5))
 
 # Limit concurrent delete_account calls so we don't overload Fragment/Telegram with many connections.
 EXPIRED_DELETE_SEMAPHORE = asyncio.Semaphore(3)
@@ -184,7 +265,7 @@ async def _process_one_expired(number: str, client, now):
     num_data = await get_number_data(number)
     user_id = num_data.get("user_id") if num_data else None
     if not user_id:
-        await remove_number_data(number)
+        await release_rental(number)
         return
     seven_day_pending = False
     try:
@@ -196,8 +277,7 @@ async def _process_one_expired(number: str, client, now):
                 logging.debug(f"_process_one_expired terminate_all_sessions_async failed number={number}: {e}")
             stat, reason = await delete_account(number, client)
         if stat:
-            await remove_number_data(number)
-            await remove_number(number, user_id)
+            await release_rental(number, user_id)
         if reason == "7Days":
             seven_day_pending = True
             from hybrid.plugins.db import save_7day_deletion
@@ -209,33 +289,25 @@ async def _process_one_expired(number: str, client, now):
     except Exception as e:
         logging.error(f"Error handling expired number {number}: {e}")
     finally:
-        async with temp.get_lock():
-            if number in temp.RENTED_NUMS:
-                temp.RENTED_NUMS.remove(number)
+        temp.POOL.discard(RENTED, [number])
         if not seven_day_pending:
             try:
                 from hybrid.plugins.guard import guard_is_free
                 is_free = await guard_is_free(number)
                 if is_free:
-                    async with temp.get_lock():
-                        if number not in temp.AVAILABLE_NUM:
-                            temp.AVAILABLE_NUM.add(number)
+                    temp.POOL.add(AVAILABLE, [number])
                     logging.info(f"Number {number} confirmed free on Fragment, relisted.")
                 else:
                     logging.info(f"Number {number} not yet free on Fragment, skipping relist.")
             except Exception as e:
                 logging.error(f"Fragment check failed for {number}: {e}")
-                async with temp.get_lock():
-                    if number not in temp.AVAILABLE_NUM:
-                        temp.AVAILABLE_NUM.add(number)
+                temp.POOL.add(AVAILABLE, [number])
         else:
             logging.info(f"Number {number} is in 7-day deletion period — skipping relist.")
         from hybrid.plugins.func import t
         text = (t(user_id, "expired_notify")).format(number=number)
-        try:
-            await client.send_message(user_id, text)
-        except Exception as e:
-            logging.error(f"Failed to notify user {user_id} about expired number {number}: {e}")
+        from hybrid.plugins.outbox import outbox
+        outbox.post_message(client, user_id, text)
 
 async def check_expired_numbers(client):
     """Background checker: remove expired numbers. Processes multiple expired numbers concurrently (semaphore-limited)."""
@@ -249,40 +321,32 @@ async def check_expired_numbers(client):
 
 async def _finalize_7day_deletion(number, client):
     """Full cleanup + notify + relist flow after a 7-day deletion is complete."""
-    from hybrid.plugins.db import get_user_by_number, remove_number_data, remove_number, remove_7day_deletion
+    from hybrid.plugins.db import get_user_by_number, release_rental, remove_7day_deletion
     user_id, _, _ = await get_user_by_number(number)
     if user_id:
-        await remove_number_data(number)
-        await remove_number(number, user_id)
+        await release_rental(number, user_id)
     await remove_7day_deletion(number)
     if user_id:
-        try:
-            await client.send_message(
-                user_id,
-                f"✅ The Telegram account linked to your number <b>{number}</b> has been permanently deleted.\n"
-                f"The number may now be available for re-rent.",
-                parse_mode=ParseMode.HTML,
-            )
-        except Exception as notify_err:
-            logging.error(f"Failed to notify user {user_id} after 7-day deletion of {number}: {notify_err}")
-    async with temp.get_lock():
-        if number in temp.RENTED_NUMS:
-            temp.RENTED_NUMS.remove(number)
+        from hybrid.plugins.outbox import outbox
+        outbox.post_message(
+            client,
+            user_id,
+            f"✅ The Telegram account linked to your number <b>{number}</b> has been permanently deleted.\n"
+            f"The number may now be available for re-rent.",
+            parse_mode=ParseMode.HTML,
+        )
+    temp.POOL.discard(RENTED, [number])
     try:
         from hybrid.plugins.guard import guard_is_free
         is_free = await guard_is_free(number)
         if is_free:
-            async with temp.get_lock():
-                if number not in temp.AVAILABLE_NUM:
-                    temp.AVAILABLE_NUM.add(number)
+            temp.POOL.add(AVAILABLE, [number])
             logging.info(f"Number {number} confirmed free on Fragment, relisted.")
         else:
             logging.info(f"Number {number} not yet free on Fragment, skipping relist.")
     except Exception as e:
         logging.error(f"Fragment check failed for {number}: {e}")
-        async with temp.get_lock():
-            if number not in temp.AVAILABLE_NUM:
-                temp.AVAILABLE_NUM.add(number)
+        temp.POOL.add(AVAILABLE, [number])
 
 
 async def check_7day_accs(client):
@@ -359,6 +423,7 @@ async def check_7day_accs(client):
 async def check_restricted_numbers(client):
     """Check and log restricted numbers from Fragment. Runs once a day"""
     from hybrid.plugins.func import t
+    from hybrid.plugins.outbox import outbox
     while True:
         from hybrid.plugins.fragment import get_restricted_numbers_async
         restricted, _ = await get_restricted_numbers_async()
@@ -368,8 +433,7 @@ async def check_restricted_numbers(client):
 
         for num in restricted:
             logging.info(f"Number {num} is restricted by Fragment.")
-            if num not in temp.RESTRICTED_NUMS:
-                temp.RESTRICTED_NUMS.add(num)
+            temp.POOL.add(RESTRICTED, [num])
 
             num_data = await get_number_data(num)
             user_id = num_data.get("user_id") if num_data else None
@@ -402,8 +466,7 @@ async def check_restricted_numbers(client):
                         from hybrid.plugins.db import save_7day_deletion
                         await save_7day_deletion(num, now + timedelta(days=7))
                     if stat:
-                        await remove_number_data(num)
-                        await remove_number(num, user_id)
+                        await release_rental(num, user_id)
                     if not stat and reason == "Banned":
                         continue  # Banned feature disabled
                     logging.info(f"Restricted number {num} cleaned up for user {user_id} after 3 days")
@@ -411,17 +474,11 @@ async def check_restricted_numbers(client):
                     logging.info(f"Restricted number {num} not yet cleaned up for user {user_id}")
                     days_remaining = 3 - (now - date).days if date else 3
                     text = (t(user_id, "restricted_notify")).format(number=num, days=days_remaining)
-                    try:
-                        await client.send_message(user_id, text)
-                    except Exception as e:
-                        logging.error(f"Failed to notify user {user_id} about restricted number {num}: {e}")
+                    outbox.post_message(client, user_id, text)
                 continue
 
             text = (t(user_id, "restricted_notify")).format(number=num, days=3)
-            try:
-                await client.send_message(user_id, text)
-            except Exception as e:
-                logging.error(f"Failed to notify user {user_id} about restricted number {num}: {e}")
+            outbox.post_message(client, user_id, text)
 
         await asyncio.sleep(86400)
 
@@ -430,33 +487,32 @@ async def _process_paid_invoice(client, user_id, msg_id, inv, inv_id):
     """Shared payment processing + auto-rent for paid invoices. Handles balance crediting, rentpay auto-rent with locking, fallback keyboard, cleanup."""
     from hybrid.plugins.temp import temp
     from hybrid.plugins.db import (
-        get_user_balance, save_user_balance, mark_payment_processed_crypto,
-        delete_inv_entry, get_number_info, get_rented_data_for_number,
-        save_number, save_rental_atomic, unlock_number_for_rent, lock_number_for_rent,
-        record_revenue, record_transaction,
+        settle_crypto_invoice, delete_inv_entry, get_number_info, get_rented_data_for_number,
+        rent_number_atomic, unlock_number_for_rent, lock_number_for_rent,
     )
-    from hybrid.plugins.func import t, resolve_payment_keyboard, format_number, format_remaining_time, get_current_datetime, get_remaining_hours, normalize_phone
+    from hybrid.plugins.func import t, resolve_payment_keyboard, format_number, format_remaining_time
+    from hybrid.plugins.phone import parse_number
     from hybrid.plugins.callback import build_number_actions_keyboard
+    from hybrid.plugins.outbox import outbox
     from config import D30_RATE, D60_RATE, D90_RATE
 
+    settled, credit, new_bal = await settle_crypto_invoice(inv_id, user_id, inv.amount)
+    if not settled:
+        # The check_payment_ button (or an earlier poll) already credited this invoice.
+        temp.INV_DICT.pop(user_id, None)
+        await delete_inv_entry(user_id)
+        temp.PENDING_INV.discard(inv_id)
+        return
     try:
-        await client.edit_message_text(user_id, msg_id, "⌛")
+        await outbox.edit_message_text(client, user_id, msg_id, "⌛")
     except Exception as e:
         logging.debug(f"_process_paid_invoice edit_message_text ⌛ failed user_id={user_id} msg_id={msg_id}: {e}")
     payload = (getattr(inv, "payload", "") or "").strip()
-    current_bal = await get_user_balance(user_id) or 0.0
-    fiat_amount = await redis_client.get(f"inv_amount:{inv_id}")
-    credit = float(fiat_amount) if fiat_amount else float(inv.amount)
-    new_bal = current_bal + credit
-    await redis_client.delete(f"inv_amount:{inv_id}")
-    await save_user_balance(user_id, new_bal)
-    await mark_payment_processed_crypto(str(inv_id))
-    await record_transaction(user_id, credit, "deposit", "Balance top-up via CryptoBot")
     if payload.startswith("rentpay:"):
         parts = payload.split(":")
         number = parts[1] if len(parts) >= 2 else ""
         hours = int(parts[2]) if len(parts) >= 3 else 0
-        number = normalize_phone(number) or number
+        number = parse_number(number) or number
         num_text = format_number(number)
         info = await get_number_info(number)
         rented_data = await get_rented_data_for_number(number)
@@ -464,7 +520,7 @@ async def _process_paid_invoice(client, user_id, msg_id, inv, inv_id):
             if rented_data and rented_data.get("user_id") and int(rented_data.get("user_id", 0)) != user_id:
                 keyboard = await resolve_payment_keyboard(user_id, payload)
                 try:
-                    await client.edit_message_text(user_id, msg_id, t(user_id, "payment_confirmed"), reply_markup=keyboard)
+                    await outbox.edit_message_text(client, user_id, msg_id, t(user_id, "payment_confirmed"), reply_markup=keyboard)
                 except Exception as e:
                     logging.debug(f"_process_paid_invoice edit_message_text failed user_id={user_id}: {e}")
             else:
@@ -473,69 +529,55 @@ async def _process_paid_invoice(client, user_id, msg_id, inv, inv_id):
                 price = price_map.get(hours)
                 if price is not None and new_bal >= price:
                     lock_acquired = await lock_number_for_rent(number, user_id, ttl=1800)
+                    status = "LOCKED"
                     if lock_acquired:
                         try:
-                            rent_date = rented_data.get("rent_date", get_current_datetime()) if rented_data else get_current_datetime()
-                            remaining_hours = get_remaining_hours(rent_date, rented_data.get("hours", 0)) if rented_data else 0
-                            new_hours = remaining_hours + hours
-                            new_balance = new_bal - price
-                            if remaining_hours > 0:
-                                await save_number(number, user_id, new_hours, extend=True)
-                                original_rent_date = rented_data.get("rent_date", get_current_datetime())
-                                await save_rental_atomic(user_id, number, new_balance, original_rent_date, new_hours)
-                            else:
-                                await save_number(number, user_id, new_hours)
-                                await save_rental_atomic(user_id, number, new_balance, get_current_datetime(), new_hours)
-                            async with temp.get_lock():
-                                temp.RENTED_NUMS.add(number)
-                                temp.AVAILABLE_NUM.discard(number)
-                            try:
-                                await record_revenue(user_id, number, price, new_hours)
-                                if remaining_hours > 0:
-                                    await record_transaction(user_id, -price, "renewal", f"Renewed {num_text} for {hours // 24} days")
-                                else:
-                                    await record_transaction(user_id, -price, "rent", f"Rented {num_text} for {hours // 24} days")
-                            except Exception as e:
-                                logging.error("🔑 [RENT] Post-rental tracking failed number=%s: %s", number, e)
-                            duration = format_remaining_time(get_current_datetime(), new_hours)
-                            keyboard = await build_number_actions_keyboard(user_id, number, "my_rentals")
-                            try:
-                                await client.edit_message_text(
-                                    user_id, msg_id,
-                                    t(user_id, "rental_success", number=num_text, duration=duration, price=price, balance=new_balance),
-                                    reply_markup=keyboard
-                                )
-                            except Exception as e:
-                                logging.debug(f"_process_paid_invoice edit rental_success failed user_id={user_id}: {e}")
+                            status, state = await rent_number_atomic(
+                                user_id, number, price, hours,
+                                rent_desc=f"Rented {num_text} for {hours // 24} days",
+                                renew_desc=f"Renewed {num_text} for {hours // 24} days",
+                            )
+                            if status == "OK":
+                                temp.POOL.apply(add={RENTED: [number]}, remove={AVAILABLE: [number]})
+                                duration = format_remaining_time(state["rent_date"], state["hours"])
+                                keyboard = await build_number_actions_keyboard(user_id, number, "my_rentals")
+                                try:
+                                    await outbox.edit_message_text(
+                                        client, user_id, msg_id,
+                                        t(user_id, "rental_success", number=num_text, duration=duration, price=price, balance=state["balance"]),
+                                        reply_markup=keyboard
+                                    )
+                                except Exception as e:
+                                    logging.debug(f"_process_paid_invoice edit rental_success failed user_id={user_id}: {e}")
                         finally:
                             await unlock_number_for_rent(number)
-                    else:
+                    if status != "OK":
                         try:
-                            await client.edit_message_text(
-                                user_id, msg_id,
+                            await outbox.edit_message_text(
+                                client, user_id, msg_id,
                                 t(user_id, "payment_confirmed") + '\n\n<emoji id="5767151002666929821">⚠️</emoji> Number was rented by someone else. Your balance has been credited.',
                                 reply_markup=await resolve_payment_keyboard(user_id, payload),
                                 parse_mode=ParseMode.HTML
                             )
                         except Exception as e:
-                            logging.debug(f"_process_paid_invoice edit_message_text (lock failed) user_id={user_id}: {e}")
+                            logging.debug(f"_process_paid_invoice edit_message_text (rent {status}) user_id={user_id}: {e}")
                 else:
                     keyboard = await resolve_payment_keyboard(user_id, payload)
                     try:
-                        await client.edit_message_text(user_id, msg_id, t(user_id, "payment_confirmed"), reply_markup=keyboard)
+                        await outbox.edit_message_text(client, user_id, msg_id, t(user_id, "payment_confirmed"), reply_markup=keyboard)
                     except Exception as e:
                         logging.debug(f"_process_paid_invoice edit_message_text (no price/bal) user_id={user_id}: {e}")
         else:
             keyboard = await resolve_payment_keyboard(user_id, payload)
             try:
-                await client.edit_message_text(user_id, msg_id, t(user_id, "payment_confirmed"), reply_markup=keyboard)
+                await outbox.edit_message_text(client, user_id, msg_id, t(user_id, "payment_confirmed"), reply_markup=keyboard)
             except Exception as e:
                 logging.debug(f"_process_paid_invoice edit_message_text (not rentpay) user_id={user_id}: {e}")
     else:
         keyboard = await resolve_payment_keyboard(user_id, payload)
         try:
-            await client.edit_message_text(
-                user_id, msg_id,
+            await outbox.edit_message_text(
+                client, user_id, msg_id,
                 t(user_id, "payment_confirmed"),
                 reply_markup=keyboard
             )
@@ -552,6 +594,7 @@ async def check_payments(client):
     from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
     from hybrid.plugins.temp import temp
     from hybrid.plugins.db import is_payment_processed_crypto, delete_inv_entry
+    from hybrid.plugins.outbox import outbox
 
     while True:
         try:
@@ -591,8 +634,8 @@ async def check_payments(client):
                                 if inv_id in temp.PENDING_INV:
                                     temp.PENDING_INV.remove(inv_id)
                                 try:
-                                    await client.edit_message_text(
-                                        user_id, msg_id,
+                                    await outbox.edit_message_text(
+                                        client, user_id, msg_id,
                                         '<emoji id="5767151002666929821">⚠️</emoji> Your payment invoice has expired.\n\n'
                                         "We have verified that no payment was received for this invoice. "
                                         "Please return to the number listing and initiate a new rental — "
@@ -606,7 +649,8 @@ async def check_payments(client):
                                     )
                                 except Exception:
                                     try:
-                                        await client.send_message(
+                                        await outbox.send_message(
+                                            client,
                                             user_id,
                                             '<emoji id="5767151002666929821">⚠️</emoji> Your payment invoice has expired.\n\n'
                                             "We have verified that no payment was received. "
@@ -754,8 +798,23 @@ class Bot(Client):
                 logging.error(f"Failed to send restart message: {e}")
                 pass
 
+        from hybrid.plugins.outbox import outbox
+        outbox.start()
+        logging.info("📤 [STARTUP] Outbound dispatcher started.")
+        from hybrid.plugins.db import warm_rentals_index, load_scripts
+        indexed = await warm_rentals_index()
+        logging.info("📇 [STARTUP] Rentals index warmed (%d active rental(s)).", indexed)
+        loaded = await load_scripts()
+        logging.info("📜 [STARTUP] %d Lua script(s) loaded.", loaded)
+        from hybrid.plugins.db import start_near_cache
+        if start_near_cache():
+            logging.info("🧊 [STARTUP] Redis near-cache tracking started.")
+        from hybrid.plugins.db import ensure_dashboard_stats
+        if await ensure_dashboard_stats():
+            logging.info("📊 [STARTUP] Dashboard balance aggregates built.")
+
         asyncio.create_task(schedule_reminders(self))
-        logging.info("🔔 [STARTUP] Reminder scheduler started (every 15 min).")
+        logging.info("🔔 [STARTUP] Reminder scheduler started (expiry-driven).")
         asyncio.create_task(check_expired_numbers(self))
         logging.info("⏰ [STARTUP] Expired numbers checker started.")
         asyncio.create_task(check_7day_accs(self))
@@ -773,12 +832,19 @@ class Bot(Client):
             if id not in ADMINS:
                 ADMINS.append(id)
                 logging.info(f"Added {id} to ADMINS list from DB")
+        temp.ADMIN_IDS.update(ADMINS)
         await load_num_data()
+        asyncio.create_task(refresh_number_pool(self))
+        logging.info("🔄 [STARTUP] Fragment pool refresh scheduled (every %ds).", FRAGMENT_REFRESH_INTERVAL)
         from hybrid.plugins.db import load_inv_dict
         loaded = await load_inv_dict()
         temp.INV_DICT.clear()
         temp.INV_DICT.update(loaded)
         logging.info("Loaded %d persisted invoice(s) into INV_DICT.", len(loaded))
+        from hybrid.plugins.broadcast import resume_broadcasts
+        resumed = await resume_broadcasts(self)
+        if resumed:
+            logging.info("📢 [STARTUP] Resumed %d unfinished broadcast(s).", resumed)
         startup_text = _build_startup_message(self.username, self.start_timestamp)
         for id in ADMINS:
             try:
@@ -0,0 +1,200 @@
+# (©) @Hybrid_Vamp - https://github.com/hybridvamp
+# Resumable broadcast engine — streams users:all with SSCAN, records each user's outcome in Redis as
+# its send completes (the cursor advances once a page is done), and adapts its send rate to FloodWait
+# feedback (AIMD). Active broadcasts are resumed from Bot.start, so /restart or /update never loses
+# progress; a broadcast that keeps erroring is retried with backoff, then marked failed.
+
+import asyncio
+import logging
+import time
+
+from pyrogram.enums import ParseMode
+from pyrogram.errors import FloodWait, InputUserDeactivated, PeerIdInvalid, UserIsBlocked
+
+from hybrid.plugins.outbox import outbox, PRIORITY_BULK, PRIORITY_NOTICE
+
+PAGE_SIZE = 200
+START_RATE = 15.0   # msg/s
+MIN_RATE = 1.0
+MAX_RATE = 25.0
+RATE_STEP = 0.25    # additive increase per successful send
+MAX_ATTEMPTS = 4
+PROGRESS_EVERY = 5  # seconds between status message edits
+MAX_PAGE_ERRORS = 5  # consecutive page errors (e.g. Redis down) before a broadcast is marked failed
+
+_running: set = set()
+
+
+class AdaptiveRate:
+    """
+    Paces sends at `rate` msg/s; halves the rate and pauses on FloodWait, creeps back up on success.
+    A FloodWait starts a new epoch: senders still sleeping on a slot reserved before it re-reserve
+    behind the pause at the reduced rate instead of firing on their old schedule.
+    """
+
+    def __init__(self, rate: float = START_RATE):
+        self.rate = rate
+        self._next = time.monotonic()
+        self._epoch = 0
+
+    async def acquire(self) -> None:
+        while True:
+            epoch = self._epoch
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + 1.0 / self.rate
+            if slot > now:
+                await asyncio.sleep(slot - now)
+            if epoch == self._epoch:
+                return
+
+    def on_success(self) -> None:
+        self.rate = min(MAX_RATE, self.rate + RATE_STEP / self.rate)
+
+    def on_flood(self, wait: float) -> None:
+        self.rate = max(MIN_RATE, self.rate / 2)
+        self._next = time.monotonic() + wait
+        self._epoch += 1
+
+
+async def _send_one(client, rate: AdaptiveRate, bid: int, uid: int, from_chat_id: int, message_id: int) -> None:
+    from hybrid.plugins.db import record_broadcast_outcome
+    await record_broadcast_outcome(bid, uid, await _deliver_one(client, rate, uid, from_chat_id, message_id))
+
+
+async def _deliver_one(client, rate: AdaptiveRate, uid: int, from_chat_id: int, message_id: int) -> str:
+    for _ in range(MAX_ATTEMPTS):
+        await rate.acquire()
+        try:
+            await outbox.submit(
+                PRIORITY_BULK, uid, client.copy_message, uid, from_chat_id, message_id,
+                retry_on_flood=False,
+            )
+            rate.on_success()
+            return "ok"
+        except FloodWait as e:
+            rate.on_flood(float(e.value) + 1)
+            logging.info(f"Broadcast FloodWait {e.value}s; rate now {rate.rate:.1f}/s")
+        except (UserIsBlocked, InputUserDeactivated, PeerIdInvalid):
+            return "blocked"
+        except Exception as e:
+            logging.debug(f"Broadcast send to {uid} failed: {e}")
+            return "failed"
+    return "failed"
+
+
+def _progress_text(bid: int, info: dict, state: str) -> str:
+    sent = int(info.get("sent", 0))
+    blocked = int(info.get("blocked", 0))
+    failed = int(info.get("failed", 0))
+    total = int(info.get("total", 0)) or 1
+    done = sent + blocked + failed
+    head = {
+        "running": "📢 Broadcasting…",
+        "done": "📢 Broadcast completed!",
+        "cancelled": "📢 Broadcast cancelled.",
+        "failed": "📢 Broadcast stopped after repeated errors.",
+    }.get(state, "📢 Broadcast")
+    return (
+        f"{head} <code>#{bid}</code>\n"
+        f"Progress: {done}/{total} ({min(100, done * 100 // total)}%)\n"
+        f"<emoji id=\"5323628709469495421\">✅</emoji> Success: {sent}\n"
+        f"🚫 Blocked: {blocked}\n"
+        f"<emoji id=\"5767151002666929821\">❌</emoji> Failed: {failed}"
+    )
+
+
+async def _edit_status(client, bid: int, info: dict, state: str) -> None:
+    try:
+        chat_id = int(info.get("status_chat_id") or 0)
+        msg_id = int(info.get("status_message_id") or 0)
+        if chat_id and msg_id:
+            await outbox.edit_message_text(
+                client, chat_id, msg_id, _progress_text(bid, info, state),
+                priority=PRIORITY_NOTICE, parse_mode=ParseMode.HTML,
+            )
+    except Exception as e:
+        logging.debug(f"Broadcast #{bid} status edit failed: {e}")
+
+
+async def run_broadcast(client, bid: int) -> None:
+    """Drive one broadcast to completion from its stored cursor. Safe to call again after a restart."""
+    from hybrid.plugins.db import (
+        get_broadcast, scan_user_ids, get_broadcast_done, checkpoint_broadcast, set_broadcast_state,
+    )
+    if bid in _running:
+        return
+    _running.add(bid)
+    info = None
+    try:
+        info = await get_broadcast(bid)
+        if not info or info.get("state") != "running":
+            return
+        from_chat_id = int(info["from_chat_id"])
+        message_id = int(info["message_id"])
+        cursor = int(info.get("cursor") or 0)
+        rate = AdaptiveRate()
+        last_progress = 0.0
+        errors = 0
+        while True:
+            try:
+                next_cursor, uids = await scan_user_ids(cursor, PAGE_SIZE)
+                done = await get_broadcast_done(bid, uids)
+                todo = [uid for uid in dict.fromkeys(uids) if uid not in done]
+                # Let every send of the page settle before a retry, so no user is sent to twice.
+                results = await asyncio.gather(
+                    *[_send_one(client, rate, bid, uid, from_chat_id, message_id) for uid in todo],
+                    return_exceptions=True,
+                )
+                for r in results:
+                    if isinstance(r, Exception):
+                        raise r
+                await checkpoint_broadcast(bid, next_cursor)
+                cursor = next_cursor
+                info = await get_broadcast(bid) or info
+            except Exception as e:
+                # Outcomes already recorded survive; retrying the page skips those users.
+                errors += 1
+                if errors >= MAX_PAGE_ERRORS:
+                    raise
+                logging.warning(f"Broadcast #{bid} page error ({errors}/{MAX_PAGE_ERRORS}), retrying: {e}")
+                await asyncio.sleep(min(60, 2 ** errors))
+                continue
+            errors = 0
+            if info.get("state") == "cancelled":
+                await set_broadcast_state(bid, "cancelled")
+                await _edit_status(client, bid, info, "cancelled")
+                return
+            if cursor == 0:
+                break
+            if time.monotonic() - last_progress >= PROGRESS_EVERY:
+                last_progress = time.monotonic()
+                await _edit_status(client, bid, info, "running")
+        await set_broadcast_state(bid, "done")
+        await _edit_status(client, bid, info, "done")
+        logging.info(f"Broadcast #{bid} finished: sent={info.get('sent')} blocked={info.get('blocked')} failed={info.get('failed')}")
+    except Exception as e:
+        logging.error(f"Broadcast #{bid} failed: {e}")
+        try:
+            await set_broadcast_state(bid, "failed")
+        except Exception as state_err:
+            logging.error(f"Broadcast #{bid} could not be marked failed: {state_err}")
+        await _edit_status(client, bid, info or {}, "failed")
+    finally:
+        _running.discard(bid)
+
+
+async def start_broadcast(client, from_chat_id: int, message_id: int, status_chat_id: int, status_message_id: int) -> int:
+    from hybrid.plugins.db import create_broadcast
+    bid = await create_broadcast(from_chat_id, message_id, status_chat_id, status_message_id)
+    asyncio.create_task(run_broadcast(client, bid))
+    return bid
+
+
+async def resume_broadcasts(client) -> int:
+    """Restart every broadcast left in broadcast:active (called from Bot.start)."""
+    from hybrid.plugins.db import get_active_broadcasts
+    active = await get_active_broadcasts()
+    for bid in active:
+        asyncio.create_task(run_broadcast(client, bid))
+    return len(active)
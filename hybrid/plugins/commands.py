@@ -4,38 +4,47 @@ import re
 import os
 import time
 import html
+import json
 import random
-import asyncio
 import subprocess
 import psutil
 import platform
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timedelta, timezone
 
 from pyrogram.enums import ParseMode
 from pyrogram.types import Message
 from pyrogram import Client, filters
-from pyrogram.errors import FloodWait
 from pyrogram.types import CallbackQuery
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
 from hybrid import Bot, LOG_FILE_NAME, logging, ADMINS, gen_4letters
 from hybrid.plugins.temp import temp
-from hybrid.plugins.func import t, restart, export_numbers_csv
+from hybrid.plugins.pool import LISTED, AVAILABLE, RENTED, UNAVAILABLE
+from hybrid.plugins.func import t, restart, export_numbers_csv, load_user_language
+from hybrid.plugins.broadcast import start_broadcast
 from hybrid.plugins.db import (
     save_user_id,
     ping_redis,
-    get_all_user_ids,
     get_all_rentals,
-    get_number_info,
-    get_total_balance,
-    get_7day_deletions,
-    get_total_revenue,
+    resync_rentals_index,
+    fsck_rentals,
+    get_near_cache_stats,
+    get_pool_state_bulk,
+    get_dashboard_stats,
+    get_revenue_window,
     remove_admin,
     add_admin,
     delete_all_data,
     log_admin_action,
+    query_admin_audit,
+    save_audit_query,
+    load_audit_query,
+    get_broadcast,
+    set_broadcast_state,
+    MIGRATIONS,
+    run_migration,
+    get_migration_status,
 )
-from hybrid.plugins.db import client as redis_client
 
 from aiosend.types import Invoice
 
@@ -68,6 +77,7 @@ DEFAULT_ADMIN_BACK_KEYBOARD = InlineKeyboardMarkup(
 async def start_command(client: Client, message: Message):
     user = message.from_user
     await save_user_id(user.id)
+    await load_user_language(user.id)
 
     rows = [
         [InlineKeyboardButton(t(user.id, "rent"), callback_data="rentnum"),
@@ -164,39 +174,31 @@ async def stats_cmd(_, message: Message):
     try:
         msg = await message.reply_text("⏳ Gathering stats...", parse_mode=ParseMode.HTML)
 
-        # Users
-        all_users = await get_all_user_ids()
-        total_users = len(all_users)
-
-        # Rentals
-        all_rentals = await get_all_rentals()
-        active_rentals = len(all_rentals)
+        # Users, balances, rentals, deletions, revenue: one round trip over maintained aggregates
+        s = await get_dashboard_stats()
+        total_users = s["users"]
+        active_rentals = s["active_rentals"]
 
         # Numbers
-        total_numbers = len(temp.NUMBE_RS)
-        available = len([n for n in temp.AVAILABLE_NUM if n not in temp.RENTED_NUMS and n not in temp.UN_AV_NUMS])
-        rented = len(temp.RENTED_NUMS)
-        unavailable = len(temp.UN_AV_NUMS)
+        snap = temp.POOL.snapshot()
+        total_numbers = snap.count(LISTED)
+        available = snap.rentable()
+        rented = snap.count(RENTED)
+        unavailable = snap.count(UNAVAILABLE)
 
         # 7-day pending deletions
-        pending_deletions = len(await get_7day_deletions())
+        pending_deletions = s["pending_deletions"]
 
         # Pending CryptoBot invoices
         pending_crypto = len(temp.PENDING_INV)
 
         # Revenue
-        total_revenue = await get_total_revenue()
-        now = datetime.now(timezone.utc)
-        this_month_key = f"revenue:month:{now.strftime('%Y%m')}"
-        last_month = now.replace(day=1) - timedelta(days=1)
-        last_month_key = f"revenue:month:{last_month.strftime('%Y%m')}"
-        this_month_rev = await redis_client.get(this_month_key)
-        last_month_rev = await redis_client.get(last_month_key)
-        this_month_rev = float(this_month_rev) if this_month_rev else 0.0
-        last_month_rev = float(last_month_rev) if last_month_rev else 0.0
+        total_revenue = s["revenue_total"]
+        this_month_rev = s["revenue_this_month"]
+        last_month_rev = s["revenue_last_month"]
 
         # Total balances
-        total_balance, users_with_balance = await get_total_balance()
+        total_balance, users_with_balance = s["total_balance"], s["users_with_balance"]
 
         text = (
             f"<b>📊 Bot Dashboard</b>\n\n"
@@ -223,6 +225,98 @@ async def stats_cmd(_, message: Message):
     except Exception as e:
         await message.reply_text(f"❌ Failed to gather stats: {e}", parse_mode=ParseMode.HTML)
 
+@Bot.on_message(filters.command("revenue") & filters.user(ADMINS))
+async def revenue_cmd(_, message: Message):
+    try:
+        now = datetime.now(timezone.utc)
+        lines = ["<b>💰 Revenue</b>\n"]
+        for label, days in (("24 hours", 1), ("7 days", 7), ("30 days", 30), ("90 days", 90)):
+            r = await get_revenue_window(now - timedelta(days=days), now)
+            lines.append(f"• Last {label}: <b>{r['amount']:.2f} USDT</b> ({r['count']} rentals)")
+            if days == 30 and r["by_duration"]:
+                for dur, d in sorted(r["by_duration"].items(), key=lambda kv: kv[0]):
+                    lines.append(f"    ◦ {dur}: {d['amount']:.2f} USDT ({d['count']})")
+        await message.reply_text("\n".join(lines), parse_mode=ParseMode.HTML)
+    except Exception as e:
+        await message.reply_text(f"❌ Failed to load revenue: {e}", parse_mode=ParseMode.HTML)
+
+AUDIT_USAGE = (
+    "Usage: /audit [admin=&lt;id&gt;] [action=&lt;name&gt;] [target=&lt;number|id&gt;] "
+    "[since=&lt;YYYY-MM-DD|7d|12h&gt;] [until=&lt;YYYY-MM-DD&gt;]"
+)
+
+
+def _audit_time(value: str):
+    m = re.fullmatch(r"(\d+)([dh])", value)
+    if m:
+        unit = timedelta(days=1) if m.group(2) == "d" else timedelta(hours=1)
+        return datetime.now(timezone.utc) - int(m.group(1)) * unit
+    return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+
+
+def parse_audit_query(args: list) -> dict:
+    """['admin=1', 'since=7d', ...] -> query_admin_audit kwargs. Raises ValueError on bad input."""
+    query = {}
+    for arg in args:
+        key, sep, value = arg.partition("=")
+        if not sep or not value or key not in ("admin", "action", "target", "since", "until"):
+            raise ValueError(arg)
+        if key == "admin":
+            query["admin_id"] = int(value)
+        elif key in ("since", "until"):
+            query[key] = _audit_time(value)
+        else:
+            query[key] = value
+    return query
+
+
+async def render_audit_page(args: list = None, token: str = None, before: str = None):
+    """
+    (text, reply_markup) for one page of /audit results. A fresh /audit parses args, resolving relative
+    since/until to absolute times once, and parks the query under a short-lived token; the Older button
+    carries that token and the cursor, so every page of one query covers the same window.
+    """
+    if token:
+        query = await load_audit_query(token)
+        if query is None:
+            return "⌛ This audit query has expired; run /audit again.", None
+    else:
+        query = parse_audit_query(args or [])
+        query["label"] = " ".join(args or [])
+        token = await save_audit_query(query)
+    label = query.pop("label", "")
+    entries, next_cursor = await query_admin_audit(limit=10, before=before, **query)
+    lines = ["🗂 <b>Audit log</b>", f"Query: {html.escape(label) or 'all'}"]
+    if query.get("since") or query.get("until"):
+        bounds = (query[k].strftime("%Y-%m-%d %H:%M") if query.get(k) else "…" for k in ("since", "until"))
+        lines.append(f"Window: {' → '.join(bounds)} UTC")
+    lines[-1] += "\n"
+    for e in entries:
+        when = e["timestamp"].strftime("%Y-%m-%d %H:%M") if e["timestamp"] else "?"
+        lines.append(
+            f"• <code>{when}</code> <b>{html.escape(e['action'])}</b> → <code>{html.escape(e['target'])}</code> "
+            f"by <code>{e['admin_id']}</code>"
+        )
+        if e["details"]:
+            lines.append(f"    <i>{html.escape(e['details'][:200])}</i>")
+    if not entries:
+        lines.append("No matching entries." if not next_cursor else "No matches in this stretch; keep paging.")
+    markup = None
+    if next_cursor:
+        markup = InlineKeyboardMarkup([[
+            InlineKeyboardButton("Older ▶️", callback_data=f"audit_page:{token}:{next_cursor}")
+        ]])
+    return "\n".join(lines), markup
+
+
+@Bot.on_message(filters.command("audit") & filters.user(ADMINS))
+async def audit_cmd(_, message: Message):
+    try:
+        text, markup = await render_audit_page(message.command[1:])
+    except ValueError:
+        return await message.reply_text(AUDIT_USAGE, parse_mode=ParseMode.HTML)
+    await message.reply_text(text, reply_markup=markup, parse_mode=ParseMode.HTML)
+
 @Bot.on_message(filters.command("cleardb") & filters.user(ADMINS))
 async def clear_db_cmd(_, message):
     try:
@@ -289,66 +383,77 @@ async def remove_admin_cmd(_, message):
         await message.reply_text(f"<emoji id=\"5767151002666929821\">❌</emoji> User {user_id} could not be removed. Status: {status}", parse_mode=ParseMode.HTML)
 
 @Bot.on_message(filters.command("broadcast") & filters.user(ADMINS))
-async def broadcast_cmd(_, message):
+async def broadcast_cmd(client, message):
     if not message.reply_to_message:
         return await message.reply_text("Usage: /broadcast as reply to a message", parse_mode=ParseMode.HTML)
     broadcast_message = message.reply_to_message
     if not broadcast_message:
         return await message.reply_text("<emoji id=\"5767151002666929821\">❌</emoji> Please reply to a text message to broadcast.", parse_mode=ParseMode.HTML)
-    user_ids = await get_all_user_ids()
-    success_count = 0
-    fail_count = 0
-    sem = asyncio.Semaphore(20)
-
-    async def send_one(uid):
-        nonlocal success_count, fail_count
-        async with sem:
-            try:
-                await broadcast_message.copy(chat_id=uid)
-                success_count += 1
-            except FloodWait as e:
-                await asyncio.sleep(e.value + 1)
-                try:
-                    await broadcast_message.copy(chat_id=uid)
-                    success_count += 1
-                except Exception as fe:
-                    logging.error(f"Failed after FloodWait for {uid}: {fe}")
-                    fail_count += 1
-            except Exception as e:
-                logging.error(f"Failed to send broadcast to {uid}: {e}")
-                fail_count += 1
-
-    await asyncio.gather(*[send_one(uid) for uid in user_ids], return_exceptions=True)
-
-    await message.reply_text(f"📢 Broadcast completed!\n<emoji id=\"5323628709469495421\">✅</emoji> Success: {success_count}\n<emoji id=\"5767151002666929821\">❌</emoji> Failed: {fail_count}", parse_mode=ParseMode.HTML)
+    status = await message.reply_text("📢 Starting broadcast…", parse_mode=ParseMode.HTML)
+    # Cursor + per-user outcome live in Redis; the engine resumes it after /restart or /update.
+    bid = await start_broadcast(client, broadcast_message.chat.id, broadcast_message.id, status.chat.id, status.id)
+    await log_admin_action(message.from_user.id, "broadcast", str(bid))
+
+
+@Bot.on_message(filters.command("broadcast_cancel") & filters.user(ADMINS))
+async def broadcast_cancel_cmd(_, message):
+    args = message.text.split()
+    if len(args) != 2 or not args[1].lstrip("#").isdigit():
+        return await message.reply_text("Usage: /broadcast_cancel <id>", parse_mode=ParseMode.HTML)
+    bid = int(args[1].lstrip("#"))
+    info = await get_broadcast(bid)
+    if not info or info.get("state") != "running":
+        return await message.reply_text(f"<emoji id=\"5767151002666929821\">❌</emoji> No running broadcast #{bid}.", parse_mode=ParseMode.HTML)
+    await set_broadcast_state(bid, "cancelled")
+    await message.reply_text(f"<emoji id=\"5323628709469495421\">✅</emoji> Broadcast #{bid} will stop after the current batch.", parse_mode=ParseMode.HTML)
 
 # /checknum moved to guard.py (standalone number checker module)
 
+@Bot.on_message(filters.command("migrate") & filters.user(ADMINS))
+async def migrate_cmd(_, message: Message):
+    """Run a named data migration (see db.MIGRATIONS). Without args, list migrations and their last run."""
+    args = message.text.split()
+    if len(args) != 2 or args[1] not in MIGRATIONS:
+        done = await get_migration_status()
+        lines = ["🧰 <b>Migrations</b>\n", "Usage: /migrate &lt;name&gt;\n"]
+        for name, (_, desc) in MIGRATIONS.items():
+            last = done.get(name, {}).get("at")
+            lines.append(f"• <code>{name}</code> — {desc}" + (f" (last run {last[:19]})" if last else ""))
+        return await message.reply_text("\n".join(lines), parse_mode=ParseMode.HTML)
+    name = args[1]
+    msg = await message.reply_text(f"⏳ Running migration <code>{name}</code>...", parse_mode=ParseMode.HTML)
+    try:
+        result = await run_migration(name)
+    except Exception as e:
+        logging.exception("migration %s failed", name)
+        return await msg.edit_text(f"<emoji id=\"5767151002666929821\">❌</emoji> Migration {name} failed: {e}", parse_mode=ParseMode.HTML)
+    await log_admin_action(message.from_user.id, "migrate", name, json.dumps(result))
+    summary = "\n".join(f"• {k}: {v}" for k, v in result.items())
+    await msg.edit_text(f"<emoji id=\"5323628709469495421\">✅</emoji> Migration <code>{name}</code> done.\n{summary}", parse_mode=ParseMode.HTML)
+
+
 @Bot.on_message(filters.command("fixstate") & filters.user(ADMINS))
 async def fix_state_cmd(client, message):
-    """Rebuild temp.RENTED_NUMS and temp.AVAILABLE_NUM from Redis data."""
+    """Rebuild the RENTED and AVAILABLE pool bitsets from Redis data."""
     msg = await message.reply("🔄 Rebuilding state...")
 
-    rented_count = 0
-    available_count = 0
-
-    all_rentals = await get_all_rentals()
-    rented_numbers = set()
-    for doc in all_rentals:
-        num = doc.get("number")
-        if num:
-            rented_numbers.add(num)
-            rented_count += 1
-
-    async with temp.get_lock():
-        temp.RENTED_NUMS = rented_numbers
-        temp.AVAILABLE_NUM.clear()
-        for num in temp.NUMBE_RS:
-            if num not in rented_numbers:
-                info = await get_number_info(num)
-                if info and info.get("available", True):
-                    temp.AVAILABLE_NUM.add(num)
-                    available_count += 1
+    # /fixstate is the explicit "Redis is the truth" path: rebuild the rentals index from a full scan.
+    await resync_rentals_index()
+    listed = temp.POOL.snapshot().members(LISTED)
+    states = await get_pool_state_bulk(listed)
+
+    # Rents/releases may have landed during the await above. The index is patched on every rental write
+    # and is warm after the resync, so re-reading it here does not suspend: the read and the apply below
+    # happen in one step. AVAILABLE is only patched for the numbers whose state was actually read.
+    rented_numbers = {doc["number"] for doc in await get_all_rentals() if doc.get("number")}
+    enabled = {num for num, (info, _) in states.items() if info and info.get("available", True)}
+    snap = temp.POOL.apply(
+        replace={RENTED: rented_numbers},
+        remove={AVAILABLE: [num for num in states if num not in enabled or num in rented_numbers]},
+        add={AVAILABLE: [num for num in enabled if num not in rented_numbers]},
+    )
+    rented_count = len(rented_numbers)
+    available_count = snap.rentable()
 
     await msg.edit_text(
         "✅ State rebuilt!\n"
@@ -356,6 +461,54 @@ async def fix_state_cmd(client, message):
         f"🟢 Available: {available_count}"
     )
 
+@Bot.on_message(filters.command("fsck") & filters.user(ADMINS))
+async def fsck_cmd(_, message: Message):
+    """Cross-check the rental indexes against rental:* hashes. /fsck reports; /fsck fix also repairs."""
+    repair = len(message.command) > 1 and message.command[1].lower() == "fix"
+    msg = await message.reply_text(
+        "🔍 Checking rental indexes..." + (" (repair mode)" if repair else ""), parse_mode=ParseMode.HTML
+    )
+    try:
+        report = await fsck_rentals(repair=repair)
+    except Exception as e:
+        logging.exception("fsck failed")
+        return await msg.edit_text(f"<emoji id=\"5767151002666929821\">❌</emoji> fsck failed: {e}", parse_mode=ParseMode.HTML)
+    lines = ["🩺 <b>Rental index check</b>\n"]
+    lines.append("Checked: " + ", ".join(f"{k} {v}" for k, v in report["checked"].items()))
+    if not report["issues"]:
+        lines.append("\n<emoji id=\"5323628709469495421\">✅</emoji> No inconsistencies found.")
+    for kind, count in sorted(report["issues"].items()):
+        examples = ", ".join(html.escape(x) for x in report["examples"].get(kind, []))
+        lines.append(f"• <code>{kind}</code>: {count}" + (f" — {examples}" if examples else ""))
+    if repair:
+        if report.get("repair_blocked"):
+            lines.append(f"\n⚠️ Repair skipped: {report['repair_blocked']}")
+        else:
+            lines.append(f"\n🛠 Repaired {report['repaired']} index entries, skipped {report['skipped']} changed mid-scan.")
+            await log_admin_action(message.from_user.id, "fsck_fix", "rentals", json.dumps(report["issues"]))
+    elif report["issues"]:
+        lines.append("\nRun <code>/fsck fix</code> to repair.")
+    await msg.edit_text("\n".join(lines)[:4000], parse_mode=ParseMode.HTML)
+
+@Bot.on_message(filters.command("cachestats") & filters.user(ADMINS))
+async def cache_stats_cmd(_, message: Message):
+    """Near-cache (client-side caching of number:/rental:/user: hashes) hit rate and tracking state."""
+    s = get_near_cache_stats()
+    if not s["enabled"]:
+        state = "off (set NEAR_CACHE=true)"
+    elif s["tracking"]:
+        state = "<emoji id=\"5323628709469495421\">✅</emoji> tracking"
+    else:
+        state = "⚠️ not tracking (reconnecting); only number:* cached with 60s TTL"
+    lines = [
+        "🧊 <b>Near-cache</b>\n",
+        f"• State: {state}",
+        f"• Entries: {s['entries']}",
+        f"• Hits: {s['hits']} | Misses: {s['misses']} | Hit rate: {s['hit_rate'] * 100:.1f}%",
+        f"• Invalidations: {s['invalidations']} | Flushes: {s['flushes']}",
+    ]
+    await message.reply_text("\n".join(lines), parse_mode=ParseMode.HTML)
+
 @Bot.on_message(filters.command("exportcsv") & filters.user(ADMINS))
 async def export_csv_cmd(_, message: Message):
     try:
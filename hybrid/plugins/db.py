@@ -5,21 +5,31 @@
 import asyncio
 import json
 import os
-import random
 import ssl
 import time
 import redis.asyncio as redis
-from redis.exceptions import WatchError
 import config
 from datetime import datetime, timezone, timedelta
-
-# Cache for get_all_rentals() to avoid repeated full scans when multiple callers need it in one request.
-# TTL 30 seconds: balances freshness with reducing N+1 calls (get_user_numbers, get_rental_by_owner, etc.).
-_RENTALS_CACHE_TTL = 30.0
-_rentals_cache = (0.0, [])
-
-_number_info_cache: dict = {}  # number -> (timestamp, data)
-_NUMBER_INFO_CACHE_TTL = 60.0  # seconds
+from decimal import Decimal, ROUND_HALF_UP
+from hybrid.plugins.phone import canonical, parse_number
+
+# In-process rentals index: canonical number -> rental doc, user_id -> set of numbers.
+# Warmed once at startup (warm_rentals_index); every rental write patches it in place, so
+# get_all_rentals(), get_rental_by_owner(), get_user_numbers() etc. never rescan Redis.
+# A full rentals:all scan only happens on an explicit resync_rentals_index() (e.g. /fixstate).
+# Only this process's writers patch the index, so single-number lookups (get_number_data) confirm it
+# against Redis: a miss costs one SISMEMBER rentals:all and a hit re-reads rental:{n}, which picks up
+# rentals written or released by another replica / redis-cli. The bulk views (get_all_rentals etc.) see
+# such outside writes once a lookup has patched them in, or after a resync.
+_rentals_by_number: dict = {}
+_rentals_by_user: dict = {}
+_rentals_index_ready = False
+_rentals_index_journal = None  # list of pending patches while a resync is in flight
+# One rebuild at a time: the journal belongs to the rebuild holding the lock, and callers that need the
+# index before it is warm wait for the in-flight build instead of starting their own rentals:all scan.
+_rentals_index_lock = asyncio.Lock()
+
+_NUMBER_INFO_CACHE_TTL = 60.0  # seconds; number:* near-cache lifetime while invalidation tracking is off
 
 def _now():
     return datetime.now(timezone.utc)
@@ -37,6 +47,170 @@ if "azure.cloud.redislabs.com" in _redis_uri and _redis_uri.startswith("rediss:/
 # Avoids blocking under load when many users hit the bot at once.
 client = redis.from_url(_redis_uri, decode_responses=True, max_connections=50)
 
+# ========= NEAR CACHE (client-side caching) =========
+# Opt-in (NEAR_CACHE=true). A dedicated connection subscribes to __redis__:invalidate and a second one runs
+# CLIENT TRACKING ON REDIRECT <subscriber> BCAST PREFIX number: PREFIX rental: PREFIX user:, so any write to
+# those keys — from this process, another replica or redis-cli — evicts the local copy as soon as Redis
+# publishes it. RESP2 redirect mode is used so the shared RESP2 pool above is unchanged. Our own writers
+# also drop keys locally right after writing, so a handler never reads back its own stale value.
+# While tracking is down (disabled, connecting, or after a dropped connection) the cache is flushed and
+# reads go to Redis, except number:* which keeps its previous 60s TTL.
+_NEAR_PREFIXES = ("number:", "rental:", "user:")
+_NEAR_RETRY = 5.0  # seconds between tracking reconnect attempts
+_NEAR_PING = 30.0  # idle seconds before the tracking connections are pinged
+
+
+class _NearCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.tracking = False
+        self._data: dict = {}      # key -> (expires_at, value)
+        self._inflight: dict = {}  # key -> token of the read that may fill it
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.flushes = 0
+
+    def get(self, key: str):
+        entry = self._data.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def begin(self, key: str):
+        """Mark a read of key as in flight; an invalidation before put() voids the token."""
+        token = self._inflight[key] = object()
+        return token
+
+    def put(self, key: str, token, value, ttl: float = None):
+        if self._inflight.get(key) is not token:
+            return  # invalidated or superseded while the read was in flight
+        del self._inflight[key]
+        if value is None:
+            return
+        if self.tracking:
+            expires = float("inf")
+        elif ttl is not None:
+            expires = time.monotonic() + ttl
+        else:
+            return
+        if key not in self._data and len(self._data) >= self.max_entries:
+            del self._data[next(iter(self._data))]
+        self._data[key] = (expires, value)
+
+    def drop(self, *keys):
+        for key in keys:
+            self._data.pop(key, None)
+            self._inflight.pop(key, None)
+
+    def flush(self):
+        self._data.clear()
+        self._inflight.clear()
+        self.flushes += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": bool(getattr(config, "NEAR_CACHE", False)),
+            "tracking": self.tracking,
+            "entries": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "flushes": self.flushes,
+        }
+
+
+_near = _NearCache(getattr(config, "NEAR_CACHE_SIZE", 50000))
+_near_task = None
+
+
+async def _near_hgetall(key: str, parse=None, ttl: float = None):
+    """HGETALL through the near-cache. Returns parse(hash) (or the raw hash), or None if the key does not exist."""
+    cached = _near.get(key)
+    if cached is not None:
+        return cached
+    token = _near.begin(key)
+    value = None
+    try:
+        data = await client.hgetall(key)
+        value = (parse(data) if parse else data) if data else None
+    finally:
+        _near.put(key, token, value, ttl)
+    return value
+
+
+async def _near_tracking_loop():
+    import logging
+    while True:
+        sub = client.connection_pool.make_connection()
+        track = client.connection_pool.make_connection()
+        try:
+            await sub.connect()
+            await track.connect()
+            await sub.send_command("CLIENT", "ID")
+            sub_id = await sub.read_response()
+            await sub.send_command("SUBSCRIBE", "__redis__:invalidate")
+            await sub.read_response()
+            prefixes = [arg for p in _NEAR_PREFIXES for arg in ("PREFIX", p)]
+            await track.send_command("CLIENT", "TRACKING", "ON", "REDIRECT", sub_id, "BCAST", *prefixes)
+            await track.read_response()
+            _near.flush()
+            _near.tracking = True
+            logging.info("Near-cache tracking on (%s).", ", ".join(_NEAR_PREFIXES))
+            while True:
+                msg = await sub.read_response(timeout=_NEAR_PING)
+                if msg is None:
+                    # Tracking lives and dies with both connections; make sure neither went away silently.
+                    await track.send_command("PING")
+                    await track.read_response()
+                    await sub.send_command("PING")
+                    continue
+                if not isinstance(msg, list) or len(msg) < 3 or msg[0] != "message":
+                    continue
+                keys = msg[2]
+                if keys is None:  # FLUSHDB / FLUSHALL
+                    _near.flush()
+                    continue
+                if isinstance(keys, str):
+                    keys = [keys]
+                _near.invalidations += len(keys)
+                _near.drop(*keys)
+        except asyncio.CancelledError:
+            raise
+        except redis.ResponseError as e:
+            logging.error("Near-cache disabled: Redis refused CLIENT TRACKING (%s).", e)
+            return
+        except Exception as e:
+            logging.warning("Near-cache tracking lost (%s); retrying in %.0fs.", e, _NEAR_RETRY)
+        finally:
+            _near.tracking = False
+            _near.flush()
+            for conn in (sub, track):
+                try:
+                    await conn.disconnect()
+                except Exception:
+                    pass
+        await asyncio.sleep(_NEAR_RETRY)
+
+
+def start_near_cache() -> bool:
+    """Start invalidation tracking if NEAR_CACHE is set (called from Bot.start). Returns whether it was started."""
+    global _near_task
+    if not getattr(config, "NEAR_CACHE", False):
+        return False
+    if _near_task is None or _near_task.done():
+        _near_task = asyncio.create_task(_near_tracking_loop())
+    return True
+
+
+def get_near_cache_stats() -> dict:
+    return _near.stats()
+
+
 def _parse_dt(s):
     if s is None:
         return None
@@ -49,95 +223,42 @@ def _parse_dt(s):
         return None
 
 
-# ========= USER NUMBERS =========
-def _norm_num(n):
-    s = str(n or "").strip().replace(" ", "").replace("-", "")
-    if s.startswith("+888") and len(s) >= 12:
-        return s
-    if s.startswith("888") and len(s) >= 11:
-        return "+" + s
-    return s if s.startswith("+888") else None
-
-async def save_number(number: str, user_id: int, hours: int, date: datetime = None, extend: bool = False):
-    """Save rental for user. Stores number in canonical +888 form and updates num_owner for fast lookup."""
-    if date is None:
-        date = _now()
-    number = _norm_num(number) or number
+# Money is stored as integer micro-USDT (1 USDT = 1_000_000): user:{id}.balance_micro, tx amount_micro,
+# revenue:total:micro and the revenue:{h,d,m}:* rollup amounts. Balances only change through
+# HINCRBY inside a script that refuses to go negative. Public functions still take and return USDT floats.
+MICRO = 1_000_000
 
-    key = f"user:{user_id}"
-    numbers_raw = await client.hget(key, "numbers")
-    numbers = json.loads(numbers_raw) if numbers_raw else []
-
-    for i, n in enumerate(numbers):
-        if n.get("number") == number:
-            if not extend:
-                return False, "ALREADY"
-            numbers[i]["hours"] = hours
-            numbers[i]["date"] = date.isoformat()
-            await client.hset(key, "numbers", json.dumps(numbers))
-            return True, "UPDATED"
-
-    numbers.append({"number": number, "hours": hours, "date": date.isoformat()})
-    if not await client.exists(key):
-        await client.hset(key, mapping={"user_id": user_id, "balance": 0, "numbers": json.dumps(numbers)})
-        await client.sadd("users:all", user_id)
-    else:
-        await client.hset(key, "numbers", json.dumps(numbers))
-    # Reverse index: number -> user_id so get_user_by_number() is O(1) instead of scanning all users.
-    await client.hset("num_owner", number, user_id)
-    return True, "SAVED"
 
+def _to_micro(amount) -> int:
+    return int((Decimal(str(amount or 0)) * MICRO).to_integral_value(rounding=ROUND_HALF_UP))
 
-async def get_user_by_number(number: str):
-    number = _norm_num(number) or number
-    uid = await client.hget("num_owner", number)
-    if not uid:
-        return False
-    key = f"user:{uid}"
-    numbers_raw = await client.hget(key, "numbers")
-    if not numbers_raw:
-        return False
-    numbers = json.loads(numbers_raw)
-    for n in numbers:
-        if (_norm_num(n.get("number")) or n.get("number")) == number:
-            date_s = n.get("date")
-            return int(uid), n.get("hours", 0), _parse_dt(date_s) if date_s else None
-    return False
 
+def _from_micro(value) -> float:
+    return int(value or 0) / MICRO
 
-async def get_numbers_by_user(user_id: int):
-    key = f"user:{user_id}"
-    numbers_raw = await client.hget(key, "numbers")
-    if not numbers_raw:
-        return []
-    numbers = json.loads(numbers_raw)
-    return [n.get("number", str(n)) for n in numbers if isinstance(n, dict) and "number" in n]
 
+def _balance_of(micro, legacy):
+    """USDT balance from a (balance_micro, legacy float balance) pair, or None when neither is set."""
+    if micro is not None:
+        return _from_micro(micro)
+    return float(legacy) if legacy is not None else None
 
-async def remove_number(number: str, user_id: int):
-    number = _norm_num(number) or number
-    num_canon = number
 
-    key = f"user:{user_id}"
-    numbers_raw = await client.hget(key, "numbers")
-    if not numbers_raw:
-        return False, "NOT_FOUND"
-    numbers = json.loads(numbers_raw)
-    new_numbers = []
-    for n in numbers:
-        stored = n.get("number")
-        if not stored:
-            new_numbers.append(n)
-            continue
-        stored_norm = _norm_num(stored) or stored
-        if stored_norm == num_canon or stored == number:
-            continue  # skip - removing this one
-        new_numbers.append(n)
-    if len(new_numbers) == len(numbers):
-        return False, "NOT_FOUND"
-    await client.hset(key, "numbers", json.dumps(new_numbers))
-    await client.hdel("num_owner", num_canon)
-    return True, "REMOVED"
+# ========= USER NUMBERS =========
+# Ownership lives only in the indexes: rentals:user:{uid} (set), num_owner (hash) and rental:{number}
+# (hours/dates). The legacy user:{uid}.numbers JSON blob is no longer read or written; run
+# `/migrate numbers` once to fold old blobs into the indexes. All writes go through the rent / transfer /
+# release / set_expiry scripts, which keep these indexes, the in-process rentals index and the near-cache in step.
+async def get_user_by_number(number: str):
+    """Return (user_id, hours, rent_date) for a rented number, or False. Reads num_owner + the rentals index."""
+    number = canonical(number) or number
+    uid = await client.hget("num_owner", number)
+    if not uid:
+        return False
+    doc = await get_rental_doc(number)
+    if not doc or int(doc.get("user_id") or 0) != int(uid):
+        return False
+    return int(uid), doc.get("hours", 0), doc.get("rent_date")
 
 
 async def get_remaining_rent_days(number: str):
@@ -155,154 +276,46 @@ async def get_remaining_rent_days(number: str):
 
 
 # =========== Number Rent Data ============
-async def save_number_data(number: str, user_id: int, rent_date: datetime, hours: int):
+async def get_number_data(number: str):
     """
-    Store rental by canonical +888 number so get_number_data() fast path (rental:{number}) always hits.
+    Rental for number, or None, with no scans. A number the rentals index doesn't hold costs one SISMEMBER
+    rentals:all (so a rental written by another process is still seen); a hit reads the canonical
+    rental:{n} hash. Either way the index is patched to what Redis says.
     """
-    hours = int(hours)
-    number = _norm_num(number) or str(number or "").strip().replace(" ", "").replace("-", "")
-    if number.startswith("888") and not number.startswith("+888") and len(number) >= 11:
-        number = "+" + number
-    expiry_date = rent_date + timedelta(hours=hours)
-    key = f"rental:{number}"
-    await client.hset(key, mapping={
-        "number": number,
-        "user_id": user_id,
-        "rent_date": rent_date.isoformat(),
-        "hours": hours,
-        "expiry_date": expiry_date.isoformat(),
-    })
-    await client.zadd("rentals:expiry", {number: expiry_date.timestamp()})
-    await client.sadd("rentals:all", number)
-    await client.sadd(f"rentals:user:{user_id}", number)
-    await client.expire(key, int(hours * 3600) + 86400)
-    global _rentals_cache
-    _rentals_cache = (0.0, [])  # Invalidate cache so get_all_rentals() sees new rental
-
-
-def _normalize_for_lookup(s):
-    """Normalize number for lookup; returns +888 form or None."""
-    if s is None:
-        return None
-    s = str(s).strip().replace(" ", "").replace("-", "").replace("\ufeff", "")
-    s = s.lstrip("\u002b\u066b\u066c\u2393\uff0b+")  # various plus signs
-    # Convert fullwidth Unicode digits (０-９, ٠-٩, etc.) to ASCII
-    _tbl = str.maketrans("０１２３４５６７８９٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
-    s = s.translate(_tbl)
-    if not s or not s.isdigit():
-        return None
-    if s.startswith("888") and len(s) >= 11:
-        return "+" + s
-    if s.startswith("888") and len(s) == 8:
-        return "+888" + s
-    if len(s) == 8 and s.isdigit():
-        return "+888" + s
-    if s.startswith("+888") and len(s) >= 12:
-        return s
-    return None
-
-
-async def get_number_data(number: str):
-    n = str(number or "").strip().replace(" ", "").replace("-", "")
+    n = parse_number(number)
     if not n:
         return None
-    if not n.startswith("+888") and n.startswith("888") and len(n) >= 11:
-        n = "+" + n
-    if n.startswith("+") and not n.startswith("+888"):
+    doc = await _index_lookup(n)
+    if doc is None and not await client.sismember("rentals:all", n):
         return None
-    candidates = [n]
-    if n.startswith("+888"):
-        candidates.append(n[1:])
-    elif n.startswith("888"):
-        candidates.append("+" + n)
-    data = None
-    n_norm = _normalize_for_lookup(n)
-    for cand in candidates:
-        data = await client.hgetall(f"rental:{cand}")
-        if data:
-            break
-    if not data and n_norm:
-        for stored in (await client.smembers("rentals:all") or []):
-            stored = str(stored).strip() if stored else ""
-            if _normalize_for_lookup(stored) == n_norm:
-                data = await client.hgetall(f"rental:{stored}")
-                if data:
-                    break
-    # Avoid client.keys("rental:*") — it's a full Redis scan and blocks under load.
-    # All writes use canonical number (save_number_data), so fast path above should hit.
-    # Only fall back to full rental scan via get_all_rentals() for legacy/migrated data.
-    if not data and n_norm:
-        for doc in await get_all_rentals():
-            stored_num = (doc.get("number") or "")
-            if _normalize_for_lookup(stored_num) == n_norm:
-                data = {
-                    "number": doc.get("number"),
-                    "user_id": str(doc.get("user_id", "")),
-                    "hours": str(doc.get("hours", 0)),
-                    "rent_date": doc.get("rent_date").isoformat() if doc.get("rent_date") else "",
-                    "expiry_date": doc.get("expiry_date").isoformat() if doc.get("expiry_date") else "",
-                }
-                break
+    data = await _near_hgetall(f"rental:{n}")
     if not data:
+        if doc is not None:
+            _index_drop(n)  # released outside this process
         return None
-    out = {
-        "number": data.get("number"),
-        "user_id": int(data["user_id"]) if data.get("user_id") else None,
-        "hours": int(data["hours"]) if data.get("hours") else None,
-    }
-    if data.get("rent_date"):
-        out["rent_date"] = _parse_dt(data["rent_date"])
-    if data.get("expiry_date"):
-        out["expiry_date"] = _parse_dt(data["expiry_date"])
-    return out
+    fresh = _rental_doc(data)
+    if fresh != doc:
+        _index_put(fresh)
+    return fresh
 
 
 async def get_rented_data_for_number(number: str):
-    """Get rental data - tries get_number_data first, then get_all_rentals (same as admin export)."""
-    data = await get_number_data(number)
-    if data:
-        return data
-    n_norm = _normalize_for_lookup(number)
-    if not n_norm:
-        return None
-    for doc in await get_all_rentals():
-        if _normalize_for_lookup(doc.get("number")) == n_norm:
-            return doc
-    return None
+    """Rental data for number (same as get_number_data; kept for callers)."""
+    return await get_number_data(number)
 
 
 async def get_rental_by_owner(user_id: int, number: str):
-    """Find rental for this user+number. get_all_rentals() called at most once."""
-    uid = int(user_id)
-    num_clean = str(number or "").strip().replace(" ", "").replace("-", "")
-    if not num_clean:
-        return None
-    num_norm = _normalize_for_lookup(num_clean)
-
-    all_rentals = await get_all_rentals()
-
-    data = await get_number_data(num_clean)
-    if data and int(data.get("user_id") or 0) == uid:
-        return data
-
-    for doc in all_rentals:
-        if int(doc.get("user_id") or 0) != uid:
-            continue
-        doc_num = (doc.get("number") or "").strip()
-        if not doc_num:
-            continue
-        if doc_num == num_clean:
-            return doc
-        doc_norm = _normalize_for_lookup(doc_num)
-        if doc_norm and num_norm and doc_norm == num_norm:
-            return doc
-        if doc_num.lstrip("+") == num_clean.lstrip("+"):
-            return doc
+    """Find rental for this user+number. O(1) via the rentals index."""
+    doc = await get_rental_doc(number)
+    if doc and int(doc.get("user_id") or 0) == int(user_id):
+        return doc
     return None
 
 
 async def get_user_numbers(user_id: int):
-    """Return numbers rented by user. Uses rentals:user when present; fallback to get_all_rentals for legacy data."""
+    """Return numbers rented by user, from the rentals index (falls back to rentals:user before warm-up)."""
+    if _rentals_index_ready:
+        return sorted(_rentals_by_user.get(int(user_id), ()))
     members = await client.smembers(f"rentals:user:{user_id}")
     if members:
         return list(members)
@@ -314,64 +327,55 @@ async def get_user_numbers(user_id: int):
 
 
 async def remove_number_data(number: str):
-    n = _norm_num(number) or str(number or "").strip()
-    candidates = [n]
-    if n.startswith("+888"):
-        candidates.append(n[1:])
-    elif n.startswith("888"):
-        candidates.append("+" + n)
-    for cand in candidates:
-        key = f"rental:{cand}"
-        if await client.exists(key):
-            data = await client.hgetall(key)
-            user_id = data.get("user_id")
-            stored = data.get("number") or n
-            async with client.pipeline() as pipe:
-                pipe.delete(key)
-                pipe.zrem("rentals:expiry", n)
-                pipe.zrem("rentals:expiry", stored)
-                pipe.srem("rentals:all", n)
-                pipe.srem("rentals:all", stored)
-                pipe.hdel("num_owner", n)
-                pipe.hdel("num_owner", stored)
-                if user_id:
-                    pipe.srem(f"rentals:user:{user_id}", n)
-                    pipe.srem(f"rentals:user:{user_id}", stored)
-                await pipe.execute()
-            global _rentals_cache
-            _rentals_cache = (0.0, [])  # Invalidate cache after removal
-            return True, "REMOVED"
-    return False, "NOT_FOUND"
-
-
-async def transfer_number(number: str, from_user_id: int, to_user_id: int):
-    """Transfer a rented number to another user. Uses Redis lock to prevent concurrent transfer/rent races. Returns (True, None) or (False, error_msg)."""
-    canon = _norm_num(number) or number
-    lock_key = canon
-    acquired = await lock_number_for_rent(lock_key, from_user_id, ttl=60)
-    if not acquired:
-        return False, "Number is busy; try again in a moment."
+    """Delete rental:{number} and all of its index entries (see release_rental)."""
+    ok, status, _ = await release_rental(number)
+    return ok, status
+
+
+async def transfer_number(number: str, from_user_id: int, to_user_id: int, out_desc: str = "", in_desc: str = ""):
+    """
+    Transfer a rented number to another user in one EVALSHA (ownership check, rental hash, owner indexes,
+    transfer history and optional transfer_out/transfer_in tx entries). Returns (True, None) or (False, error_msg).
+    """
+    rented = await get_rental_by_owner(from_user_id, number)
+    if not rented:
+        return False, "Number not found"
+    canon = canonical(rented.get("number") or number) or (rented.get("number") or number)
+    now = _now()
+    tx_date, tx_minid = _tx_stamp(now)
+    entry = json.dumps({
+        "from_user_id": from_user_id,
+        "to_user_id": to_user_id,
+        "timestamp": now.isoformat(),
+    })
     try:
-        rented = await get_rental_by_owner(from_user_id, number)
-        if not rented:
-            return False, "Number not found"
-        canon = _norm_num(rented.get("number") or number) or (rented.get("number") or number)
-        rent_date = rented.get("rent_date")
-        hours = int(rented.get("hours", 0) or 0)
-        if not rent_date or not hours:
-            return False, "Invalid rental data"
-        await remove_number(canon, from_user_id)
-        await remove_number_data(canon)
-        await save_number(canon, to_user_id, hours, date=rent_date, extend=False)
-        await save_number_data(canon, to_user_id, rent_date, hours)
-        await append_transfer_history(canon, from_user_id, to_user_id)
-        return True, None
+        res = await _SCRIPTS["transfer"](
+            keys=[
+                f"rental:{canon}", f"rentals:user:{from_user_id}", f"rentals:user:{to_user_id}", "num_owner",
+                f"transfer_history:{canon}", "users:all", f"user:{to_user_id}",
+            ],
+            args=[
+                int(from_user_id), int(to_user_id), canon, entry, tx_date, tx_minid,
+                (out_desc or "")[:200], (in_desc or "")[:200],
+            ],
+        )
     except Exception as e:
         import logging
         logging.exception("transfer_number error")
         return False, str(e)
-    finally:
-        await unlock_number_for_rent(lock_key)
+    if res[0] == "NOT_OWNER":
+        return False, "Number not found"
+    if res[0] != "OK":
+        return False, "Invalid rental data"
+    _near.drop(f"user:{to_user_id}")
+    _index_put({
+        "number": canon,
+        "user_id": int(to_user_id),
+        "rent_date": _parse_dt(res[1]),
+        "hours": int(res[2]),
+        "expiry_date": _parse_dt(res[3]),
+    })
+    return True, None
 
 
 async def get_expired_numbers():
@@ -379,39 +383,178 @@ async def get_expired_numbers():
     return list(await client.zrangebyscore("rentals:expiry", 0, now))
 
 
-async def get_all_rentals():
-    """
-    Return all rentals. Cached for 30s so get_user_numbers(), get_rental_by_owner(), get_rented_data_for_number()
-    don't each trigger a full rentals:all scan + N hgetalls in the same request.
-    """
-    global _rentals_cache
-    now = time.monotonic()
-    if now - _rentals_cache[0] < _RENTALS_CACHE_TTL and _rentals_cache[1]:
-        return _rentals_cache[1]
-    numbers = list(await client.smembers("rentals:all") or [])
-    if not numbers:
-        _rentals_cache = (now, [])
+async def get_rentals_expiring_between(start_ts: float, end_ts: float):
+    """Return [(number, expiry_ts)] with start_ts < expiry <= end_ts, straight from the rentals:expiry zset."""
+    if end_ts <= start_ts:
         return []
-    async with client.pipeline() as pipe:
-        for number in numbers:
-            pipe.hgetall(f"rental:{number}")
+    rows = await client.zrangebyscore("rentals:expiry", f"({start_ts}", end_ts, withscores=True)
+    return [(number, float(score)) for number, score in rows]
+
+
+async def get_next_expiry_after(ts: float):
+    """Return the first expiry timestamp strictly after ts, or None."""
+    rows = await client.zrangebyscore("rentals:expiry", f"({ts}", "+inf", start=0, num=1, withscores=True)
+    return float(rows[0][1]) if rows else None
+
+
+async def get_sent_reminders(pairs):
+    """Given [(number, label)], return the set of pairs whose reminder marker exists (one pipelined round trip)."""
+    pairs = list(pairs)
+    if not pairs:
+        return set()
+    async with client.pipeline(transaction=False) as pipe:
+        for number, label in pairs:
+            pipe.exists(f"reminder:{number}:{label}")
         results = await pipe.execute()
-    out = []
-    for number, data in zip(numbers, results):
-        if not data:
-            continue
-        doc = {
-            "number": data.get("number"),
-            "user_id": int(data["user_id"]) if data.get("user_id") else None,
-        }
-        if data.get("rent_date"):
-            doc["rent_date"] = _parse_dt(data["rent_date"])
-        if data.get("expiry_date"):
-            doc["expiry_date"] = _parse_dt(data["expiry_date"])
-        doc["hours"] = int(data["hours"]) if data.get("hours") else 0
-        out.append(doc)
-    _rentals_cache = (now, out)
-    return out
+    return {pair for pair, hit in zip(pairs, results) if hit}
+
+
+async def mark_reminder_sent(number: str, label: str, ttl: int = 7 * 24 * 3600):
+    # 7-day TTL prevents duplicate reminders across restarts
+    await client.set(f"reminder:{number}:{label}", "1", ex=ttl)
+
+
+def _rental_doc(data: dict) -> dict:
+    doc = {
+        "number": data.get("number"),
+        "user_id": int(data["user_id"]) if data.get("user_id") else None,
+    }
+    if data.get("rent_date"):
+        doc["rent_date"] = _parse_dt(data["rent_date"])
+    if data.get("expiry_date"):
+        doc["expiry_date"] = _parse_dt(data["expiry_date"])
+    doc["hours"] = int(data["hours"]) if data.get("hours") else 0
+    return doc
+
+
+def _index_key(number) -> str:
+    return parse_number(number) or str(number or "").strip()
+
+
+def _index_apply_put(doc: dict):
+    key = _index_key(doc.get("number"))
+    if not key:
+        return
+    old = _rentals_by_number.get(key)
+    if old and old.get("user_id") is not None and old.get("user_id") != doc.get("user_id"):
+        owned = _rentals_by_user.get(old["user_id"])
+        if owned is not None:
+            owned.discard(old.get("number"))
+            if not owned:
+                _rentals_by_user.pop(old["user_id"], None)
+    _rentals_by_number[key] = doc
+    if doc.get("user_id") is not None:
+        _rentals_by_user.setdefault(doc["user_id"], set()).add(doc.get("number"))
+
+
+def _index_apply_drop(number):
+    key = _index_key(number)
+    old = _rentals_by_number.pop(key, None)
+    if old and old.get("user_id") is not None:
+        owned = _rentals_by_user.get(old["user_id"])
+        if owned is not None:
+            owned.discard(old.get("number"))
+            if not owned:
+                _rentals_by_user.pop(old["user_id"], None)
+
+
+def _index_put(doc: dict):
+    """Patch the rentals index after a rental write (no-op until warmed; journaled during a resync)."""
+    _near.drop(f"rental:{doc.get('number')}")
+    if _rentals_index_journal is not None:
+        _rentals_index_journal.append(("put", doc))
+    if _rentals_index_ready:
+        _index_apply_put(doc)
+
+
+def _index_drop(number):
+    """Remove a number from the rentals index after its rental was deleted."""
+    _near.drop(f"rental:{number}")
+    if _rentals_index_journal is not None:
+        _rentals_index_journal.append(("drop", number))
+    if _rentals_index_ready:
+        _index_apply_drop(number)
+
+
+async def _index_lookup(n_norm: str):
+    if not _rentals_index_ready:
+        await warm_rentals_index()
+    return _rentals_by_number.get(n_norm)
+
+
+async def resync_rentals_index(batch_size: int = 500) -> int:
+    """
+    Rebuild the rentals index from Redis (SMEMBERS rentals:all + pipelined HGETALLs).
+    Writes that land while the scan is in flight are journaled and replayed on top. Concurrent calls
+    are serialized, each on top of the previous one's result. Returns rental count.
+    """
+    async with _rentals_index_lock:
+        return await _rebuild_rentals_index(batch_size)
+
+
+async def _rebuild_rentals_index(batch_size: int) -> int:
+    """resync_rentals_index body; the caller holds _rentals_index_lock."""
+    global _rentals_by_number, _rentals_by_user, _rentals_index_ready, _rentals_index_journal
+    _rentals_index_journal = []
+    try:
+        numbers = list(await client.smembers("rentals:all") or [])
+        by_number, by_user = {}, {}
+        for i in range(0, len(numbers), batch_size):
+            batch = numbers[i:i + batch_size]
+            async with client.pipeline(transaction=False) as pipe:
+                for number in batch:
+                    pipe.hgetall(f"rental:{number}")
+                results = await pipe.execute()
+            for data in results:
+                if not data:
+                    continue
+                doc = _rental_doc(data)
+                by_number[_index_key(doc.get("number"))] = doc
+                if doc.get("user_id") is not None:
+                    by_user.setdefault(doc["user_id"], set()).add(doc.get("number"))
+        journal = _rentals_index_journal
+        _rentals_by_number, _rentals_by_user = by_number, by_user
+        _rentals_index_ready = True
+        for op, arg in journal:
+            if op == "put":
+                _index_apply_put(arg)
+            else:
+                _index_apply_drop(arg)
+    finally:
+        _rentals_index_journal = None
+    return len(_rentals_by_number)
+
+
+async def warm_rentals_index() -> int:
+    """
+    Build the rentals index once (startup, or the first lookup that beats it). Callers arriving while a
+    build is in flight wait for it; later calls are no-ops. Use resync_rentals_index() to force.
+    """
+    if _rentals_index_ready:
+        return len(_rentals_by_number)
+    async with _rentals_index_lock:
+        if _rentals_index_ready:
+            return len(_rentals_by_number)
+        return await _rebuild_rentals_index(500)
+
+
+async def get_rental_doc(number: str):
+    """Parsed rental doc (datetime dates, int user_id/hours) for one number from the rentals index, or None."""
+    n_norm = parse_number(number)
+    return await _index_lookup(n_norm) if n_norm else None
+
+
+async def get_all_rentals():
+    """Return all rentals from the in-process index (warmed on first use; no Redis scan afterwards)."""
+    if not _rentals_index_ready:
+        await warm_rentals_index()
+    return list(_rentals_by_number.values())
+
+
+async def count_active_rentals() -> int:
+    if not _rentals_index_ready:
+        await warm_rentals_index()
+    return len(_rentals_by_number)
 
 
 # ========= USER IDS =========
@@ -419,7 +562,7 @@ async def save_user_id(user_id: int):
     key = f"user:{user_id}"
     if await client.exists(key):
         return False, "EXISTS"
-    await client.hset(key, mapping={"user_id": user_id, "numbers": "[]", "balance": 0})
+    await client.hset(key, mapping={"user_id": user_id, "balance_micro": 0})
     await client.sadd("users:all", user_id)
     return True, "SAVED"
 
@@ -431,38 +574,100 @@ async def get_all_user_ids():
 
 # ========= BALANCES =========
 async def save_user_balance(user_id: int, balance: float | int):
-    key = f"user:{user_id}"
-    if not await client.exists(key):
-        await client.hset(key, mapping={"user_id": user_id, "balance": balance, "numbers": "[]"})
-        await client.sadd("users:all", user_id)
-        return "CREATED"
-    await client.hset(key, "balance", balance)
-    return "UPDATED"
+    """Overwrite a balance (absolute). Use adjust_balance() for credits/debits."""
+    created = await _SCRIPTS["set_balance"](
+        keys=[f"user:{user_id}", "users:all"], args=[int(user_id), _to_micro(balance)],
+    )
+    _near.drop(f"user:{user_id}")
+    return "CREATED" if created else "UPDATED"
 
 
 async def get_user_balance(user_id: int):
-    balance = await client.hget(f"user:{user_id}", "balance")
-    return float(balance) if balance is not None else None
+    data = await _near_hgetall(f"user:{user_id}") or {}
+    return _balance_of(data.get("balance_micro"), data.get("balance"))
 
 
-async def get_total_balance():
+async def adjust_balance(user_id: int, amount: float, tx_type: str = None, description: str = ""):
     """
-    Sum of all user balances. Uses a single Redis pipeline instead of N round-trips (one per user).
+    Credit (amount > 0) or debit (amount < 0) a balance with one server-side HINCRBY, optionally
+    appending a tx entry. A debit that would go negative is refused.
+    Returns (True, new_balance) or (False, current_balance).
     """
-    uids = list(await client.smembers("users:all") or [])
-    if not uids:
-        return 0.0, 0
-    async with client.pipeline() as pipe:
-        for uid in uids:
-            pipe.hget(f"user:{uid}", "balance")
-        results = await pipe.execute()
-    total = 0.0
-    count = 0
-    for b in results:
-        if b is not None:
-            total += float(b)
-            count += 1
-    return total, count
+    uid = int(user_id)
+    now = _now()
+    tx_date, tx_minid = _tx_stamp(now)
+    res = await _SCRIPTS["adjust_balance"](
+        keys=[f"user:{uid}", "users:all"],
+        args=[uid, _to_micro(amount), tx_date, tx_minid, tx_type or "", (description or "")[:200]],
+    )
+    _near.drop(f"user:{uid}")
+    return res[0] == "OK", _from_micro(res[1])
+
+
+async def get_total_balance():
+    """(total balance in USDT, users with a non-zero balance) from the incrementally kept aggregates."""
+    total, users = await client.mget("stats:balance_micro", "stats:users_with_balance")
+    return _from_micro(total), int(users or 0)
+
+
+# ========= DASHBOARD AGGREGATES =========
+# stats:balance_micro and stats:users_with_balance are kept in step by every balance write (apply_balance
+# in the Lua library). User, rental and deletion counts come from SCARD/ZCOUNT, which Redis keeps in O(1)
+# / O(log n) without a parallel counter that could drift. rebuild_dashboard_stats() recomputes the
+# balance aggregates from scratch (first start, /migrate stats).
+async def get_dashboard_stats() -> dict:
+    """Everything /stats shows, in one pipelined round trip."""
+    now = _now()
+    this_month = now.strftime("%Y%m")
+    last_month = (now.replace(day=1) - timedelta(days=1)).strftime("%Y%m")
+    async with client.pipeline(transaction=False) as pipe:
+        pipe.mget("stats:balance_micro", "stats:users_with_balance", "revenue:total:micro")
+        pipe.hget(f"revenue:m:{this_month}", "amount")
+        pipe.hget(f"revenue:m:{last_month}", "amount")
+        pipe.scard("users:all")
+        pipe.scard("rentals:all")
+        pipe.zcount("deletions:expiry", 0, now.timestamp())
+        (balance, with_balance, rev_total), rev_this, rev_last, users, rentals, deletions = await pipe.execute()
+    return {
+        "users": users,
+        "users_with_balance": int(with_balance or 0),
+        "total_balance": _from_micro(balance),
+        "active_rentals": rentals,
+        "pending_deletions": deletions,
+        "revenue_total": _from_micro(rev_total),
+        "revenue_this_month": _from_micro(rev_this),
+        "revenue_last_month": _from_micro(rev_last),
+    }
+
+
+async def rebuild_dashboard_stats(batch_size: int = 500) -> dict:
+    """Recompute stats:balance_micro / stats:users_with_balance with an SSCAN over users:all."""
+    total = 0
+    with_balance = 0
+    cursor = 0
+    while True:
+        cursor, uids = await client.sscan("users:all", cursor=cursor, count=batch_size)
+        if uids:
+            async with client.pipeline(transaction=False) as pipe:
+                for uid in uids:
+                    pipe.hmget(f"user:{uid}", "balance_micro", "balance")
+                results = await pipe.execute()
+            for micro, legacy in results:
+                value = int(micro) if micro is not None else (_to_micro(legacy) if legacy is not None else 0)
+                total += value
+                with_balance += 1 if value else 0
+        if int(cursor) == 0:
+            break
+    await client.mset({"stats:balance_micro": total, "stats:users_with_balance": with_balance})
+    return {"total_balance": _from_micro(total), "users_with_balance": with_balance}
+
+
+async def ensure_dashboard_stats() -> bool:
+    """Build the balance aggregates once if they have never been computed (startup). Returns True if rebuilt."""
+    if await client.exists("stats:balance_micro"):
+        return False
+    await rebuild_dashboard_stats()
+    return True
 
 
 # ========= ADMINS =========
@@ -487,8 +692,7 @@ async def get_all_admins():
 
 # ========= NUMBERS POOL =========
 async def save_number_info(number: str, price_30: float, price_60: float, price_90: float, available: bool = True):
-    if not number.startswith("+888"):
-        number = "+888" + number.lstrip("+")
+    number = parse_number(number) or number
 
     now = _now()
     data = {
@@ -508,13 +712,12 @@ async def save_number_info(number: str, price_30: float, price_60: float, price_
         "updated_at": data["updated_at"],
     })
     await client.sadd("pool:numbers", number)
-    _number_info_cache.pop(number, None)
+    _near.drop(key)
     return "UPDATED" if existed else "CREATED"
 
 
 async def edit_number_info(number: str, **kwargs):
-    if not number.startswith("+888"):
-        number = "+888" + number.lstrip("+")
+    number = parse_number(number) or number
     key = f"number:{number}"
     if not await client.exists(key):
         return False, "NO_CHANGES"
@@ -534,32 +737,24 @@ async def edit_number_info(number: str, **kwargs):
         return False, "NO_CHANGES"
     updates["updated_at"] = _now().isoformat()
     await client.hset(key, mapping=updates)
-    _number_info_cache.pop(number, None)
+    _near.drop(key)
     return True, "UPDATED"
 
 
-async def get_number_info(number: str) -> dict | bool:
-    if not number.startswith("+888"):
-        number = "+888" + number.lstrip("+")
-    now_ts = time.monotonic()
-    if number in _number_info_cache:
-        ts, cached = _number_info_cache[number]
-        if now_ts - ts < _NUMBER_INFO_CACHE_TTL:
-            return cached
-
-    key = f"number:{number}"
-    data = await client.hgetall(key)
-    if not data:
-        return False
-    result = {
+def _parse_number_info(data: dict) -> dict:
+    return {
         "number": data.get("number"),
         "prices": json.loads(data.get("prices") or "{}"),
         "hours": json.loads(data.get("hours") or "{}"),
         "available": data.get("available", "true").lower() == "true",
         "updated_at": _parse_dt(data.get("updated_at")),
     }
-    _number_info_cache[number] = (now_ts, result)
-    return result
+
+
+async def get_number_info(number: str) -> dict | bool:
+    number = parse_number(number) or number
+    info = await _near_hgetall(f"number:{number}", _parse_number_info, _NUMBER_INFO_CACHE_TTL)
+    return info if info else False
 
 
 async def get_all_pool_numbers():
@@ -567,9 +762,77 @@ async def get_all_pool_numbers():
     return list(members or [])
 
 
+# ========= BULK POOL HYDRATION =========
+# Startup used to do up to 4 serial round-trips per pool number. These read/write the whole
+# pool in pipelined batches so a few thousand numbers cost a handful of round-trips.
+_HYDRATE_BATCH_SIZE = 500
+
+
+async def get_pool_state_bulk(numbers: list, batch_size: int = _HYDRATE_BATCH_SIZE) -> dict:
+    """
+    Read number:{n} and rental:{n} for every number in pipelined batches.
+    Returns {number: (info dict or None, rental owner user_id or None)}. Fills the number:* near-cache.
+    """
+    out = {}
+    for i in range(0, len(numbers), batch_size):
+        batch = numbers[i:i + batch_size]
+        tokens = [_near.begin(f"number:{number}") for number in batch]
+        async with client.pipeline(transaction=False) as pipe:
+            for number in batch:
+                pipe.hgetall(f"number:{number}")
+                pipe.hgetall(f"rental:{number}")
+            results = await pipe.execute()
+        for j, number in enumerate(batch):
+            info_raw, rental_raw = results[2 * j], results[2 * j + 1]
+            info = _parse_number_info(info_raw) if info_raw else None
+            _near.put(f"number:{number}", tokens[j], info, _NUMBER_INFO_CACHE_TTL)
+            owner = rental_raw.get("user_id") if rental_raw else None
+            out[number] = (info, int(owner) if owner else None)
+    return out
+
+
+async def save_number_infos_bulk(numbers: list, price_30: float, price_60: float, price_90: float,
+                                 available: bool = True, batch_size: int = _HYDRATE_BATCH_SIZE) -> dict:
+    """Write default number:{n} records for many numbers in pipelined batches. Returns {number: info dict}."""
+    now = _now()
+    prices = {"30d": price_30, "60d": price_60, "90d": price_90}
+    hours = {"30d": 30 * 24, "60d": 60 * 24, "90d": 90 * 24}
+    prices_raw, hours_raw = json.dumps(prices), json.dumps(hours)
+    out = {}
+    for i in range(0, len(numbers), batch_size):
+        batch = numbers[i:i + batch_size]
+        async with client.pipeline(transaction=False) as pipe:
+            for number in batch:
+                pipe.hset(f"number:{number}", mapping={
+                    "number": number,
+                    "prices": prices_raw,
+                    "hours": hours_raw,
+                    "available": str(available).lower(),
+                    "updated_at": now.isoformat(),
+                })
+            pipe.sadd("pool:numbers", *batch)
+            await pipe.execute()
+    for number in numbers:
+        _near.drop(f"number:{number}")
+        out[number] = {"number": number, "prices": dict(prices), "hours": dict(hours), "available": available, "updated_at": now}
+    return out
+
+
+
+async def remove_pool_numbers(numbers: list):
+    """Drop numbers that left the Fragment account from pool:numbers. number:{n} (prices) is kept for re-adds."""
+    if not numbers:
+        return 0
+    removed = await client.srem("pool:numbers", *numbers)
+    _near.drop(*(f"number:{number}" for number in numbers))
+    return removed
+
+
 # ===================== language =====================
 async def save_user_language(user_id: int, lang: str):
+    from hybrid.plugins.i18n import remember_language
     await client.hset(f"lang:{user_id}", "language", lang)
+    remember_language(user_id, lang)
 
 
 async def get_user_language(user_id: int):
@@ -588,14 +851,24 @@ async def get_user_payment_method(user_id: int):
 
 
 async def get_user_profile_data(user_id: int):
-    """One round-trip: balance from user:{id}, payment method from payment:{id}."""
-    pipe = client.pipeline()
-    pipe.hgetall(f"user:{user_id}")
-    pipe.get(f"payment:{user_id}")
-    results = await pipe.execute()
-    data = results[0] or {}
-    balance = float(data.get("balance") or 0)
-    method = results[1] or data.get("payment_method") or "cryptobot"
+    """One round-trip: balance from user:{id} (near-cache when tracking), payment method from payment:{id}."""
+    key = f"user:{user_id}"
+    data = _near.get(key)
+    if data is not None:
+        raw_method = await client.get(f"payment:{user_id}")
+    else:
+        token = _near.begin(key)
+        results = [None, None]
+        try:
+            pipe = client.pipeline()
+            pipe.hgetall(key)
+            pipe.get(f"payment:{user_id}")
+            results = await pipe.execute()
+        finally:
+            _near.put(key, token, results[0] or None)
+        data, raw_method = results[0] or {}, results[1]
+    balance = _balance_of(data.get("balance_micro"), data.get("balance")) or 0.0
+    method = raw_method or data.get("payment_method") or "cryptobot"
     if method == "tron":
         method = "cryptobot"
     return balance, method
@@ -679,46 +952,343 @@ async def is_restricted_del_enabled():
     return await client.get("rest_toggle") == "1"
 
 
-async def save_rental_atomic(user_id: int, number: str, new_balance: float, rent_date, new_hours: int):
-    """Atomically deduct balance and save rental in a single Redis transaction. Also updates user:{user_id} numbers list."""
-    if isinstance(rent_date, str):
-        rent_date = _parse_dt(rent_date) or _now()
-    elif rent_date is None:
-        rent_date = _now()
-    expiry = rent_date + timedelta(hours=new_hours)
-    number = _norm_num(number) or str(number).strip()
+# ========= SERVER-SIDE SCRIPTS =========
+# Every rental state transition (rent/renew, transfer, release, admin expiry edit) and every invoice
+# settlement runs as one server-side Lua script: checks, balance debit, rental hash, all indexes and history are written
+# in a single round trip with no partial-failure window. Scripts are SCRIPT LOADed at startup
+# (load_scripts) and invoked with EVALSHA; redis-py reloads them transparently on NOSCRIPT.
+# tx:stream:* and rentals:user:* keys built inside the scripts assume a single Redis node (no cluster).
+_LUA_LIB = """
+local function iso(ts)
+  local secs = math.floor(ts)
+  local us = math.floor((ts - secs) * 1000000 + 0.5)
+  if us >= 1000000 then secs = secs + 1; us = us - 1000000 end
+  local days = math.floor(secs / 86400)
+  local rem = secs - days * 86400
+  local z = days + 719468
+  local era = math.floor(z / 146097)
+  local doe = z - era * 146097
+  local yoe = math.floor((doe - math.floor(doe / 1460) + math.floor(doe / 36524) - math.floor(doe / 146096)) / 365)
+  local y = yoe + era * 400
+  local doy = doe - (365 * yoe + math.floor(yoe / 4) - math.floor(yoe / 100))
+  local mp = math.floor((5 * doy + 2) / 153)
+  local d = doy - math.floor((153 * mp + 2) / 5) + 1
+  local m = mp < 10 and mp + 3 or mp - 9
+  if m <= 2 then y = y + 1 end
+  return string.format('%04d-%02d-%02dT%02d:%02d:%02d.%06d+00:00',
+    y, m, d, math.floor(rem / 3600), math.floor((rem % 3600) / 60), rem % 60, us)
+end
+
+-- Append to the user's tx stream; MINID ~ drops whole macro-nodes older than the 30-day retention
+-- window, so trimming stays O(1) per write (a few stale entries may linger until the next node fills).
+local function push_tx(uid, amount_micro, kind, desc, date, minid)
+  local key = 'tx:stream:' .. uid
+  redis.call('XADD', key, 'MINID', '~', minid, '*', 'amount_micro', amount_micro, 'type', kind,
+    'description', desc, 'date', date)
+  redis.call('EXPIRE', key, 2592000)
+end
+
+-- balance_micro of a user hash; folds a legacy float `balance` field in on first touch.
+local function balance_micro(key)
+  local v = redis.call('HGET', key, 'balance_micro')
+  if v then return tonumber(v) end
+  local legacy = tonumber(redis.call('HGET', key, 'balance'))
+  local m = legacy and math.floor(legacy * 1000000 + 0.5) or 0
+  redis.call('HSET', key, 'balance_micro', m)
+  redis.call('HDEL', key, 'balance')
+  return m
+end
+
+-- HINCRBY a balance and keep the dashboard aggregates (stats:balance_micro,
+-- stats:users_with_balance) in step. `old` is the balance before the change.
+local function apply_balance(key, old, delta)
+  local new = redis.call('HINCRBY', key, 'balance_micro', delta)
+  if delta ~= 0 then redis.call('INCRBY', 'stats:balance_micro', delta) end
+  if old == 0 and new ~= 0 then
+    redis.call('INCR', 'stats:users_with_balance')
+  elseif old ~= 0 and new == 0 then
+    redis.call('DECR', 'stats:users_with_balance')
+  end
+  return new
+end
+
+-- Fold one rental payment into the hour/day/month revenue rollups: amount, count and a per-duration
+-- split (amount:30d, count:30d, ...). Empty keys are skipped; hour/day buckets get an absolute expiry.
+local function add_revenue(hour_key, day_key, month_key, hour_exp, day_exp, amount, hours)
+  local dur = hours % 24 == 0 and string.format('%dd', hours / 24) or string.format('%dh', hours)
+  for _, k in ipairs({hour_key, day_key, month_key}) do
+    if k ~= '' then
+      redis.call('HINCRBY', k, 'amount', amount)
+      redis.call('HINCRBY', k, 'count', 1)
+      redis.call('HINCRBY', k, 'amount:' .. dur, amount)
+      redis.call('HINCRBY', k, 'count:' .. dur, 1)
+    end
+  end
+  if hour_key ~= '' then redis.call('EXPIREAT', hour_key, hour_exp) end
+  if day_key ~= '' then redis.call('EXPIREAT', day_key, day_exp) end
+end
+"""
+
+# KEYS: user:{uid}, users:all
+# ARGV: uid, balance_micro. Returns 1 if the user hash was created.
+_LUA_SET_BALANCE = _LUA_LIB + """
+local created = redis.call('EXISTS', KEYS[1]) == 0 and 1 or 0
+local old = balance_micro(KEYS[1])
+apply_balance(KEYS[1], old, tonumber(ARGV[2]) - old)
+redis.call('HSETNX', KEYS[1], 'user_id', ARGV[1])
+redis.call('SADD', KEYS[2], ARGV[1])
+return created
+"""
+
+# KEYS: user:{uid}, users:all
+# ARGV: uid, delta_micro, tx_date, tx_minid, tx_type ('' = no tx), tx_desc
+_LUA_ADJUST_BALANCE = _LUA_LIB + """
+local bal = balance_micro(KEYS[1])
+local delta = tonumber(ARGV[2])
+if bal + delta < 0 then return {'INSUFFICIENT', string.format('%d', bal)} end
+local new_bal = apply_balance(KEYS[1], bal, delta)
+redis.call('HSETNX', KEYS[1], 'user_id', ARGV[1])
+redis.call('SADD', KEYS[2], ARGV[1])
+if ARGV[5] ~= '' then push_tx(ARGV[1], ARGV[2], ARGV[5], ARGV[6], ARGV[3], ARGV[4]) end
+return {'OK', string.format('%d', new_bal)}
+"""
+
+# KEYS: user:{uid}, rental:{n}, rentals:expiry, rentals:all, rentals:user:{uid}, num_owner, users:all,
+#       revenue:h:{YYYYMMDDHH}, revenue:d:{YYYYMMDD}, revenue:m:{YYYYMM}, revenue:total:micro, revenue:events
+# ARGV: uid, number, price_micro, hours, now_ts, now_iso, tx_date, tx_minid, rent_desc, renew_desc,
+#       hour_expire_at, day_expire_at
+# A renewal extends the current expiry by `hours` (expiry = old expiry + hours); rent_date is kept.
+_LUA_RENT = _LUA_LIB + """
+local uid, number = ARGV[1], ARGV[2]
+local price, hours, now = tonumber(ARGV[3]), tonumber(ARGV[4]), tonumber(ARGV[5])
+local owner = redis.call('HGET', KEYS[2], 'user_id')
+if owner and owner ~= uid then return {'TAKEN'} end
+local old_exp = tonumber(redis.call('ZSCORE', KEYS[3], number))
+local bal = balance_micro(KEYS[1])
+if bal < price then return {'INSUFFICIENT', string.format('%d', bal)} end
+local new_bal = apply_balance(KEYS[1], bal, -price)
+
+local renewed = owner == uid and old_exp ~= nil and old_exp > now
+local rent_date, total, new_exp
+if renewed then
+  total = (tonumber(redis.call('HGET', KEYS[2], 'hours')) or 0) + hours
+  new_exp = old_exp + hours * 3600
+  rent_date = redis.call('HGET', KEYS[2], 'rent_date') or iso(new_exp - total * 3600)
+else
+  total = hours
+  new_exp = now + hours * 3600
+  rent_date = ARGV[6]
+end
+local exp_iso = iso(new_exp)
+redis.call('HSET', KEYS[2], 'number', number, 'user_id', uid, 'rent_date', rent_date,
+  'hours', total, 'expiry_date', exp_iso)
+redis.call('EXPIRE', KEYS[2], math.floor(new_exp - now) + 86400)
+redis.call('ZADD', KEYS[3], new_exp, number)
+redis.call('SADD', KEYS[4], number)
+redis.call('SADD', KEYS[5], number)
+redis.call('HSET', KEYS[6], number, uid)
+redis.call('SADD', KEYS[7], uid)
+redis.call('HSETNX', KEYS[1], 'user_id', uid)
+
+if renewed then
+  push_tx(uid, '-' .. ARGV[3], 'renewal', ARGV[10], ARGV[7], ARGV[8])
+else
+  push_tx(uid, '-' .. ARGV[3], 'rent', ARGV[9], ARGV[7], ARGV[8])
+end
+add_revenue(KEYS[8], KEYS[9], KEYS[10], ARGV[11], ARGV[12], price, hours)
+redis.call('INCRBY', KEYS[11], price)
+redis.call('XADD', KEYS[12], 'MAXLEN', '~', 100000, '*', 'user_id', uid, 'number', number,
+  'amount_micro', ARGV[3], 'hours', hours, 'renewed', renewed and '1' or '0')
+return {'OK', string.format('%d', new_bal), rent_date, tostring(total), string.format('%.6f', new_exp), exp_iso, renewed and '1' or '0'}
+"""
+
+# KEYS: rental:{n}, rentals:user:{from}, rentals:user:{to}, num_owner, transfer_history:{n}, users:all, user:{to}
+# ARGV: from_uid, to_uid, number, history_entry, tx_date, tx_minid, out_desc, in_desc
+_LUA_TRANSFER = _LUA_LIB + """
+local from, to, number = ARGV[1], ARGV[2], ARGV[3]
+if redis.call('HGET', KEYS[1], 'user_id') ~= from then return {'NOT_OWNER'} end
+local rent_date = redis.call('HGET', KEYS[1], 'rent_date')
+local hours = tonumber(redis.call('HGET', KEYS[1], 'hours')) or 0
+if not rent_date or hours <= 0 then return {'INVALID'} end
+redis.call('HSET', KEYS[1], 'user_id', to)
+redis.call('SREM', KEYS[2], number)
+redis.call('SADD', KEYS[3], number)
+redis.call('HSET', KEYS[4], number, to)
+redis.call('RPUSH', KEYS[5], ARGV[4])
+redis.call('LTRIM', KEYS[5], -1000, -1)
+redis.call('SADD', KEYS[6], to)
+redis.call('HSETNX', KEYS[7], 'user_id', to)
+balance_micro(KEYS[7])
+if ARGV[7] ~= '' then push_tx(from, '0', 'transfer_out', ARGV[7], ARGV[5], ARGV[6]) end
+if ARGV[8] ~= '' then push_tx(to, '0', 'transfer_in', ARGV[8], ARGV[5], ARGV[6]) end
+return {'OK', rent_date, tostring(hours), redis.call('HGET', KEYS[1], 'expiry_date') or ''}
+"""
+
+# KEYS: rental:{n}, rentals:expiry, rentals:all, num_owner
+# ARGV: number, expected_uid ('' = any), tx_date, tx_minid, tx_type ('' = none), tx_desc
+# Also clears stray index entries when the rental hash itself is already gone.
+_LUA_RELEASE = _LUA_LIB + """
+local function drop(n, uid)
+  redis.call('ZREM', KEYS[2], n)
+  redis.call('SREM', KEYS[3], n)
+  if uid then redis.call('SREM', 'rentals:user:' .. uid, n) end
+  local owner = redis.call('HGET', KEYS[4], n)
+  if owner and (not uid or owner == uid) then redis.call('HDEL', KEYS[4], n) end
+end
+if redis.call('EXISTS', KEYS[1]) == 1 then
+  local uid = redis.call('HGET', KEYS[1], 'user_id')
+  if ARGV[2] ~= '' and uid ~= ARGV[2] then return {'NOT_OWNER', uid or ''} end
+  redis.call('DEL', KEYS[1])
+  drop(ARGV[1], uid)
+  if uid and ARGV[5] ~= '' then push_tx(uid, '0', ARGV[5], ARGV[6], ARGV[3], ARGV[4]) end
+  return {'REMOVED', uid or ''}
+end
+local owner = redis.call('HGET', KEYS[4], ARGV[1])
+if ARGV[2] == '' or not owner or owner == ARGV[2] then drop(ARGV[1], owner) end
+return {'NOT_FOUND'}
+"""
+
+# KEYS: rental:{n}, rentals:expiry, rentals:all, rentals:user:{uid}, num_owner
+# ARGV: number, uid, rent_date_iso, hours, expiry_ts, expiry_iso, now_ts
+_LUA_SET_EXPIRY = """
+local number, uid = ARGV[1], ARGV[2]
+local owner = redis.call('HGET', KEYS[1], 'user_id')
+if owner and owner ~= uid then return {'NOT_OWNER'} end
+local exp = tonumber(ARGV[5])
+redis.call('HSET', KEYS[1], 'number', number, 'user_id', uid, 'rent_date', ARGV[3],
+  'hours', ARGV[4], 'expiry_date', ARGV[6])
+redis.call('EXPIRE', KEYS[1], math.max(0, math.floor(exp - tonumber(ARGV[7]))) + 86400)
+redis.call('ZADD', KEYS[2], exp, number)
+redis.call('SADD', KEYS[3], number)
+redis.call('SADD', KEYS[4], number)
+redis.call('HSET', KEYS[5], number, uid)
+return {'OK'}
+"""
+
+_SCRIPTS = {
+    "rent": client.register_script(_LUA_RENT),
+    "transfer": client.register_script(_LUA_TRANSFER),
+    "release": client.register_script(_LUA_RELEASE),
+    "set_expiry": client.register_script(_LUA_SET_EXPIRY),
+    "adjust_balance": client.register_script(_LUA_ADJUST_BALANCE),
+    "set_balance": client.register_script(_LUA_SET_BALANCE),
+}
+
+
+async def load_scripts() -> int:
+    """SCRIPT LOAD every registered script (startup). EVALSHA falls back to reloading on NOSCRIPT anyway."""
+    for script in _SCRIPTS.values():
+        script.sha = await client.script_load(script.script)
+    return len(_SCRIPTS)
+
+
+_TX_RETENTION = 30 * 24 * 3600
+
+
+def _tx_min_id(now: datetime) -> str:
+    """Stream id (ms) of the oldest tx still inside the retention window."""
+    return str(int((now.timestamp() - _TX_RETENTION) * 1000))
+
+
+def _tx_stamp(now: datetime):
+    """(display date, MINID) passed to scripts that append tx entries."""
+    return now.strftime("%d %b %Y, %H:%M UTC"), _tx_min_id(now)
+
+
+# Revenue rollups: revenue:h:{YYYYMMDDHH} (kept 35 days), revenue:d:{YYYYMMDD} (800 days) and
+# revenue:m:{YYYYMM} (kept forever); raw payments go to the capped revenue:events stream.
+_REVENUE_HOUR_TTL = 35 * 24 * 3600
+_REVENUE_DAY_TTL = 800 * 24 * 3600
+
+
+def _revenue_keys(at: datetime):
+    """(hour key, day key, month key, hour expire-at, day expire-at) for a payment made at `at`."""
+    hour = at.replace(minute=0, second=0, microsecond=0)
+    day = hour.replace(hour=0)
+    return (
+        f"revenue:h:{hour.strftime('%Y%m%d%H')}", f"revenue:d:{day.strftime('%Y%m%d')}",
+        f"revenue:m:{day.strftime('%Y%m')}",
+        int(hour.timestamp()) + 3600 + _REVENUE_HOUR_TTL, int(day.timestamp()) + 86400 + _REVENUE_DAY_TTL,
+    )
+
+
+async def rent_number_atomic(user_id: int, number: str, price: float, hours: int,
+                             rent_desc: str = "", renew_desc: str = ""):
+    """
+    Rent (or renew, if user already holds a live rental) number in one EVALSHA: ownership + balance
+    check, debit, rental hash + indexes, tx history and revenue rollups.
+    Returns ("OK", state), ("TAKEN", None) or ("INSUFFICIENT", {"balance": float}).
+    state: balance, rent_date, hours (total), expiry_date, renewed.
+    """
+    number = canonical(number) or str(number).strip()
+    uid = int(user_id)
+    now = _now()
+    tx_date, tx_minid = _tx_stamp(now)
+    hour_key, day_key, month_key, hour_exp, day_exp = _revenue_keys(now)
+    res = await _SCRIPTS["rent"](
+        keys=[
+            f"user:{uid}", f"rental:{number}", "rentals:expiry", "rentals:all", f"rentals:user:{uid}",
+            "num_owner", "users:all", hour_key, day_key, month_key, "revenue:total:micro", "revenue:events",
+        ],
+        args=[
+            uid, number, _to_micro(price), int(hours), now.timestamp(), now.isoformat(), tx_date, tx_minid,
+            (rent_desc or "")[:200], (renew_desc or "")[:200], hour_exp, day_exp,
+        ],
+    )
+    status = res[0]
+    _near.drop(f"user:{uid}")
+    if status == "INSUFFICIENT":
+        return status, {"balance": _from_micro(res[1])}
+    if status != "OK":
+        return status, None
+    doc = {
+        "number": number,
+        "user_id": uid,
+        "rent_date": _parse_dt(res[2]),
+        "hours": int(res[3]),
+        "expiry_date": _parse_dt(res[5]),
+    }
+    _index_put(doc)
+    state = dict(doc, balance=_from_micro(res[1]), renewed=res[6] == "1")
+    return status, state
 
-    for attempt in range(5):
-        try:
-            await client.watch(f"user:{user_id}")
-            numbers_raw = await client.hget(f"user:{user_id}", "numbers")
-            numbers = json.loads(numbers_raw) if numbers_raw else []
-            if not any(n.get("number") == number for n in numbers):
-                numbers.append({"number": number, "hours": new_hours, "date": rent_date.isoformat()})
-            async with client.pipeline(transaction=True) as pipe:
-                pipe.hset(f"user:{user_id}", "balance", new_balance)
-                pipe.hset(f"user:{user_id}", "numbers", json.dumps(numbers))
-                pipe.hset(f"rental:{number}", mapping={
-                    "number": number,
-                    "user_id": user_id,
-                    "rent_date": rent_date.isoformat(),
-                    "hours": new_hours,
-                    "expiry_date": expiry.isoformat(),
-                })
-                pipe.zadd("rentals:expiry", {number: expiry.timestamp()})
-                pipe.sadd("rentals:all", number)
-                pipe.sadd(f"rentals:user:{user_id}", number)
-                pipe.hset("num_owner", number, user_id)
-                await pipe.execute()
-            break
-        except WatchError:
-            if attempt == 4:
-                raise
-            await asyncio.sleep(0.05 * (attempt + 1))
-        finally:
-            await client.unwatch()
-    global _rentals_cache
-    _rentals_cache = (0.0, [])
+
+async def release_rental(number: str, user_id: int = None, tx_type: str = None, description: str = ""):
+    """
+    Delete a rental and every index entry for it in one EVALSHA (cancel / expiry cleanup).
+    If user_id is given the rental must belong to that user. tx_type records a zero-amount tx for the owner.
+    Returns (True, "REMOVED", owner_id) or (False, "NOT_FOUND" | "NOT_OWNER", owner_id | None).
+    """
+    n = canonical(number) or str(number or "").strip()
+    now = _now()
+    tx_date, tx_minid = _tx_stamp(now)
+    res = await _SCRIPTS["release"](
+        keys=[f"rental:{n}", "rentals:expiry", "rentals:all", "num_owner"],
+        args=[n, "" if user_id is None else int(user_id), tx_date, tx_minid, tx_type or "", (description or "")[:200]],
+    )
+    if res[0] == "NOT_OWNER":
+        return False, res[0], int(res[1]) if res[1] else None
+    _index_drop(n)
+    if res[0] != "REMOVED":
+        return False, res[0], None
+    return True, "REMOVED", int(res[1]) if res[1] else None
+
+
+async def set_rental_hours(number: str, user_id: int, rent_date: datetime, hours: int):
+    """Rewrite a rental's rent_date/hours (admin expiry edit) and its indexes in one EVALSHA. Returns (ok, status)."""
+    number = canonical(number) or str(number).strip()
+    uid = int(user_id)
+    rent_date = _parse_dt(rent_date) or _now()
+    hours = int(hours)
+    expiry = rent_date + timedelta(hours=hours)
+    res = await _SCRIPTS["set_expiry"](
+        keys=[f"rental:{number}", "rentals:expiry", "rentals:all", f"rentals:user:{uid}", "num_owner"],
+        args=[number, uid, rent_date.isoformat(), hours, expiry.timestamp(), expiry.isoformat(), _now().timestamp()],
+    )
+    if res[0] != "OK":
+        return False, res[0]
+    _index_put({"number": number, "user_id": uid, "rent_date": rent_date, "hours": hours, "expiry_date": expiry})
+    return True, "UPDATED"
 
 
 async def lock_number_for_rent(number: str, user_id: int, ttl: int = 60) -> bool:
@@ -742,22 +1312,9 @@ async def get_number_lock_owner(number: str):
     return int(val) if val else None
 
 
-async def append_transfer_history(number: str, from_user_id: int, to_user_id: int):
-    """Append an immutable transfer record for a number (audit trail)."""
-    number = _norm_num(number) or number
-    key = f"transfer_history:{number}"
-    entry = json.dumps({
-        "from_user_id": from_user_id,
-        "to_user_id": to_user_id,
-        "timestamp": _now().isoformat(),
-    })
-    await client.rpush(key, entry)
-    await client.ltrim(key, -1000, -1)  # Keep last 1000 entries per number
-
-
 async def get_transfer_history(number: str, limit: int = 50):
     """Return recent transfer history for a number (newest last)."""
-    number = _norm_num(number) or number
+    number = canonical(number) or number
     key = f"transfer_history:{number}"
     raw = await client.lrange(key, -limit, -1)
     out = []
@@ -790,8 +1347,41 @@ async def is_payment_processed_crypto(inv_id: str) -> bool:
     return await client.exists(f"processed_crypto:{inv_id}")
 
 
-async def mark_payment_processed_crypto(inv_id: str):
-    await client.set(f"processed_crypto:{inv_id}", "1", ex=_PROCESSED_TTL)
+# KEYS: processed_crypto:{id}, inv_amount:{id}, user:{uid}, users:all
+# ARGV: uid, fallback_micro, processed_ttl, tx_date, tx_minid, description
+# inv_amount:{id} holds the USDT amount as written at invoice creation; it is converted to micro here.
+# SET NX on the processed marker is the settlement gate: only the call that creates it credits.
+_LUA_SETTLE = _LUA_LIB + """
+if not redis.call('SET', KEYS[1], '1', 'NX', 'EX', ARGV[3]) then return {'0'} end
+local raw = tonumber(redis.call('GET', KEYS[2]))
+local credit = raw and math.floor(raw * 1000000 + 0.5) or tonumber(ARGV[2])
+redis.call('DEL', KEYS[2])
+redis.call('HSETNX', KEYS[3], 'user_id', ARGV[1])
+local bal = apply_balance(KEYS[3], balance_micro(KEYS[3]), credit)
+redis.call('SADD', KEYS[4], ARGV[1])
+push_tx(ARGV[1], string.format('%d', credit), 'deposit', ARGV[6], ARGV[4], ARGV[5])
+return {'1', string.format('%d', credit), string.format('%d', bal)}
+"""
+_SCRIPTS["settle"] = client.register_script(_LUA_SETTLE)
+
+
+async def settle_crypto_invoice(inv_id, user_id: int, fallback_amount, description: str = "Balance top-up via CryptoBot"):
+    """
+    Settle a paid CryptoBot invoice in one EVALSHA: claim processed_crypto:{id}, credit inv_amount:{id}
+    (or fallback_amount) with HINCRBY (micro-USDT), drop inv_amount and append the deposit tx.
+    Returns (True, credit, new_balance) if this call settled it, else (False, 0.0, None) — already settled.
+    """
+    uid = int(user_id)
+    now = _now()
+    tx_date, tx_minid = _tx_stamp(now)
+    res = await _SCRIPTS["settle"](
+        keys=[f"processed_crypto:{inv_id}", f"inv_amount:{inv_id}", f"user:{uid}", "users:all"],
+        args=[uid, _to_micro(fallback_amount), _PROCESSED_TTL, tx_date, tx_minid, description[:200]],
+    )
+    _near.drop(f"user:{uid}")
+    if res[0] != "1":
+        return False, 0.0, None
+    return True, _from_micro(res[1]), _from_micro(res[2])
 
 
 # ========= INV_DICT persistence (CryptoBot invoice -> message) =========
@@ -839,89 +1429,991 @@ async def delete_pending_check(check_id: str):
 
 
 # ========= ADMIN AUDIT LOG =========
-async def log_admin_action(admin_id: int, action: str, target: str, details: str = None):
-    """Append an immutable admin action log entry."""
-    entry = json.dumps({
-        "admin_id": admin_id,
-        "action": action,
-        "target": str(target),
-        "timestamp": _now().isoformat(),
-        "details": details or "",
-    })
-    await client.rpush("admin_audit_log", entry)
-    await client.ltrim("admin_audit_log", -50000, -1)  # Keep last 50k entries
+# Entries live in the audit:log stream (MINID-trimmed to 365 days). audit:admin:{id}, audit:action:{action}
+# and audit:target:{target} are zsets of entry ids scored by their ms timestamp, so a filtered query walks
+# only the smallest matching index and fetches only the entries that match every filter.
+_AUDIT_RETENTION = 365 * 24 * 3600
+
+# KEYS: audit:log, audit:admin:{id}, audit:action:{action}, audit:target:{target}
+# ARGV: minid_ms, admin_id, action, target, timestamp_iso, details
+_LUA_AUDIT_LOG = """
+local id = redis.call('XADD', KEYS[1], 'MINID', ARGV[1], '*', 'admin_id', ARGV[2], 'action', ARGV[3],
+  'target', ARGV[4], 'timestamp', ARGV[5], 'details', ARGV[6])
+local ms = string.match(id, '^(%d+)')
+for i = 2, 4 do
+  redis.call('ZADD', KEYS[i], ms, id)
+  redis.call('ZREMRANGEBYSCORE', KEYS[i], '-inf', '(' .. ARGV[1])
+  redis.call('EXPIRE', KEYS[i], 31536000)
+end
+return id
+"""
+
+# KEYS: audit:log, index zsets to intersect (none = unfiltered)
+# ARGV: max_ms, min_ms, cursor id ('' = newest), limit, scan budget
+# Returns {next cursor ('' when exhausted), entries...}, newest first.
+_LUA_AUDIT_QUERY = """
+local max, min, cursor, limit = ARGV[1], ARGV[2], ARGV[3], tonumber(ARGV[4])
+local function older(a, b)
+  local am, as = string.match(a, '^(%d+)-(%d+)$')
+  local bm, bs = string.match(b, '^(%d+)-(%d+)$')
+  am, bm = tonumber(am), tonumber(bm)
+  return am < bm or (am == bm and tonumber(as) < tonumber(bs))
+end
+if #KEYS == 1 then
+  local hi = cursor ~= '' and '(' .. cursor or max
+  local rows = redis.call('XREVRANGE', KEYS[1], hi, min, 'COUNT', limit)
+  local next = #rows == limit and rows[#rows][1] or ''
+  return {next, unpack(rows)}
+end
+local drive, others = KEYS[2], {}
+for i = 2, #KEYS do
+  if redis.call('ZCARD', KEYS[i]) < redis.call('ZCARD', drive) then drive = KEYS[i] end
+end
+for i = 2, #KEYS do
+  if KEYS[i] ~= drive then table.insert(others, KEYS[i]) end
+end
+local hi = cursor ~= '' and string.match(cursor, '^(%d+)') or (max == '+' and '+inf' or max)
+if min == '-' then min = '-inf' end
+local out, scanned, offset, last, done = {}, 0, 0, '', false
+while #out < limit and scanned < tonumber(ARGV[5]) do
+  local ids = redis.call('ZREVRANGEBYSCORE', drive, hi, min, 'LIMIT', offset, 100)
+  if #ids == 0 then done = true; break end
+  offset = offset + #ids
+  for _, id in ipairs(ids) do
+    if cursor == '' or older(id, cursor) then
+      scanned = scanned + 1
+      last = id
+      local ok = true
+      for _, k in ipairs(others) do
+        if not redis.call('ZSCORE', k, id) then ok = false; break end
+      end
+      if ok then
+        local row = redis.call('XRANGE', KEYS[1], id, id)[1]
+        if row then table.insert(out, row) end
+        if #out >= limit then break end
+      end
+    end
+  end
+end
+return {done and '' or last, unpack(out)}
+"""
+_SCRIPTS["audit_log"] = client.register_script(_LUA_AUDIT_LOG)
+_SCRIPTS["audit_query"] = client.register_script(_LUA_AUDIT_QUERY)
+
+
+def _audit_target(target) -> str:
+    return canonical(target) or str(target).strip()
 
 
-async def record_revenue(user_id: int, number: str, amount: float, hours: int):
-    """Record a completed rental payment for revenue tracking."""
+async def log_admin_action(admin_id: int, action: str, target: str, details: str = None):
+    """Append an immutable admin action log entry (stream entry + its three index entries, one EVALSHA)."""
     now = _now()
-    entry = {
-        "user_id": user_id,
-        "number": number,
-        "amount": str(amount),
-        "hours": hours,
-        "timestamp": now.isoformat(),
-    }
-    key = f"revenue:{now.strftime('%Y%m')}:{user_id}:{now.timestamp()}"
-    await client.hset(key, mapping=entry)
-    await client.zadd("revenue:all", {key: now.timestamp()})
-    # Increment total
-    await client.incrbyfloat("revenue:total", amount)
-    # Monthly revenue (for stats breakdown)
-    month_key = f"revenue:month:{now.strftime('%Y%m')}"
-    await client.incrbyfloat(month_key, amount)
-    await client.expire(month_key, 90 * 24 * 3600)
+    target = _audit_target(target)
+    min_id = str(int((now.timestamp() - _AUDIT_RETENTION) * 1000))
+    await _SCRIPTS["audit_log"](
+        keys=["audit:log", f"audit:admin:{admin_id}", f"audit:action:{action}", f"audit:target:{target}"],
+        args=[min_id, admin_id, action, target, now.isoformat(), (details or "")[:1000]],
+    )
+
+
+async def query_admin_audit(admin_id: int = None, action: str = None, target: str = None,
+                            since: datetime = None, until: datetime = None, before: str = None,
+                            limit: int = 10):
+    """
+    Newest-first audit entries matching every given filter, one EVALSHA per page.
+    before is the cursor returned by the previous page. Returns (entries, next_cursor or None); one extra
+    entry is read ahead, so next_cursor is only set when an older page has entries (or the per-page scan
+    budget ran out before the filters were exhausted).
+    """
+    keys = ["audit:log"]
+    if admin_id is not None:
+        keys.append(f"audit:admin:{int(admin_id)}")
+    if action:
+        keys.append(f"audit:action:{action}")
+    if target:
+        keys.append(f"audit:target:{_audit_target(target)}")
+    res = await _SCRIPTS["audit_query"](
+        keys=keys,
+        args=[
+            int(until.timestamp() * 1000) if until else "+",
+            int(since.timestamp() * 1000) if since else "-",
+            before or "", int(limit) + 1, 5000,
+        ],
+    )
+    next_cursor = res[0] or None
+    entries = []
+    for entry_id, fields in res[1:]:
+        f = dict(zip(fields[::2], fields[1::2]))
+        entries.append({
+            "id": entry_id,
+            "admin_id": int(f.get("admin_id") or 0),
+            "action": f.get("action", ""),
+            "target": f.get("target", ""),
+            "timestamp": _parse_dt(f.get("timestamp")),
+            "details": f.get("details", ""),
+        })
+    if len(entries) > limit:
+        entries = entries[:limit]
+        next_cursor = entries[-1]["id"]
+    return entries, next_cursor
+
+
+_AUDIT_QUERY_TTL = 3600
+
+
+async def save_audit_query(query: dict) -> str:
+    """Park a resolved /audit query (absolute since/until) under a short token for its paging buttons."""
+    token = os.urandom(4).hex()
+    doc = {k: (int(v.timestamp() * 1000) if isinstance(v, datetime) else v) for k, v in query.items()}
+    await client.set(f"audit:q:{token}", json.dumps(doc), ex=_AUDIT_QUERY_TTL)
+    return token
+
+
+async def load_audit_query(token: str):
+    """The query saved by save_audit_query, with since/until back as datetimes, or None once expired."""
+    raw = await client.get(f"audit:q:{token}")
+    if not raw:
+        return None
+    doc = json.loads(raw)
+    for k in ("since", "until"):
+        if doc.get(k) is not None:
+            doc[k] = datetime.fromtimestamp(doc[k] / 1000, tz=timezone.utc)
+    return doc
 
 
 async def get_total_revenue() -> float:
     """Get total revenue across all time."""
-    val = await client.get("revenue:total")
-    return float(val) if val else 0.0
+    return _from_micro(await client.get("revenue:total:micro"))
 
 
-async def record_transaction(user_id: int, amount: float, tx_type: str, description: str):
-    """Record a transaction. Auto-expires after 30 days."""
-    from datetime import datetime, timezone
-    now = datetime.now(timezone.utc)
-    rand = random.randint(1000, 9999)
-    key = f"tx:{user_id}:{int(now.timestamp())}:{rand}"
-    await client.hset(key, mapping={
-        "user_id": str(user_id),
-        "amount": str(amount),
-        "type": tx_type,
-        "description": description[:200] if description else "",
-        "date": now.strftime("%d %b %Y, %H:%M UTC"),
-    })
-    await client.expire(key, 30 * 24 * 3600)
-    list_key = f"tx:list:{user_id}"
-    await client.rpush(list_key, key)
-    await client.expire(list_key, 30 * 24 * 3600)
-
-
-async def get_user_transactions(user_id: int, page: int = 0, per_page: int = 5) -> tuple:
-    """Get transactions for user with pagination. Returns (txs, total_count)."""
-    list_key = f"tx:list:{user_id}"
-    total = await client.llen(list_key)
-    if total == 0:
-        return [], 0
-    # Get the slice for this page (newest first)
-    start = -(page + 1) * per_page
-    end = -page * per_page - 1 if page > 0 else -1
-    keys = await client.lrange(list_key, start, end)
-    if not keys:
-        return [], total
+async def get_month_revenue(month: str) -> float:
+    """Revenue for one calendar month (month as YYYYMM)."""
+    return _from_micro(await client.hget(f"revenue:m:{month}", "amount"))
+
+
+def _parse_revenue_bucket(raw: dict) -> dict:
+    """Rollup hash -> {"amount", "count", "by_duration": {"30d": {"amount", "count"}, ...}}."""
+    out = {"amount": _from_micro(raw.get("amount")), "count": int(raw.get("count") or 0), "by_duration": {}}
+    for field, value in raw.items():
+        if field.startswith("amount:"):
+            dur = out["by_duration"].setdefault(field[7:], {"amount": 0.0, "count": 0})
+            dur["amount"] = _from_micro(value)
+        elif field.startswith("count:"):
+            dur = out["by_duration"].setdefault(field[6:], {"amount": 0.0, "count": 0})
+            dur["count"] = int(value or 0)
+    return out
+
+
+def _next_month(t: datetime) -> datetime:
+    return t.replace(year=t.year + 1, month=1) if t.month == 12 else t.replace(month=t.month + 1)
+
+
+_REVENUE_STEPS = {
+    "hour": ("revenue:h:", "%Y%m%d%H"),
+    "day": ("revenue:d:", "%Y%m%d"),
+    "month": ("revenue:m:", "%Y%m"),
+}
+
+
+def _revenue_cover(start: datetime, end: datetime):
+    """
+    Fewest rollup keys covering [start, end): whole months, then whole days, hours at the ragged edges.
+    A start older than the hourly retention is rounded down to its day.
+    """
+    t = start.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if t.timestamp() < _now().timestamp() - _REVENUE_HOUR_TTL:
+        t = t.replace(hour=0)
+    end = end.astimezone(timezone.utc)
+    keys = []
+    while t < end:
+        if t.day == 1 and t.hour == 0 and _next_month(t) <= end:
+            keys.append(f"revenue:m:{t.strftime('%Y%m')}")
+            t = _next_month(t)
+        elif t.hour == 0 and t + timedelta(days=1) <= end:
+            keys.append(f"revenue:d:{t.strftime('%Y%m%d')}")
+            t += timedelta(days=1)
+        else:
+            keys.append(f"revenue:h:{t.strftime('%Y%m%d%H')}")
+            t += timedelta(hours=1)
+    return keys
+
+
+async def get_revenue_series(start: datetime, end: datetime, step: str = "day") -> list:
+    """
+    Revenue per hour/day/month bucket in [start, end), one pipelined HGETALL per bucket.
+    Returns [{"bucket": datetime, "amount", "count", "by_duration"}, ...]. Hourly buckets are kept 35 days.
+    """
+    prefix, fmt = _REVENUE_STEPS[step]
+    t = start.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if step != "hour":
+        t = t.replace(hour=0)
+    if step == "month":
+        t = t.replace(day=1)
+    buckets = []
+    while t < end and len(buckets) < 2000:
+        buckets.append(t)
+        t = _next_month(t) if step == "month" else t + (timedelta(hours=1) if step == "hour" else timedelta(days=1))
+    async with client.pipeline(transaction=False) as pipe:
+        for b in buckets:
+            pipe.hgetall(f"{prefix}{b.strftime(fmt)}")
+        raws = await pipe.execute()
+    return [dict(_parse_revenue_bucket(raw or {}), bucket=b) for b, raw in zip(buckets, raws)]
+
+
+async def get_revenue_window(start: datetime, end: datetime) -> dict:
+    """Total revenue in [start, end) (hour resolution) from the coarsest rollups that tile the window, one round trip."""
+    keys = _revenue_cover(start, end)
+    async with client.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.hgetall(key)
+        raws = await pipe.execute()
+    total = {"amount": 0.0, "count": 0, "by_duration": {}}
+    micro, by_dur = 0, {}
+    for raw in raws:
+        for field, value in (raw or {}).items():
+            if field == "amount":
+                micro += int(value)
+            elif field == "count":
+                total["count"] += int(value)
+            else:
+                by_dur[field] = by_dur.get(field, 0) + int(value)
+    total["amount"] = _from_micro(micro)
+    total["by_duration"] = _parse_revenue_bucket(by_dur)["by_duration"]
+    return total
+
+
+async def get_user_transactions(user_id: int, per_page: int = 5, before: str = None, after: str = None) -> tuple:
+    """
+    One page of a user's transactions, newest first, in one round trip (XLEN + XREVRANGE). Retention is
+    enforced on the write path (push_tx trims with MINID ~), so reads never trim.
+    before=<stream id> gives the page of older entries, after=<stream id> the page of newer ones.
+    Returns (txs, total); each tx carries its stream "id" and "amount" in USDT.
+    """
+    key = f"tx:stream:{user_id}"
+    async with client.pipeline(transaction=False) as pipe:
+        pipe.xlen(key)
+        if after:
+            pipe.xrange(key, min=f"({after}", max="+", count=per_page)
+        else:
+            pipe.xrevrange(key, max=f"({before}" if before else "+", min="-", count=per_page)
+        total, rows = await pipe.execute()
+    if after:
+        rows = list(reversed(rows))
     txs = []
-    for k in reversed(keys):
-        data = await client.hgetall(k)
-        if data:
-            txs.append(data)
+    for entry_id, fields in rows:
+        tx = dict(fields)
+        tx["id"] = entry_id
+        tx["amount"] = _from_micro(tx.pop("amount_micro", 0))
+        txs.append(tx)
     return txs, total
 
 
+# ========= BROADCASTS (resumable) =========
+# broadcast:{id}          hash: source chat/message, status message, SSCAN cursor, counters, state
+# broadcast:{id}:outcome  hash: user_id -> ok | blocked | failed (a user is never sent twice)
+# broadcast:active        set of ids still running (resumed on startup)
+_BROADCAST_RETENTION = 7 * 24 * 3600
+
+
+async def create_broadcast(from_chat_id: int, message_id: int, status_chat_id: int, status_message_id: int) -> int:
+    bid = int(await client.incr("broadcast:seq"))
+    async with client.pipeline(transaction=True) as pipe:
+        pipe.hset(f"broadcast:{bid}", mapping={
+            "from_chat_id": from_chat_id,
+            "message_id": message_id,
+            "status_chat_id": status_chat_id,
+            "status_message_id": status_message_id,
+            "cursor": 0,
+            "sent": 0,
+            "blocked": 0,
+            "failed": 0,
+            "total": await client.scard("users:all"),
+            "state": "running",
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        })
+        pipe.sadd("broadcast:active", bid)
+        await pipe.execute()
+    return bid
+
+
+async def get_broadcast(bid: int):
+    data = await client.hgetall(f"broadcast:{bid}")
+    return data or None
+
+
+async def get_active_broadcasts():
+    return sorted(int(x) for x in (await client.smembers("broadcast:active") or []))
+
+
+async def scan_user_ids(cursor: int = 0, count: int = 200):
+    """One SSCAN step over users:all. Returns (next_cursor, [user_id]); next_cursor 0 means done."""
+    cursor, members = await client.sscan("users:all", cursor=cursor, count=count)
+    return int(cursor), [int(x) for x in members]
+
+
+async def get_broadcast_done(bid: int, user_ids) -> set:
+    """User ids in this batch that already have an outcome (SSCAN may repeat members; resume re-runs a page)."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return set()
+    outcomes = await client.hmget(f"broadcast:{bid}:outcome", user_ids)
+    return {uid for uid, o in zip(user_ids, outcomes) if o is not None}
+
+
+# KEYS: broadcast:{id}:outcome, broadcast:{id}; ARGV: user_id, outcome, counter field
+# The first outcome recorded for a user wins and bumps its counter once, so a resumed page never double counts.
+_LUA_BROADCAST_OUTCOME = """
+if redis.call('HSETNX', KEYS[1], ARGV[1], ARGV[2]) == 1 then
+  redis.call('HINCRBY', KEYS[2], ARGV[3], 1)
+end
+"""
+_SCRIPTS["broadcast_outcome"] = client.register_script(_LUA_BROADCAST_OUTCOME)
+_BROADCAST_COUNTERS = {"ok": "sent", "blocked": "blocked", "failed": "failed"}
+
+
+async def record_broadcast_outcome(bid: int, user_id: int, outcome: str):
+    """Persist one user's outcome (ok | blocked | failed) and its counter as soon as the send completes."""
+    await _SCRIPTS["broadcast_outcome"](
+        keys=[f"broadcast:{bid}:outcome", f"broadcast:{bid}"],
+        args=[user_id, outcome, _BROADCAST_COUNTERS[outcome]],
+    )
+
+
+async def checkpoint_broadcast(bid: int, next_cursor: int):
+    """Advance the stored SSCAN cursor once every user of the page has an outcome."""
+    await client.hset(f"broadcast:{bid}", "cursor", next_cursor)
+
+
+async def set_broadcast_state(bid: int, state: str):
+    """running -> done | cancelled | failed. Finished broadcasts leave broadcast:active and expire after a week."""
+    async with client.pipeline(transaction=True) as pipe:
+        pipe.hset(f"broadcast:{bid}", "state", state)
+        if state != "running":
+            pipe.hset(f"broadcast:{bid}", "finished_at", datetime.now(timezone.utc).isoformat())
+            pipe.srem("broadcast:active", bid)
+            pipe.expire(f"broadcast:{bid}", _BROADCAST_RETENTION)
+            pipe.expire(f"broadcast:{bid}:outcome", _BROADCAST_RETENTION)
+        await pipe.execute()
+
+
+# ========= MIGRATIONS =========
+# Batched, idempotent data rewrites run on demand via /migrate <name>. Completed runs are recorded
+# in the migrations:done hash (name -> JSON {at, result}).
+async def migrate_numbers_blob(batch_size: int = 200) -> dict:
+    """
+    Fold legacy user:{uid}.numbers JSON blobs into rentals:user:{uid} / num_owner. A live blob entry
+    with no rental:{number} hash gets one (plus expiry/all indexes); expired or foreign entries are dropped.
+    The numbers field is deleted afterwards. SSCAN over users:all, pipelined per batch.
+    """
+    stats = {"users": 0, "linked": 0, "rentals_created": 0, "dropped": 0}
+    now = _now()
+    cursor = 0
+    while True:
+        cursor, uids = await client.sscan("users:all", cursor=cursor, count=batch_size)
+        if uids:
+            async with client.pipeline(transaction=False) as pipe:
+                for uid in uids:
+                    pipe.hget(f"user:{uid}", "numbers")
+                blobs = await pipe.execute()
+            entries, blob_owners = [], []
+            for uid, raw in zip(uids, blobs):
+                if raw is None:
+                    continue
+                blob_owners.append(uid)
+                try:
+                    items = json.loads(raw)
+                except (json.JSONDecodeError, TypeError):
+                    items = []
+                for item in items:
+                    if isinstance(item, dict) and item.get("number"):
+                        entries.append((str(uid), canonical(item["number"]) or item["number"], item))
+            if entries:
+                async with client.pipeline(transaction=False) as pipe:
+                    for _, number, _ in entries:
+                        pipe.hgetall(f"rental:{number}")
+                    rentals = await pipe.execute()
+            else:
+                rentals = []
+            async with client.pipeline(transaction=False) as pipe:
+                for (uid, number, item), rental in zip(entries, rentals):
+                    if rental:
+                        if str(rental.get("user_id")) != uid:
+                            stats["dropped"] += 1
+                            continue
+                    else:
+                        rent_date = _parse_dt(item.get("date"))
+                        hours = int(item.get("hours") or 0)
+                        expiry = rent_date + timedelta(hours=hours) if rent_date and hours else None
+                        if not expiry or expiry <= now:
+                            stats["dropped"] += 1
+                            continue
+                        pipe.hset(f"rental:{number}", mapping={
+                            "number": number,
+                            "user_id": uid,
+                            "rent_date": rent_date.isoformat(),
+                            "hours": hours,
+                            "expiry_date": expiry.isoformat(),
+                        })
+                        pipe.zadd("rentals:expiry", {number: expiry.timestamp()})
+                        pipe.sadd("rentals:all", number)
+                        stats["rentals_created"] += 1
+                    pipe.sadd(f"rentals:user:{uid}", number)
+                    pipe.hset("num_owner", number, uid)
+                    stats["linked"] += 1
+                for uid in blob_owners:
+                    pipe.hdel(f"user:{uid}", "numbers")
+                await pipe.execute()
+            stats["users"] += len(blob_owners)
+        if int(cursor) == 0:
+            break
+    await resync_rentals_index()
+    return stats
+
+
+# Per-key float -> micro conversion, atomic against concurrent scripts touching the same keys.
+# ARGV[1] = 'balance' (KEYS: user hashes), 'counter' (KEYS[1] float string -> KEYS[2] micro counter, TTL kept)
+# or 'amount' (KEYS: hashes with a float `amount` field). Returns how many keys were converted.
+_LUA_MIGRATE_MONEY = _LUA_LIB + """
+local n = 0
+if ARGV[1] == 'balance' then
+  for _, key in ipairs(KEYS) do
+    if redis.call('HEXISTS', key, 'balance') == 1 then
+      balance_micro(key)
+      redis.call('HDEL', key, 'balance')
+      n = n + 1
+    end
+  end
+elseif ARGV[1] == 'counter' then
+  local v = tonumber(redis.call('GET', KEYS[1]))
+  if v then
+    local ttl = redis.call('PTTL', KEYS[1])
+    redis.call('INCRBY', KEYS[2], math.floor(v * 1000000 + 0.5))
+    redis.call('DEL', KEYS[1])
+    if ttl > 0 then redis.call('PEXPIRE', KEYS[2], ttl) end
+    n = 1
+  end
+else
+  for _, key in ipairs(KEYS) do
+    local v = tonumber(redis.call('HGET', key, 'amount'))
+    if v then
+      redis.call('HSET', key, 'amount_micro', math.floor(v * 1000000 + 0.5))
+      redis.call('HDEL', key, 'amount')
+      n = n + 1
+    end
+  end
+end
+return n
+"""
+_SCRIPTS["migrate_money"] = client.register_script(_LUA_MIGRATE_MONEY)
+
+
+async def migrate_money_to_micro(batch_size: int = 200) -> dict:
+    """
+    Convert float money to integer micro-USDT: user balances (SSCAN users:all), revenue:total and
+    revenue:month:{YYYYMM} counters, and revenue entry hashes (revenue:all). Legacy tx:* hashes are
+    converted by the txstream migration.
+    """
+    stats = {"balances": 0, "counters": 0, "revenue_entries": 0}
+    script = _SCRIPTS["migrate_money"]
+    cursor = 0
+    while True:
+        cursor, uids = await client.sscan("users:all", cursor=cursor, count=batch_size)
+        if uids:
+            stats["balances"] += await script(keys=[f"user:{uid}" for uid in uids], args=["balance"])
+        if int(cursor) == 0:
+            break
+    counters = [("revenue:total", "revenue:total:micro")]
+    async for key in client.scan_iter(match="revenue:month:*", count=batch_size):
+        if not key.endswith(":micro"):
+            counters.append((key, f"{key}:micro"))
+    for src, dst in counters:
+        stats["counters"] += await script(keys=[src, dst], args=["counter"])
+    entries = await client.zrange("revenue:all", 0, -1)
+    for i in range(0, len(entries), batch_size):
+        stats["revenue_entries"] += await script(keys=entries[i:i + batch_size], args=["amount"])
+    return stats
+
+
+# KEYS: tx:list:{uid}, tx:stream:{uid}; ARGV: minid_ms
+# Moves one user's legacy tx:{uid}:{ts}:{rand} hashes into the stream (ids from their timestamps),
+# ahead of any entries already written there, then deletes the hashes and the list.
+_LUA_MIGRATE_TX = """
+local minid = tonumber(ARGV[1])
+local legacy = {}
+for _, k in ipairs(redis.call('LRANGE', KEYS[1], 0, -1)) do
+  local h = redis.call('HGETALL', k)
+  local ms = (tonumber(string.match(k, ':(%d+):%d+$')) or 0) * 1000
+  if #h > 0 and ms >= minid then
+    local fields = {}
+    for i = 1, #h, 2 do
+      if h[i] == 'amount' then
+        table.insert(fields, 'amount_micro')
+        table.insert(fields, string.format('%d', math.floor((tonumber(h[i + 1]) or 0) * 1000000 + 0.5)))
+      elseif h[i] ~= 'user_id' then
+        table.insert(fields, h[i])
+        table.insert(fields, h[i + 1])
+      end
+    end
+    table.insert(legacy, {ms, fields})
+  end
+  redis.call('DEL', k)
+end
+redis.call('DEL', KEYS[1])
+if #legacy == 0 then return 0 end
+table.sort(legacy, function(a, b) return a[1] < b[1] end)
+local existing = redis.call('XRANGE', KEYS[2], '-', '+')
+local first_ms = existing[1] and tonumber(string.match(existing[1][1], '^(%d+)')) or math.huge
+redis.call('DEL', KEYS[2])
+local moved, last_ms, seq = 0, -1, 0
+for _, e in ipairs(legacy) do
+  if e[1] < first_ms then
+    if e[1] == last_ms then seq = seq + 1 else last_ms, seq = e[1], 0 end
+    redis.call('XADD', KEYS[2], string.format('%d-%d', e[1], seq), unpack(e[2]))
+    moved = moved + 1
+  end
+end
+for _, e in ipairs(existing) do
+  redis.call('XADD', KEYS[2], e[1], unpack(e[2]))
+end
+redis.call('EXPIRE', KEYS[2], 2592000)
+return moved
+"""
+_SCRIPTS["migrate_tx"] = client.register_script(_LUA_MIGRATE_TX)
+
+
+async def migrate_tx_lists(batch_size: int = 200) -> dict:
+    """Fold legacy tx:list:{uid} + tx:{uid}:* hashes into tx:stream:{uid} (one script call per user)."""
+    stats = {"users": 0, "moved": 0}
+    min_id = _tx_min_id(_now())
+    async for key in client.scan_iter(match="tx:list:*", count=batch_size):
+        uid = key.rsplit(":", 1)[-1]
+        stats["moved"] += await _SCRIPTS["migrate_tx"](keys=[key, f"tx:stream:{uid}"], args=[min_id])
+        stats["users"] += 1
+    return stats
+
+
+# KEYS: revenue entry hashes (revenue:{YYYYMM}:{uid}:{ts}), revenue:all
+# ARGV: per entry (hour key, day key, month key, hour expire-at, day expire-at); '' skips a bucket.
+# Folds each entry into the rollups, then deletes it and drops it from revenue:all. Safe to re-run.
+_LUA_COMPACT_REVENUE = _LUA_LIB + """
+local idx = #KEYS
+local n = 0
+for i = 1, idx - 1 do
+  local a = (i - 1) * 5
+  local v = redis.call('HMGET', KEYS[i], 'amount_micro', 'amount', 'hours')
+  local amount = tonumber(v[1]) or (tonumber(v[2]) and math.floor(tonumber(v[2]) * 1000000 + 0.5))
+  if amount then
+    add_revenue(ARGV[a + 1], ARGV[a + 2], ARGV[a + 3], ARGV[a + 4], ARGV[a + 5], amount, tonumber(v[3]) or 0)
+    n = n + 1
+  end
+  redis.call('DEL', KEYS[i])
+  redis.call('ZREM', KEYS[idx], KEYS[i])
+end
+return n
+"""
+_SCRIPTS["compact_revenue"] = client.register_script(_LUA_COMPACT_REVENUE)
+
+
+async def compact_revenue_entries(batch_size: int = 200) -> dict:
+    """
+    Fold the permanent per-payment revenue hashes (revenue:all) into the hour/day/month rollups and
+    delete them, then drop the old revenue:month:{YYYYMM}[:micro] counters. Hour buckets already past
+    their retention are skipped. revenue:total:micro is untouched (it already counts every entry).
+    """
+    stats = {"entries": 0, "counters": 0}
+    now_ts = _now().timestamp()
+    while True:
+        page = await client.zrange("revenue:all", 0, batch_size - 1, withscores=True)
+        if not page:
+            break
+        args = []
+        for _, ts in page:
+            hour_key, day_key, month_key, hour_exp, day_exp = _revenue_keys(datetime.fromtimestamp(ts, timezone.utc))
+            args += [
+                hour_key if hour_exp > now_ts else "", day_key if day_exp > now_ts else "", month_key,
+                hour_exp, day_exp,
+            ]
+        stats["entries"] += await _SCRIPTS["compact_revenue"](keys=[k for k, _ in page] + ["revenue:all"], args=args)
+    async for key in client.scan_iter(match="revenue:month:*", count=batch_size):
+        stats["counters"] += await client.delete(key)
+    return stats
+
+
+# KEYS: admin_audit_log, audit:log; ARGV: minid_ms
+# Moves the legacy JSON list into the stream (ids from each entry's timestamp) ahead of any entries
+# already written there, indexes the moved entries, then deletes the list.
+_LUA_MIGRATE_AUDIT = """
+local function epoch_ms(s)
+  local y, m, d, H, M, S, frac = string.match(s or '', '^(%d+)-(%d+)-(%d+)T(%d+):(%d+):(%d+)%.?(%d*)')
+  if not y then return nil end
+  y, m, d = tonumber(y), tonumber(m), tonumber(d)
+  if m <= 2 then y = y - 1 end
+  local era = math.floor(y / 400)
+  local yoe = y - era * 400
+  local doy = math.floor((153 * ((m + 9) % 12) + 2) / 5) + d - 1
+  local doe = yoe * 365 + math.floor(yoe / 4) - math.floor(yoe / 100) + doy
+  local days = era * 146097 + doe - 719468
+  return (((days * 24 + tonumber(H)) * 60 + tonumber(M)) * 60 + tonumber(S)) * 1000
+    + tonumber(string.sub(frac .. '000', 1, 3))
+end
+local minid = tonumber(ARGV[1])
+local legacy = {}
+for i, raw in ipairs(redis.call('LRANGE', KEYS[1], 0, -1)) do
+  local ok, e = pcall(cjson.decode, raw)
+  local ms = ok and type(e) == 'table' and epoch_ms(e.timestamp)
+  if ms and ms >= minid then table.insert(legacy, {ms, i, e}) end
+end
+table.sort(legacy, function(a, b) return a[1] < b[1] or (a[1] == b[1] and a[2] < b[2]) end)
+local existing = redis.call('XRANGE', KEYS[2], '-', '+')
+local first_ms = existing[1] and tonumber(string.match(existing[1][1], '^(%d+)')) or math.huge
+redis.call('DEL', KEYS[2])
+local moved, last_ms, seq = 0, -1, 0
+for _, row in ipairs(legacy) do
+  local ms, e = row[1], row[3]
+  if ms < first_ms then
+    if ms == last_ms then seq = seq + 1 else last_ms, seq = ms, 0 end
+    local id = string.format('%d-%d', ms, seq)
+    local target = tostring(e.target or '')
+    redis.call('XADD', KEYS[2], id, 'admin_id', tostring(e.admin_id or ''), 'action', tostring(e.action or ''),
+      'target', target, 'timestamp', tostring(e.timestamp), 'details', tostring(e.details or ''))
+    for _, k in ipairs({'audit:admin:' .. tostring(e.admin_id or ''), 'audit:action:' .. tostring(e.action or ''),
+                        'audit:target:' .. target}) do
+      redis.call('ZADD', k, string.format('%d', ms), id)
+      redis.call('EXPIRE', k, 31536000)
+    end
+    moved = moved + 1
+  end
+end
+for _, row in ipairs(existing) do
+  redis.call('XADD', KEYS[2], row[1], unpack(row[2]))
+end
+redis.call('DEL', KEYS[1])
+return moved
+"""
+_SCRIPTS["migrate_audit"] = client.register_script(_LUA_MIGRATE_AUDIT)
+
+
+async def migrate_audit_log() -> dict:
+    """Move the legacy admin_audit_log JSON list into the audit:log stream and its indexes."""
+    min_id = str(int((_now().timestamp() - _AUDIT_RETENTION) * 1000))
+    total = await client.llen("admin_audit_log")
+    moved = await _SCRIPTS["migrate_audit"](keys=["admin_audit_log", "audit:log"], args=[min_id])
+    return {"legacy": total, "moved": moved}
+
+
+# KEYS: rental:{old}, rental:{canon}, rentals:all, rentals:expiry, num_owner
+# ARGV: old spelling, canonical number
+# Re-keys one non-canonical number everywhere it appears. If both hashes exist the canonical one wins.
+_LUA_MIGRATE_NUMKEY = """
+local old, canon = ARGV[1], ARGV[2]
+if redis.call('EXISTS', KEYS[1]) == 1 then
+  if redis.call('EXISTS', KEYS[2]) == 0 then
+    redis.call('RENAME', KEYS[1], KEYS[2])
+  else
+    redis.call('DEL', KEYS[1])
+  end
+  redis.call('HSET', KEYS[2], 'number', canon)
+end
+local live = redis.call('EXISTS', KEYS[2]) == 1
+local uid = redis.call('HGET', KEYS[2], 'user_id')
+local owner = redis.call('HGET', KEYS[5], old)
+local score = redis.call('ZSCORE', KEYS[4], old)
+redis.call('SREM', KEYS[3], old)
+redis.call('ZREM', KEYS[4], old)
+redis.call('HDEL', KEYS[5], old)
+if owner then redis.call('SREM', 'rentals:user:' .. owner, old) end
+uid = uid or owner
+if uid then
+  redis.call('SREM', 'rentals:user:' .. uid, old)
+  redis.call('SADD', 'rentals:user:' .. uid, canon)
+  redis.call('HSET', KEYS[5], canon, uid)
+end
+if live then
+  redis.call('SADD', KEYS[3], canon)
+  if score and not redis.call('ZSCORE', KEYS[4], canon) then redis.call('ZADD', KEYS[4], score, canon) end
+end
+return 1
+"""
+_SCRIPTS["migrate_numkey"] = client.register_script(_LUA_MIGRATE_NUMKEY)
+
+
+async def migrate_number_keys(batch_size: int = 500) -> dict:
+    """
+    Re-key every non-canonical number spelling (888..., spaced, fullwidth) found in rentals:all,
+    rentals:expiry, num_owner and rentals:user:* onto its canonical +888 form, then resync the rentals
+    index. Lookups only ever try the canonical key, so run this once on data written before it existed.
+    """
+    found = set()
+    for number in await client.smembers("rentals:all") or []:
+        found.add(number)
+    async for number, _ in client.zscan_iter("rentals:expiry", count=batch_size):
+        found.add(number)
+    async for number, _ in client.hscan_iter("num_owner", count=batch_size):
+        found.add(number)
+    async for key in client.scan_iter(match="rentals:user:*", count=batch_size):
+        async for number in client.sscan_iter(key, count=batch_size):
+            found.add(number)
+    stats = {"checked": len(found), "rekeyed": 0, "unparseable": 0}
+    for old in found:
+        canon = canonical(old)
+        if canon == old:
+            continue
+        if not canon:
+            stats["unparseable"] += 1
+            continue
+        stats["rekeyed"] += await _SCRIPTS["migrate_numkey"](
+            keys=[f"rental:{old}", f"rental:{canon}", "rentals:all", "rentals:expiry", "num_owner"],
+            args=[old, canon],
+        )
+    stats["indexed"] = await resync_rentals_index()
+    return stats
+
+
+MIGRATIONS = {
+    "numbers": (migrate_numbers_blob, "Fold legacy user:{id}.numbers JSON blobs into rentals:user / num_owner"),
+    "money": (migrate_money_to_micro, "Convert float balances / revenue to integer micro-USDT"),
+    "stats": (rebuild_dashboard_stats, "Recompute the /stats balance aggregates from users:all"),
+    "txstream": (migrate_tx_lists, "Move legacy tx:list / tx:* hashes into per-user tx streams"),
+    "revenue": (compact_revenue_entries, "Compact per-payment revenue hashes into hour/day/month rollups"),
+    "audit": (migrate_audit_log, "Move the admin_audit_log list into the indexed audit:log stream"),
+    "numkeys": (migrate_number_keys, "Re-key legacy number spellings onto canonical +888 keys"),
+}
+
+
+async def run_migration(name: str) -> dict:
+    fn, _ = MIGRATIONS[name]
+    result = await fn()
+    await client.hset("migrations:done", name, json.dumps({"at": _now().isoformat(), "result": result}))
+    return result
+
+
+async def get_migration_status() -> dict:
+    raw = await client.hgetall("migrations:done") or {}
+    out = {}
+    for name, value in raw.items():
+        try:
+            out[name] = json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            out[name] = {"at": None, "result": value}
+    return out
+
+
+# ========= CONSISTENCY CHECK (/fsck) =========
+# rental:{n} hashes are the source of truth; rentals:all, rentals:expiry, num_owner and rentals:user:*
+# are derived indexes. fsck_rentals() SCANs all of them in batches, collects every number whose index
+# entries disagree with its hash, and (repair=True) fixes each one with a script that re-reads the hash,
+# so a rental created or released while the scan runs is never clobbered.
+
+# KEYS: rental:{n}, rentals:all, rentals:expiry, num_owner
+# ARGV: number, expiry_date seen by the scan ('' = hash absent), expiry_ts, stray owner uids...
+# Returns the number of index writes, or -1 if the hash changed since the scan (skipped).
+_LUA_FSCK_FIX = """
+local n = ARGV[1]
+local uid = redis.call('HGET', KEYS[1], 'user_id')
+local exp = redis.call('HGET', KEYS[1], 'expiry_date')
+local fixed = 0
+if uid and exp then
+  if exp ~= ARGV[2] then return -1 end
+  if redis.call('HGET', KEYS[1], 'number') ~= n then
+    redis.call('HSET', KEYS[1], 'number', n)
+    fixed = fixed + 1
+  end
+  fixed = fixed + redis.call('SADD', KEYS[2], n)
+  local score = tonumber(redis.call('ZSCORE', KEYS[3], n))
+  if not score or math.abs(score - tonumber(ARGV[3])) > 1 then
+    redis.call('ZADD', KEYS[3], ARGV[3], n)
+    fixed = fixed + 1
+  end
+  if redis.call('HGET', KEYS[4], n) ~= uid then
+    redis.call('HSET', KEYS[4], n, uid)
+    fixed = fixed + 1
+  end
+  fixed = fixed + redis.call('SADD', 'rentals:user:' .. uid, n)
+  for i = 4, #ARGV do
+    if ARGV[i] ~= uid then fixed = fixed + redis.call('SREM', 'rentals:user:' .. ARGV[i], n) end
+  end
+elseif not uid and not exp then
+  if ARGV[2] ~= '' then return -1 end
+  fixed = fixed + redis.call('SREM', KEYS[2], n) + redis.call('ZREM', KEYS[3], n)
+  local owner = redis.call('HGET', KEYS[4], n)
+  if owner then
+    fixed = fixed + redis.call('HDEL', KEYS[4], n) + redis.call('SREM', 'rentals:user:' .. owner, n)
+  end
+  for i = 4, #ARGV do
+    fixed = fixed + redis.call('SREM', 'rentals:user:' .. ARGV[i], n)
+  end
+end
+return fixed
+"""
+_SCRIPTS["fsck_fix"] = client.register_script(_LUA_FSCK_FIX)
+
+_FSCK_EXAMPLES = 5
+
+
+def _fsck_note(report: dict, kind: str, example) -> None:
+    report["issues"][kind] = report["issues"].get(kind, 0) + 1
+    examples = report["examples"].setdefault(kind, [])
+    if len(examples) < _FSCK_EXAMPLES:
+        examples.append(str(example))
+
+
+async def _fsck_hashes(keys: list, live: dict, suspects: dict, report: dict) -> int:
+    """Read one batch of rental:* hashes into `live`, noting malformed / non-canonical ones."""
+    async with client.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.hmget(key, "user_id", "expiry_date", "number")
+        rows = await pipe.execute()
+    for key, (uid, exp, number) in zip(keys, rows):
+        n = key[len("rental:"):]
+        if canonical(n) != n:
+            _fsck_note(report, "noncanonical_key", f"{n} (run /migrate numkeys)")
+            continue
+        expiry = _parse_dt(exp) if exp else None
+        if not uid or not expiry:
+            _fsck_note(report, "malformed_rental", n)
+            continue
+        if number != n:
+            _fsck_note(report, "number_field_mismatch", f"{n}: {number}")
+            suspects.setdefault(n, set())
+        live[n] = (str(uid), exp, expiry.timestamp())
+    return len(keys)
+
+
+async def fsck_rentals(repair: bool = False, batch_size: int = 500) -> dict:
+    """
+    Cross-check rental:* against rentals:all, rentals:expiry, num_owner, rentals:user:* and leftover
+    user:{id}.numbers blobs. Read-only unless repair=True, in which case the affected numbers are fixed
+    in pipelined batches of fsck_fix calls, legacy blobs are folded in and the rentals index is resynced.
+    Returns {"checked": {...}, "issues": {kind: count}, "examples": {kind: [...]}, "repaired", "skipped"}.
+    """
+    report = {"checked": {}, "issues": {}, "examples": {}, "repaired": 0, "skipped": 0}
+    live = {}       # number -> (uid, expiry_date string, expiry ts) for every well-formed rental hash
+    suspects = {}   # number -> set of stray owner uids to detach
+
+    def suspect(n, stray_uid=None):
+        strays = suspects.setdefault(n, set())
+        if stray_uid is not None:
+            strays.add(str(stray_uid))
+
+    # rental:* hashes
+    checked = 0
+    batch = []
+    async for key in client.scan_iter(match="rental:*", count=batch_size):
+        batch.append(key)
+        if len(batch) < batch_size:
+            continue
+        checked += await _fsck_hashes(batch, live, suspects, report)
+        batch = []
+    if batch:
+        checked += await _fsck_hashes(batch, live, suspects, report)
+    report["checked"]["rental_hashes"] = checked
+
+    # rentals:all
+    seen_all = set()
+    async for n in client.sscan_iter("rentals:all", count=batch_size):
+        seen_all.add(n)
+        if n not in live:
+            _fsck_note(report, "all_orphan", n)
+            suspect(n)
+    for n in live.keys() - seen_all:
+        _fsck_note(report, "all_missing", n)
+        suspect(n)
+    report["checked"]["rentals_all"] = len(seen_all)
+
+    # rentals:expiry
+    seen_exp = set()
+    async for n, score in client.zscan_iter("rentals:expiry", count=batch_size):
+        seen_exp.add(n)
+        if n not in live:
+            _fsck_note(report, "expiry_orphan", n)
+            suspect(n)
+        elif abs(float(score) - live[n][2]) > 1:
+            _fsck_note(report, "expiry_mismatch", n)
+            suspect(n)
+    for n in live.keys() - seen_exp:
+        _fsck_note(report, "expiry_missing", n)
+        suspect(n)
+    report["checked"]["rentals_expiry"] = len(seen_exp)
+
+    # num_owner
+    seen_owner = set()
+    async for n, uid in client.hscan_iter("num_owner", count=batch_size):
+        seen_owner.add(n)
+        if n not in live:
+            _fsck_note(report, "owner_orphan", f"{n} -> {uid}")
+            suspect(n, uid)
+        elif str(uid) != live[n][0]:
+            _fsck_note(report, "owner_mismatch", f"{n}: {uid} != {live[n][0]}")
+            suspect(n, uid)
+    for n in live.keys() - seen_owner:
+        _fsck_note(report, "owner_missing", n)
+        suspect(n)
+    report["checked"]["num_owner"] = len(seen_owner)
+
+    # rentals:user:*
+    seen_user, sets = set(), 0
+    async for key in client.scan_iter(match="rentals:user:*", count=batch_size):
+        sets += 1
+        uid = key.rsplit(":", 1)[-1]
+        async for n in client.sscan_iter(key, count=batch_size):
+            if n in live and live[n][0] == uid:
+                seen_user.add(n)
+            else:
+                _fsck_note(report, "user_set_orphan", f"{uid}: {n}")
+                suspect(n, uid)
+    for n in live.keys() - seen_user:
+        _fsck_note(report, "user_set_missing", f"{live[n][0]}: {n}")
+        suspect(n)
+    report["checked"]["user_sets"] = sets
+
+    # leftover user:{id}.numbers blobs (retired; see /migrate numbers)
+    blobs = 0
+    cursor = 0
+    while True:
+        cursor, uids = await client.sscan("users:all", cursor=cursor, count=batch_size)
+        if uids:
+            async with client.pipeline(transaction=False) as pipe:
+                for uid in uids:
+                    pipe.hexists(f"user:{uid}", "numbers")
+                flags = await pipe.execute()
+            for uid, has in zip(uids, flags):
+                if has:
+                    blobs += 1
+                    _fsck_note(report, "legacy_numbers_blob", uid)
+        if int(cursor) == 0:
+            break
+
+    if repair and report["issues"].get("noncanonical_key"):
+        # Hashes under legacy keys would look like orphans; re-key them before repairing anything.
+        report["repair_blocked"] = "run /migrate numkeys first"
+    elif repair:
+        if blobs:
+            await migrate_numbers_blob(batch_size)
+            report["repaired"] += blobs
+        items = [(n, strays) for n, strays in suspects.items() if canonical(n) == n]
+        for i in range(0, len(items), batch_size):
+            async with client.pipeline(transaction=False) as pipe:
+                for n, strays in items[i:i + batch_size]:
+                    _, exp_str, exp_ts = live.get(n, (None, "", 0))
+                    await _SCRIPTS["fsck_fix"](
+                        keys=[f"rental:{n}", "rentals:all", "rentals:expiry", "num_owner"],
+                        args=[n, exp_str, exp_ts, *sorted(strays)],
+                        client=pipe,
+                    )
+                results = await pipe.execute()
+            report["repaired"] += sum(r for r in results if r > 0)
+            report["skipped"] += sum(1 for r in results if r < 0)
+        await resync_rentals_index()
+    return report
+
+
 # ========= MAINTENANCE =========
 async def delete_all_data():
     async for key in client.scan_iter("*"):
         await client.delete(key)
+    _rentals_by_number.clear()
+    _rentals_by_user.clear()
+    _near.flush()
     return True, "ALL DATA DELETED"
 
 
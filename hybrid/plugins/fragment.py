@@ -11,6 +11,7 @@ import time
 import random
 import logging
 import re
+import html as html_lib
 from typing import List, Dict, Tuple, Optional
 import httpx
 from httpx import AsyncClient
@@ -18,6 +19,8 @@ import requests
 from bs4 import BeautifulSoup
 from requests.exceptions import RequestException, Timeout, SSLError, ConnectionError
 
+from hybrid.plugins.guard import SingleFlight
+
 # from config import FRAGMENT_API_HASH
 
 FRAGMENT_API_HASH = "38f80e92d2dbe5065b"
@@ -55,6 +58,7 @@ def _default_user_agent() -> str:
             "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
 
 # Module-level persistent session for Fragment (replaces per-call AsyncClient)
+_frag_cookies_file = "frag.json"  # cookie file the shared session was built from
 try:
     _frag_cookies = _load_cookies_from_file("frag.json")
     _frag_session = httpx.AsyncClient(
@@ -94,7 +98,7 @@ async def close_fragment_session():
 
 
 async def reload_fragment_cookies(path: str = "frag.json"):
-    global _frag_session
+    global _frag_session, _frag_cookies_file
     new_cookies = _load_cookies_from_file(path)
     await _frag_session.aclose()
     _frag_session = httpx.AsyncClient(
@@ -104,6 +108,8 @@ async def reload_fragment_cookies(path: str = "frag.json"):
         limits=httpx.Limits(max_connections=30, max_keepalive_connections=15),
         headers={"User-Agent": _default_user_agent(), "Referer": "https://fragment.com/"}
     )
+    _frag_cookies_file = path
+    _numbers_validators.clear()  # validators belong to the old account/session
     logging.info("Fragment session cookies reloaded.")
 
 
@@ -111,51 +117,85 @@ async def reload_fragment_cookies(path: str = "frag.json"):
 FRAGMENT_API_SEMAPHORE = asyncio.Semaphore(10)
 
 
-def _parse_numbers_from_html(html: str) -> List[str]:
-    """Try multiple parsing strategies to find +888... numbers."""
-    soup = BeautifulSoup(html, "html.parser")
-    found = set()
+# Single-pass extractor for +888 numbers. One compiled tokenizer walks the page once (tags, comments,
+# declarations, text); no DOM is built. It finds what the former BeautifulSoup four-pass parser found:
+#   - "+888…" in visible text (script/style bodies and comments are not text),
+#   - "/number/888…" or "+888…" in href values (leading "+" added), and anchor text joined without separators,
+#   - "+888…" in any attribute value (first match per attribute, as before).
+_NUM_RE = re.compile(r"\+888\d{4,15}")
+_HREF_NUM_RE = re.compile(r"(?:/number/|\b)(\+?888\d{4,15})")
+_TOKEN_RE = re.compile(
+    r"<!--.*?(?:-->|$)"                                          # comment
+    r"|<!\[CDATA\[.*?(?:\]\]>|$)"                                # CDATA section
+    r"|<[!?][^>]*>"                                              # doctype / processing instruction
+    r"|<(/?)([A-Za-z][^\s/>]*)((?:[^>\"']|\"[^\"]*\"|'[^']*')*)>",  # start / end tag
+    re.S,
+)
+_ATTR_RE = re.compile(r"""([^\s"'>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?""")
+_RAW_TEXT_TAGS = frozenset(("script", "style"))  # bodies are not markup and not visible text
+_RAW_END_RE = {t: re.compile(r"</%s\s*>" % t, re.I) for t in _RAW_TEXT_TAGS}
 
-    # 1) Look for visible text patterns using regex
-    for match in re.findall(r"\+888\d{4,15}", soup.get_text(separator=" ")):
-        found.add(match)
 
-    # 2) Look for links or hrefs that reference number pages like /number/888...
-    for a in soup.select("a[href]"):
-        href = a["href"]
-        # match either /number/888123456 or /number/+8881234 form in text or href
-        m = re.search(r"(?:/number/|\b)(\+?888\d{4,15})", href)
-        if m:
-            num = m.group(1)
-            if not num.startswith("+"):
-                num = "+" + num
-            found.add(num)
-        # also try anchor text
-        text = a.get_text(strip=True)
-        m2 = re.search(r"\+888\d{4,15}", text)
-        if m2:
-            found.add(m2.group(0))
-
-    # 3) Look for specific class names that might hold numbers (heuristic)
-    for candidate in soup.select(".number, .tm-number, .number-item, .my-number, .phone"):
-        txt = candidate.get_text(" ", strip=True)
-        m = re.search(r"\+888\d{4,15}", txt)
-        if m:
-            found.add(m.group(0))
-
-    # 4) Final fallback: any 888... sequences in attributes e.g., data-number
-    for tag in soup.find_all(attrs=True):
-        for attr_val in tag.attrs.values():
-            if isinstance(attr_val, (list, tuple)):
-                attr_val = " ".join(attr_val)
-            if isinstance(attr_val, str):
-                m = re.search(r"\+888\d{4,15}", attr_val)
-                if m:
-                    found.add(m.group(0))
-
-    # Normalize formatting and sort
-    normalized = sorted({re.sub(r"\s+", "", n) for n in found})
-    return normalized
+def _unescape(s: str) -> str:
+    return html_lib.unescape(s) if "&" in s else s
+
+
+def _parse_numbers_from_html(html: str) -> List[str]:
+    """Find +888... numbers in a Fragment page with one streaming pass (see module notes above)."""
+    if not html or "888" not in html:
+        return []
+    found = set()
+    anchor_parts = None  # stripped text pieces of the currently open <a>, or None
+    pos = 0
+    n = len(html)
+    while pos < n:
+        m = _TOKEN_RE.search(html, pos)
+        text_end = m.start() if m else n
+        if text_end > pos:
+            text = _unescape(html[pos:text_end])
+            if "888" in text:
+                found.update(_NUM_RE.findall(text))
+            if anchor_parts is not None:
+                anchor_parts.append(text.strip())
+        if not m:
+            break
+        pos = m.end()
+        name = m.group(2)
+        if name is None:
+            continue  # comment / CDATA / declaration
+        name = name.lower()
+        if m.group(1):  # end tag
+            if name == "a" and anchor_parts is not None:
+                joined = "".join(anchor_parts)
+                hit = _NUM_RE.search(joined)
+                if hit:
+                    found.add(hit.group(0))
+                anchor_parts = None
+            continue
+        attrs = m.group(3)
+        if attrs and "888" in attrs:
+            for am in _ATTR_RE.finditer(attrs):
+                value = am.group(2) if am.group(2) is not None else am.group(3) if am.group(3) is not None else am.group(4)
+                if not value or "888" not in value:
+                    continue
+                value = _unescape(value)
+                if am.group(1).lower() == "class":
+                    value = " ".join(value.split())
+                hit = _NUM_RE.search(value)
+                if hit:
+                    found.add(hit.group(0))
+                if name == "a" and am.group(1).lower() == "href":
+                    hit = _HREF_NUM_RE.search(value)
+                    if hit:
+                        num = hit.group(1)
+                        found.add(num if num.startswith("+") else "+" + num)
+        if name == "a":
+            anchor_parts = []
+        elif name in _RAW_TEXT_TAGS and not attrs.rstrip().endswith("/"):
+            # Raw-text element: skip its body up to the matching end tag without tokenizing it.
+            close = _RAW_END_RE[name].search(html, pos)
+            pos = close.end() if close else n
+    return sorted(found)
 
 
 def get_fragment_numbers(
@@ -280,6 +320,11 @@ def get_fragment_numbers(
         raise RequestException(f"Failed after {max_retries} attempts: last status {meta.get('last_status_code')}")
 
 
+# Conditional-request validators for /my/numbers (ETag / Last-Modified) and the last parsed list.
+# A 304 reply means the pool is unchanged, so the page is neither downloaded nor re-parsed.
+_numbers_validators: Dict[str, object] = {}
+
+
 async def get_fragment_numbers_async(
     cookies_file: str = "frag.json",
     url: str = "https://fragment.com/my/numbers",
@@ -292,58 +337,96 @@ async def get_fragment_numbers_async(
 ) -> Tuple[List[str], Dict]:
     """
     Async version: fetch +888 numbers from fragment.com without blocking the event loop.
-    Same contract as get_fragment_numbers; use this from async code.
+    Returns (numbers, meta) and raises like get_fragment_numbers, except that a 429 always raises
+    FragmentRateLimitError and meta has a "not_modified" flag.
+    With the shared session's cookie file and verify_ssl=True it uses _frag_session and sends
+    If-None-Match / If-Modified-Since; on 304 the cached list is returned and meta["not_modified"] is True.
+    Any other cookies_file / verify_ssl gets a one-off client and an unconditional GET.
     """
-    ua = user_agent or _default_user_agent()
-    cookies = _load_cookies_from_file(cookies_file)
     headers = {
-        "User-Agent": ua,
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
         "Accept-Language": "en-US,en;q=0.9",
         "Referer": "https://fragment.com/",
     }
-    meta = {"attempts": 0, "last_status_code": None, "message": ""}
-    last_exc = None
-    for attempt in range(1, max_retries + 1):
-        meta["attempts"] = attempt
-        try:
-            if verbose:
-                logger.info("GET %s (attempt %d)", url, attempt)
-            async with AsyncClient(cookies=cookies, timeout=float(timeout), verify=verify_ssl) as client:
-                resp = await client.get(url, headers=headers, follow_redirects=True)
-            meta["last_status_code"] = resp.status_code
-            if resp.status_code == 429:
-                retry_after = resp.headers.get("Retry-After")
-                meta["message"] = f"Rate limited (429). Retry-After: {retry_after}"
-                raise FragmentRateLimitError(meta["message"])
-            if resp.status_code in (401, 403):
-                meta["message"] = f"Auth failure HTTP {resp.status_code}"
-                raise FragmentAuthError(meta["message"])
-            if resp.status_code == 200:
-                body = resp.text
-                lower = body.lower()
-                if ("/login" in str(resp.url).lower()) or ("please log" in lower) or ("sign in" in lower and "password" in lower):
-                    meta["message"] = "Detected login page — cookies may be expired/invalid."
-                    raise FragmentAuthError("Detected login page. Cookies likely expired or invalid.")
-                numbers = _parse_numbers_from_html(body)
-                meta["message"] = "OK"
-                return numbers, meta
-            if 500 <= resp.status_code < 600:
+    if user_agent:
+        headers["User-Agent"] = user_agent
+    shared = cookies_file == _frag_cookies_file and verify_ssl
+    if shared:
+        session = _frag_session
+    else:
+        session = AsyncClient(
+            cookies=_load_cookies_from_file(cookies_file), verify=verify_ssl, http2=True,
+            headers={"User-Agent": _default_user_agent(), "Referer": "https://fragment.com/"},
+        )
+    cached = _numbers_validators if shared and _numbers_validators.get("url") == url else {}
+    if cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+    meta = {"attempts": 0, "last_status_code": None, "message": "", "not_modified": False}
+    try:
+        last_exc = None
+        for attempt in range(1, max_retries + 1):
+            meta["attempts"] = attempt
+            try:
+                if verbose:
+                    logger.info("GET %s (attempt %d)", url, attempt)
+                resp = await session.get(url, headers=headers, follow_redirects=True, timeout=float(timeout))
+                meta["last_status_code"] = resp.status_code
+                if resp.status_code == 304:
+                    if "numbers" in cached:
+                        meta["message"] = "OK"
+                        meta["not_modified"] = True
+                        return list(cached["numbers"]), meta
+                    # Validators went out without a cached list to match them (e.g. cleared by a cookie
+                    # reload mid-request): ask again unconditionally.
+                    headers.pop("If-None-Match", None)
+                    headers.pop("If-Modified-Since", None)
+                    cached = {}
+                    continue
+                if resp.status_code == 429:
+                    retry_after = resp.headers.get("Retry-After")
+                    meta["message"] = f"Rate limited (429). Retry-After: {retry_after}"
+                    raise FragmentRateLimitError(meta["message"])
+                if resp.status_code in (401, 403):
+                    meta["message"] = f"Auth failure HTTP {resp.status_code}"
+                    raise FragmentAuthError(meta["message"])
+                if resp.status_code == 200:
+                    body = resp.text
+                    lower = body.lower()
+                    if ("/login" in str(resp.url).lower()) or ("please log" in lower) or ("sign in" in lower and "password" in lower):
+                        meta["message"] = "Detected login page — cookies may be expired/invalid."
+                        raise FragmentAuthError("Detected login page. Cookies likely expired or invalid.")
+                    numbers = _parse_numbers_from_html(body)
+                    if shared:
+                        _numbers_validators.clear()
+                        _numbers_validators.update({
+                            "url": url,
+                            "etag": resp.headers.get("ETag"),
+                            "last_modified": resp.headers.get("Last-Modified"),
+                            "numbers": list(numbers),
+                        })
+                    meta["message"] = "OK"
+                    return numbers, meta
+                if 500 <= resp.status_code < 600:
+                    sleep_for = backoff_base * (2 ** (attempt - 1)) + random.random() * 0.5
+                    logger.warning("Server error %d, backing off %.1fs", resp.status_code, sleep_for)
+                    await asyncio.sleep(sleep_for)
+                    continue
+                meta["message"] = f"Unexpected HTTP status: {resp.status_code}"
+                raise RequestException(meta["message"])
+            except (FragmentRateLimitError, FragmentAuthError, RequestException):
+                raise
+            except Exception as exc:
+                last_exc = exc
                 sleep_for = backoff_base * (2 ** (attempt - 1)) + random.random() * 0.5
-                logger.warning("Server error %d, backing off %.1fs", resp.status_code, sleep_for)
+                logger.warning("Network error on attempt %d: %s — backing off %.1fs", attempt, exc, sleep_for)
                 await asyncio.sleep(sleep_for)
-                continue
-            meta["message"] = f"Unexpected HTTP status: {resp.status_code}"
-            raise RequestException(meta["message"])
-        except (FragmentRateLimitError, FragmentAuthError, RequestException):
-            raise
-        except Exception as exc:
-            last_exc = exc
-            sleep_for = backoff_base * (2 ** (attempt - 1)) + random.random() * 0.5
-            logger.warning("Network error on attempt %d: %s — backing off %.1fs", attempt, exc, sleep_for)
-            await asyncio.sleep(sleep_for)
-    meta["message"] = f"Exhausted {max_retries} retries"
-    raise RequestException(f"Failed after {max_retries} attempts: {last_exc}")
+        meta["message"] = f"Exhausted {max_retries} retries"
+        raise RequestException(f"Failed after {max_retries} attempts: {last_exc}")
+    finally:
+        if not shared:
+            await session.aclose()
 
 
 def _parse_usernames_from_html(html: str) -> List[str]:
@@ -460,8 +543,16 @@ def get_fragment_usernames(
     else:
         raise RequestException(f"Failed after {max_retries} attempts, last code {meta['last_status_code']}")
 
+# Concurrent code fetches for the same number (user tap + admin panel + retries) share one request.
+login_code_flight = SingleFlight()
+
+
 async def get_login_code_async(number: str, cookies_file: str = "frag.json") -> Optional[str]:
     num_path = number.replace("+", "").replace(" ", "")
+    return await login_code_flight.do(num_path, lambda: _fetch_login_code(num_path))
+
+
+async def _fetch_login_code(num_path: str) -> Optional[str]:
     url = f"https://fragment.com/number/{num_path}/code"
     try:
         resp = await _frag_session.get(url)
@@ -5,7 +5,6 @@ import math
 import asyncio
 import logging
 import random
-import re
 import traceback
 import csv
 import httpx
@@ -27,6 +26,9 @@ from pyrogram.errors import (
 )
 
 from hybrid.plugins.temp import temp
+from hybrid.plugins.pool import LISTED
+from hybrid.plugins.phone import parse_number, display
+from hybrid.plugins import i18n
 from config import LANGUAGES, D30_RATE, D60_RATE, D90_RATE, API_ID, API_HASH
 
 
@@ -148,11 +150,11 @@ def get_remaining_hours(start_date: datetime, total_hours) -> int:
     return max(0, int(remaining.total_seconds() // 3600))
 
 def get_numbers_page(page: int = 1, per_page: int = 10):
-    total = len(temp.NUMBE_RS)
-    pages = math.ceil(total / per_page)
+    numbers = temp.POOL.snapshot().members(LISTED)
+    pages = math.ceil(len(numbers) / per_page)
     start = (page - 1) * per_page
     end = start + per_page
-    return temp.NUMBE_RS[start:end], pages
+    return numbers[start:end], pages
 
 async def show_numbers(query, page: int = 1):
     numbers, pages = get_numbers_page(page)
@@ -175,40 +177,50 @@ async def show_numbers(query, page: int = 1):
         reply_markup=InlineKeyboardMarkup(kb)
     )
 
-def _md_to_html(text: str) -> str:
-    """Convert Markdown to HTML for parse_mode HTML."""
-    text = re.sub(r'\*\*(.+?)\*\*', r'<b>\1</b>', text)
-    text = re.sub(r'`(.+?)`', r'<code>\1</code>', text)
-    text = re.sub(r'__(.+?)__', r'<i>\1</i>', text)
-    return text
+# Templates are compiled from lang.json once; t() is a cached-language dict lookup (see i18n.py).
+i18n.load(LANGUAGES)
+t = i18n.t
+_md_to_html = i18n.md_to_html
 
 def h(text: str) -> str:
     """Convert inline Markdown to HTML. Use for hardcoded messages."""
     return _md_to_html(text)
 
-# English only — no DB/cache for speed
-_EN = LANGUAGES.get("en", {})
-
-def t(user_id: int, key: str, **kwargs):
-    text = _EN.get(key, key)
-    _emoji_fallback = {"success":"<emoji id=\"5323628709469495421\">✅</emoji>","error":"<emoji id=\"5767151002666929821\">❌</emoji>","warning":"⚠️","phone":"<emoji id=\"5467539229468793355\">📞</emoji>","money":"<emoji id=\"5375296873982604963\">💰</emoji>","renew":"<emoji id=\"5264727218734524899\">🔄</emoji>","get_code":"<emoji id=\"5433811242135331842\">📨</emoji>","back":"⬅️","date":"<emoji id=\"5274055917766202507\">📅</emoji>","loading":"<emoji id=\"5451732530048802485\">⌛</emoji>","time":"<emoji id=\"5413704112220949842\">🕒</emoji>","timeout":"<emoji id=\"5242628160297641831\">⏰</emoji>"}
-    text = re.sub(r'\{\{e:(\w+)\}\}', lambda m: _emoji_fallback.get(m.group(1), ""), text)
-    text = _md_to_html(text)
-    return text.format(**kwargs) if kwargs else text
+async def load_user_language(user_id: int) -> str:
+    """Warm the in-memory language cache for user_id from Redis (one HGET per user per cache lifetime)."""
+    lang = i18n.cached_language(user_id)
+    if lang is None:
+        from hybrid.plugins.db import get_user_language
+        i18n.remember_language(user_id, await get_user_language(user_id))
+        lang = i18n.cached_language(user_id)
+    return lang
 
 # Db imports are lazy below to avoid circular import (init->func->db->?).
 
 NUMBERS_PER_PAGE = 8
 
+# Rendered rent-listing pages for the current pool listing_version: (listing_version, language, page) -> markup.
+# Rent, release/expiry and enable/disable bump listing_version, which empties the cache on the next click.
+_rentnum_pages = {}
+
+
 async def build_rentnum_keyboard(user_id: int, page: int = 0):
-    # Pagination must show ALL numbers (available + rented). NUMBE_RS has every number from Fragment.
-    filtered_numbers = list(temp.NUMBE_RS)
-    filtered_numbers = [num for num in filtered_numbers if num not in temp.UN_AV_NUMS]
-    seen = set()
-    filtered_numbers = [x for x in filtered_numbers if not (x in seen or seen.add(x))]
-
-    available_nums = [n for n in filtered_numbers if n not in temp.RENTED_NUMS]
-    rented_nums = [n for n in filtered_numbers if n in temp.RENTED_NUMS]
+    snap = temp.POOL.snapshot()
+    key = (snap.listing_version, i18n.cached_language(user_id) or i18n.DEFAULT_LANGUAGE, page)
+    markup = _rentnum_pages.get(key)
+    if markup is None:
+        if _rentnum_pages and next(iter(_rentnum_pages))[0] != snap.listing_version:
+            _rentnum_pages.clear()
+        markup = _render_rentnum_page(user_id, snap, page)
+        free, rented = snap.listing()
+        if page * NUMBERS_PER_PAGE < max(1, len(free) + len(rented)):  # don't cache out-of-range pages
+            _rentnum_pages[key] = markup
+    return markup
+
+
+def _render_rentnum_page(user_id: int, snap, page: int):
+    # Pagination must show ALL listed numbers (available + rented), minus admin-disabled ones.
+    available_nums, rented_nums = snap.listing()
     ordered_numbers = available_nums + rented_nums
 
     start = page * NUMBERS_PER_PAGE
@@ -217,8 +229,8 @@ async def build_rentnum_keyboard(user_id: int, page: int = 0):
 
     keyboard = []
 
-    for number in numbers_page:
-        status = " 🔴" if number in temp.RENTED_NUMS else " 🟢"
+    for i, number in enumerate(numbers_page, start):
+        status = " 🔴" if i >= len(available_nums) else " 🟢"
         keyboard.append([
             InlineKeyboardButton(f"{number} {status}", callback_data=f"numinfo:{number}:{page}")
         ])
@@ -242,7 +254,7 @@ async def build_rentnum_keyboard(user_id: int, page: int = 0):
 
 async def build_number_actions_keyboard(user_id: int, number: str, back_data: str = "my_rentals"):
     """Build keyboard for rented number: Renew, Get Code, Transfer, Back."""
-    n = normalize_phone(number) or number
+    n = parse_number(number) or number
     keyboard = [
         [
             InlineKeyboardButton(t(user_id, "renew"), callback_data=f"renew_{n}"),
@@ -509,33 +521,11 @@ async def check_number_conn(number: str) -> bool:
         logging.error("guard check failed for %s: %s — assuming free", number, e)
         return True
 
-def normalize_phone(number) -> str | None:
-    """Normalize to +888XXXXXXXX. Returns None if invalid."""
-    if number is None:
-        return None
-    s = str(number).strip().replace(" ", "").replace("-", "")
-    if not s:
-        return None
-    if s.startswith("+888") and len(s) >= 12:
-        return s
-    if s.startswith("888") and len(s) >= 11:
-        return "+" + s
-    if s.isdigit() and len(s) == 8:
-        return "+888" + s
-    return None
-
 def format_number(number) -> str:
     """Format phone to +888 XXXX XXXX. Never raises - returns safe fallback for invalid input."""
-    clean = normalize_phone(number)
-    if clean and len(clean) >= 12:
-        return f"{clean[:4]} {clean[4:8]} {clean[8:]}"
-    s = str(number or "").strip().replace(" ", "")
-    if (s.startswith("+888") or s.startswith("888")) and len(s) >= 11:
-        pref = s[:4] if s.startswith("+") else "+" + s[:3]
-        rest = s[4:] if s.startswith("+") else s[3:]
-        if len(rest) >= 8:
-            return f"{pref} {rest[:4]} {rest[4:]}"
-    return s if s else "N/A"
+    if parse_number(number):
+        return display(number)
+    return str(number or "").strip().replace(" ", "") or "N/A"
 
 def format_date(date_str) -> str:
     """Parse date string (ISO, strptime formats) and return DD/MM/YY."""
@@ -571,7 +561,7 @@ async def export_numbers_csv(filename: str = "numbers_export.csv"):
     """
     from hybrid.plugins.db import get_user_balance, get_rented_data_for_number, get_all_rentals
     pool = set(await get_all_pool_numbers()) if get_all_pool_numbers else set()
-    pool = pool or set(temp.NUMBE_RS or [])
+    pool = pool or set(temp.POOL.snapshot().members(LISTED))
     rented_numbers = {doc.get("number") for doc in await get_all_rentals() if doc.get("number")}
     all_numbers = sorted(pool | rented_numbers)
     rows = []
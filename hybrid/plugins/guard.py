@@ -6,11 +6,13 @@ import asyncio
 import hashlib
 import logging
 import random
-import re
-from typing import Any, Dict, Optional, Tuple
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional, Tuple
 
 import httpx
 
+from hybrid.plugins import phone
+
 # ----- 2a. AsyncTimedCache (inspired by NFTNumberBot cache.py) -----
 
 class AsyncTimedCache:
@@ -55,32 +57,29 @@ class AsyncTimedCache:
         return len(self._store)
 
 
-# ----- 2b. Number validation (inspired by NFTNumberBot utils.py) -----
-
-ANON_NUMBER_RE = re.compile(r"^\+?888[-\s]?\d{4}([-.\\s]?\d{4})?$")
-ANON_NUMBER_RAW_RE = re.compile(r"[^\d]")
-
+class SingleFlight:
+    """Coalesce concurrent calls for the same key onto one in-flight request; every caller gets its result."""
 
-def parse_anon_number(raw: str) -> Optional[str]:
-    """Parse and normalize +888 number. Returns digits-only string or None if invalid."""
-    if not raw or not isinstance(raw, str):
-        return None
-    s = raw.strip()
-    if not ANON_NUMBER_RE.match(s):
-        return None
-    digits = ANON_NUMBER_RAW_RE.sub("", s)
-    if digits.startswith("888") and len(digits) >= 11:
-        return digits
-    return None
+    def __init__(self):
+        self._inflight: Dict[Any, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
 
+    async def do(self, key: Any, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._inflight.pop(k, None) if self._inflight.get(k) is t else None)
+        else:
+            self.coalesced += 1
+        # shield: one caller being cancelled must not cancel the request the others are waiting on
+        return await asyncio.shield(task)
 
-def format_display(digits: str) -> str:
-    """Format digits as +888 1234 5678."""
-    if not digits or len(digits) < 11:
-        return digits or ""
-    if digits.startswith("888"):
-        return f"+888 {digits[3:7]} {digits[7:]}"
-    return f"+{digits[:3]} {digits[3:7]} {digits[7:]}"
+    @property
+    def in_flight(self) -> int:
+        return len(self._inflight)
 
 
 # ----- 2c. GuardFragmentAPI (inspired by NFTNumberBot fragment_api.py) -----
@@ -88,6 +87,14 @@ def format_display(digits: str) -> str:
 DATA_T = Dict[str, str | int | bool]
 
 
+class GuardRateLimitError(Exception):
+    """Fragment answered HTTP 429; retry_after is the server hint in seconds (0 if absent)."""
+
+    def __init__(self, retry_after: float = 0.0):
+        super().__init__(f"Fragment rate limited (retry after {retry_after}s)")
+        self.retry_after = retry_after
+
+
 class GuardFragmentAPI:
     BASE_URL = "https://fragment.com/api"
 
@@ -131,6 +138,12 @@ class GuardFragmentAPI:
         if self._client is None:
             raise RuntimeError("Guard API not ready (missing cookies).")
         response = await self._client.post(self.BASE_URL, data=data)
+        if response.status_code == 429:
+            try:
+                retry_after = float(response.headers.get("Retry-After", 0))
+            except ValueError:
+                retry_after = 0.0
+            raise GuardRateLimitError(retry_after)
         response_data = response.json()
         if "error" in response_data:
             raise Exception(
@@ -177,6 +190,7 @@ class GuardFragmentAPI:
 
 _api: Optional[GuardFragmentAPI] = None
 _cache: Optional[AsyncTimedCache] = None
+_flight = SingleFlight()
 
 try:
     from config import (
@@ -212,7 +226,7 @@ async def guard_is_free(number: str) -> bool:
     """
     if _api is None or not _api.ready:
         raise RuntimeError("Guard not ready (missing or invalid GUARD_* config).")
-    normalized = parse_anon_number(number)
+    normalized = phone.digits(number)
     if not normalized:
         raise ValueError(f"Invalid +888 number: {number!r}")
     cache_key = f"free:{normalized}"
@@ -220,11 +234,98 @@ async def guard_is_free(number: str) -> bool:
         cached = _cache.get(cache_key)
         if cached is not None:
             return bool(cached)
-    result = await _api.check_is_number_free(number)
-    if _cache is not None:
-        from config import GUARD_CACHE_TTL
-        _cache.set(cache_key, result, ttl_seconds=float(GUARD_CACHE_TTL))
-    return result
+
+    async def _fetch() -> bool:
+        result = await _api.check_is_number_free(normalized)
+        if _cache is not None:
+            from config import GUARD_CACHE_TTL
+            _cache.set(cache_key, result, ttl_seconds=float(GUARD_CACHE_TTL))
+        return result
+
+    return await _flight.do(cache_key, _fetch)
+
+
+class _AdaptiveBackoff:
+    """Shared pause for all guard_check_many workers: doubles on each 429, decays on success."""
+
+    def __init__(self, base: float = 1.0, cap: float = 60.0):
+        self.base = base
+        self.cap = cap
+        self.delay = 0.0
+        self.pause_until = 0.0
+        self.hits = 0
+
+    async def wait(self) -> None:
+        remaining = self.pause_until - time.monotonic()
+        if remaining > 0:
+            await asyncio.sleep(remaining + random.uniform(0, 0.25))
+
+    def on_rate_limited(self, retry_after: float) -> None:
+        self.hits += 1
+        self.delay = min(self.cap, max(self.delay * 2, self.base, retry_after))
+        self.pause_until = max(self.pause_until, time.monotonic() + self.delay)
+
+    def on_success(self) -> None:
+        self.delay = self.delay / 2 if self.delay > self.base else 0.0
+
+
+async def guard_check_many(
+    numbers: Iterable[str],
+    concurrency: Optional[int] = None,
+    max_attempts: int = 5,
+) -> AsyncIterator[Tuple[str, Optional[bool], Optional[str]]]:
+    """
+    Check many numbers concurrently (GUARD_CONCURRENCY by default), yielding (number, is_free, error)
+    as each completes. Cache hits are yielded first; fresh results fill the cache via guard_is_free.
+    429 responses pause every worker with adaptive backoff and the number is retried.
+    """
+    if concurrency is None:
+        from config import GUARD_CONCURRENCY
+        concurrency = GUARD_CONCURRENCY
+    pending: asyncio.Queue = asyncio.Queue()
+    for number in dict.fromkeys(numbers):
+        normalized = phone.digits(number)
+        cached = _cache.get(f"free:{normalized}") if (_cache is not None and normalized) else None
+        if cached is not None:
+            yield number, bool(cached), None
+        else:
+            pending.put_nowait(number)
+    if pending.empty():
+        return
+
+    results: asyncio.Queue = asyncio.Queue()
+    backoff = _AdaptiveBackoff()
+
+    async def worker():
+        while True:
+            try:
+                number = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            outcome = (number, None, "rate limited")
+            for _ in range(max_attempts):
+                await backoff.wait()
+                try:
+                    outcome = (number, await guard_is_free(number), None)
+                    backoff.on_success()
+                    break
+                except GuardRateLimitError as e:
+                    backoff.on_rate_limited(e.retry_after)
+                except Exception as e:
+                    outcome = (number, None, str(e))
+                    break
+            await results.put(outcome)
+
+    total = pending.qsize()
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, total)))]
+    try:
+        for _ in range(total):
+            yield await results.get()
+    finally:
+        for w in workers:
+            w.cancel()
+        if backoff.hits:
+            logging.info("guard_check_many: %d rate-limit hit(s) over %d checks", backoff.hits, total)
 
 
 async def guard_check(number: str) -> Tuple[Optional[bool], str]:
@@ -235,8 +336,8 @@ async def guard_check(number: str) -> Tuple[Optional[bool], str]:
     try:
         is_free = await guard_is_free(number)
         if is_free:
-            return True, f"Number {format_display(parse_anon_number(number) or number)} is available (free on Fragment)."
-        return False, f"Number {format_display(parse_anon_number(number) or number)} is not available (busy on Fragment)."
+            return True, f"Number {phone.display(number)} is available (free on Fragment)."
+        return False, f"Number {phone.display(number)} is not available (busy on Fragment)."
     except RuntimeError as e:
         return None, f"Guard not ready: {e}"
     except ValueError as e:
@@ -263,19 +364,14 @@ def _register_guard_handlers() -> None:
     async def cmd_checknum(_, message):
         try:
             text = (message.text or "").strip().split(maxsplit=1)
-            if len(text) >= 2 and (text[1].startswith("+888") or text[1].replace(" ", "").startswith("888")):
-                number = text[1].strip().replace(" ", "")
-                if not number.startswith("+"):
-                    number = "+" + number
-            else:
+            number = phone.canonical(text[1]) if len(text) >= 2 else None
+            if not number:
                 response = await message.chat.ask(
                     "⚠️ Send the number you want to check (e.g. +888 1234 5678):",
                     timeout=30,
                 )
-                number = (response.text or "").strip().replace(" ", "")
-                if not number.startswith("+"):
-                    number = "+" + number
-            if not number.startswith("+888"):
+                number = phone.canonical(response.text)
+            if not number:
                 await message.reply_text(
                     "<emoji id=\"5767151002666929821\">❌</emoji> Invalid number. Use a +888 number.",
                     parse_mode=ParseMode.HTML,
@@ -346,21 +442,62 @@ def _register_guard_handlers() -> None:
             cache_size = _cache.size if _cache is not None else 0
             from config import GUARD_CACHE_TTL
             ttl = GUARD_CACHE_TTL
+            from hybrid.plugins.fragment import login_code_flight
             text = (
                 "🛡️ <b>Guard status</b>\n\n"
                 f"• API ready: {api_ready}\n"
                 f"• Cookies loaded: {cookies_loaded}\n"
                 f"• Cache size: {cache_size}\n"
                 f"• Cache TTL: {ttl}s\n"
+                f"• Free checks: {_flight.calls} calls, {_flight.coalesced} coalesced\n"
+                f"• Login codes: {login_code_flight.calls} calls, {login_code_flight.coalesced} coalesced\n"
             )
             await message.reply_text(text, parse_mode=ParseMode.HTML)
         except Exception as e:
             await message.reply_text(f"Error: {e}", parse_mode=ParseMode.HTML)
 
+    @Bot.on_message(filters.command("auditpool") & filters.user(ADMINS))
+    async def cmd_auditpool(_, message):
+        from hybrid.plugins.temp import temp
+        from hybrid.plugins.pool import LISTED, AVAILABLE, RENTED
+        numbers = temp.POOL.snapshot().members(LISTED)
+        if not numbers:
+            await message.reply_text("Pool is empty.", parse_mode=ParseMode.HTML)
+            return
+        if _api is None or not _api.ready:
+            await message.reply_text("<emoji id=\"5767151002666929821\">❌</emoji> Guard not ready.", parse_mode=ParseMode.HTML)
+            return
+        status = await message.reply_text(f"🔎 Auditing {len(numbers)} numbers…", parse_mode=ParseMode.HTML)
+        free, busy, errors = [], [], []
+        last_edit = time.monotonic()
+        async for number, is_free, err in guard_check_many(numbers):
+            (errors if err else free if is_free else busy).append(number)
+            if time.monotonic() - last_edit >= 5:
+                last_edit = time.monotonic()
+                try:
+                    await status.edit_text(f"🔎 Auditing… {len(free) + len(busy) + len(errors)}/{len(numbers)}")
+                except Exception:
+                    pass
+        snap = temp.POOL.snapshot()  # fresh: the audit awaited Fragment for every number
+        listed_busy = snap.select(snap.mask(busy) & snap.masks[AVAILABLE] & ~snap.masks[RENTED])
+        lines = [
+            "🔎 <b>Pool audit</b>\n",
+            f"• Checked: {len(numbers)}",
+            f"• Free on Fragment: {len(free)}",
+            f"• Busy on Fragment: {len(busy)}",
+            f"• Errors: {len(errors)}",
+            f"• Listed as available but busy: {len(listed_busy)}",
+        ]
+        if listed_busy:
+            lines.append("\n" + "\n".join(f"<code>{phone.display(n)}</code>" for n in listed_busy[:30]))
+            if len(listed_busy) > 30:
+                lines.append(f"… and {len(listed_busy) - 30} more")
+        await status.edit_text("\n".join(lines), parse_mode=ParseMode.HTML)
+
     @Bot.on_inline_query()
     async def inline_query_handler(_, inline_query):
         query = (inline_query.query or "").strip()
-        number = parse_anon_number(query)
+        number = phone.digits(query)
         if not number:
             await inline_query.answer(
                 [],
@@ -369,7 +506,7 @@ def _register_guard_handlers() -> None:
                 switch_pm_parameter="guard",
             )
             return
-        display = format_display(number)
+        display = phone.display(number)
         try:
             is_free = await guard_is_free(number)
             if is_free:
@@ -0,0 +1,80 @@
+# (©) @Hybrid_Vamp - https://github.com/hybridvamp
+# Localized strings. lang.json is compiled once at startup: {{e:name}} emoji placeholders and the inline
+# Markdown (**bold**, `code`, __italic__) are rendered into each template up front, so t() is a language
+# lookup, a dict lookup and (with kwargs) one str.format. User languages live in a small in-memory cache
+# that callback dispatch and /start warm from Redis; a user not in the cache gets DEFAULT_LANGUAGE.
+
+import re
+from typing import Dict, Optional
+
+DEFAULT_LANGUAGE = "en"
+USER_CACHE_SIZE = 20000
+
+EMOJI_FALLBACK = {
+    "success": "<emoji id=\"5323628709469495421\">✅</emoji>",
+    "error": "<emoji id=\"5767151002666929821\">❌</emoji>",
+    "warning": "⚠️",
+    "phone": "<emoji id=\"5467539229468793355\">📞</emoji>",
+    "money": "<emoji id=\"5375296873982604963\">💰</emoji>",
+    "renew": "<emoji id=\"5264727218734524899\">🔄</emoji>",
+    "get_code": "<emoji id=\"5433811242135331842\">📨</emoji>",
+    "back": "⬅️",
+    "date": "<emoji id=\"5274055917766202507\">📅</emoji>",
+    "loading": "<emoji id=\"5451732530048802485\">⌛</emoji>",
+    "time": "<emoji id=\"5413704112220949842\">🕒</emoji>",
+    "timeout": "<emoji id=\"5242628160297641831\">⏰</emoji>",
+}
+
+_EMOJI_RE = re.compile(r'\{\{e:(\w+)\}\}')
+_BOLD_RE = re.compile(r'\*\*(.+?)\*\*')
+_CODE_RE = re.compile(r'`(.+?)`')
+_ITALIC_RE = re.compile(r'__(.+?)__')
+
+_templates: Dict[str, Dict[str, str]] = {}
+_default: Dict[str, str] = {}
+_user_lang: Dict[int, str] = {}
+
+
+def md_to_html(text: str) -> str:
+    """Convert Markdown to HTML for parse_mode HTML."""
+    text = _BOLD_RE.sub(r'<b>\1</b>', text)
+    text = _CODE_RE.sub(r'<code>\1</code>', text)
+    return _ITALIC_RE.sub(r'<i>\1</i>', text)
+
+
+def compile_template(text: str) -> str:
+    return md_to_html(_EMOJI_RE.sub(lambda m: EMOJI_FALLBACK.get(m.group(1), ""), text))
+
+
+def compile_languages(languages: dict) -> Dict[str, Dict[str, str]]:
+    return {lang: {key: compile_template(text) for key, text in strings.items()} for lang, strings in languages.items()}
+
+
+def load(languages: dict) -> None:
+    global _templates, _default
+    _templates = compile_languages(languages)
+    _default = _templates.get(DEFAULT_LANGUAGE, {})
+
+
+def available_languages():
+    return list(_templates)
+
+
+def cached_language(user_id: int) -> Optional[str]:
+    return _user_lang.get(user_id)
+
+
+def remember_language(user_id: int, lang: Optional[str]) -> None:
+    """Cache a user's language (unknown or unset languages are cached as the default)."""
+    if user_id not in _user_lang and len(_user_lang) >= USER_CACHE_SIZE:
+        del _user_lang[next(iter(_user_lang))]
+    _user_lang[user_id] = lang if lang in _templates else DEFAULT_LANGUAGE
+
+
+def t(user_id: int, key: str, **kwargs) -> str:
+    text = _templates.get(_user_lang.get(user_id), _default).get(key)
+    if text is None:
+        text = _default.get(key)
+        if text is None:
+            text = compile_template(key)
+    return text.format(**kwargs) if kwargs else text
@@ -0,0 +1,291 @@
+# (©) @Hybrid_Vamp - https://github.com/hybridvamp
+# Outbound dispatcher — every bot-initiated send (payment edits, reminders, expiry/7-day notices,
+# broadcasts) goes through one priority queue with global + per-chat token buckets.
+# A FloodWait reschedules only the affected chat; other senders keep flowing.
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from pyrogram import filters
+from pyrogram.enums import ParseMode
+from pyrogram.errors import FloodWait
+
+PRIORITY_PAYMENT = 0
+PRIORITY_NOTICE = 1
+PRIORITY_BULK = 2
+_PRIORITY_NAMES = {PRIORITY_PAYMENT: "payment", PRIORITY_NOTICE: "notice", PRIORITY_BULK: "bulk"}
+
+# Telegram bot limits: ~30 msg/s overall, ~1 msg/s per private chat (short bursts tolerated).
+GLOBAL_RATE = 25.0
+GLOBAL_BURST = 30
+CHAT_RATE = 1.0
+CHAT_BURST = 3
+MAX_IN_FLIGHT = 16
+MAX_FLOOD_RETRIES = 3
+
+
+class TokenBucket:
+    """Classic token bucket; take() returns 0 when a token was consumed, else seconds until one is available."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now). Does not consume."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> float:
+        wait = self.wait_time(now)
+        if not wait:
+            self.tokens -= 1
+        return wait
+
+    def idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class _Item:
+    __slots__ = ("priority", "chat_id", "func", "args", "kwargs", "future", "enqueued", "retry_on_flood", "attempts")
+
+    def __init__(self, priority, chat_id, func, args, kwargs, future, retry_on_flood):
+        self.priority = priority
+        self.chat_id = chat_id
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.enqueued = time.monotonic()
+        self.retry_on_flood = retry_on_flood
+        self.attempts = 0
+
+
+class Outbox:
+    """Priority send queue. submit() returns a future resolved with the API call's result (or its exception)."""
+
+    def __init__(self, global_rate: float = GLOBAL_RATE, global_burst: float = GLOBAL_BURST,
+                 chat_rate: float = CHAT_RATE, chat_burst: float = CHAT_BURST, max_in_flight: int = MAX_IN_FLIGHT):
+        self._global = TokenBucket(global_rate, global_burst)
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._chats: Dict[Any, TokenBucket] = {}
+        self._flood_until: Dict[Any, float] = {}
+        self._ready: list = []    # (priority, seq, item)
+        self._delayed: list = []  # (not_before, seq, item)
+        self._seq = itertools.count()
+        self._wake = asyncio.Event()
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._task: Optional[asyncio.Task] = None
+        self._followups: set = set()  # on_sent tasks of post_message, held until they finish
+        self._latency = {p: deque(maxlen=500) for p in _PRIORITY_NAMES}
+        self.sent = 0
+        self.failed = 0
+        self.flood_waits = 0
+        self.in_flight = 0
+
+    # ----- public API -----
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def submit(self, priority: int, chat_id, func: Callable[..., Awaitable], *args,
+               retry_on_flood: bool = True, **kwargs) -> asyncio.Future:
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        item = _Item(priority, chat_id, func, args, kwargs, future, retry_on_flood)
+        heapq.heappush(self._ready, (priority, next(self._seq), item))
+        self._wake.set()
+        return future
+
+    async def send_message(self, client, chat_id, text, priority: int = PRIORITY_NOTICE, **kwargs):
+        return await self.submit(priority, chat_id, client.send_message, chat_id, text, **kwargs)
+
+    def post_message(self, client, chat_id, text, priority: int = PRIORITY_NOTICE,
+                     on_sent: Optional[Callable[[], Awaitable]] = None, **kwargs) -> asyncio.Future:
+        """
+        send_message for background loops that must not wait on delivery (FloodWait retries can hold an
+        item for minutes). Failures are logged; on_sent() is run as a task once the message went out.
+        """
+        future = self.submit(priority, chat_id, client.send_message, chat_id, text, **kwargs)
+
+        def _done(f: asyncio.Future) -> None:
+            if f.cancelled():
+                return
+            if f.exception() is not None:
+                logging.error(f"Outbox: message to {chat_id} not delivered: {f.exception()}")
+            elif on_sent is not None:
+                task = asyncio.create_task(on_sent())
+                self._followups.add(task)
+                task.add_done_callback(self._followups.discard)
+
+        future.add_done_callback(_done)
+        return future
+
+    async def edit_message_text(self, client, chat_id, message_id, text, priority: int = PRIORITY_PAYMENT, **kwargs):
+        return await self.submit(priority, chat_id, client.edit_message_text, chat_id, message_id, text, **kwargs)
+
+    async def copy_message(self, client, chat_id, from_chat_id, message_id, priority: int = PRIORITY_BULK, **kwargs):
+        return await self.submit(priority, chat_id, client.copy_message, chat_id, from_chat_id, message_id, **kwargs)
+
+    def depth(self) -> Dict[str, int]:
+        counts = {name: 0 for name in _PRIORITY_NAMES.values()}
+        for _, _, item in self._ready:
+            counts[_PRIORITY_NAMES.get(item.priority, "bulk")] += 1
+        counts["delayed"] = len(self._delayed)
+        return counts
+
+    def stats(self) -> Dict[str, Any]:
+        latency = {}
+        for p, samples in self._latency.items():
+            if samples:
+                ordered = sorted(samples)
+                latency[_PRIORITY_NAMES[p]] = (
+                    ordered[len(ordered) // 2],
+                    ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                )
+        return {
+            "depth": self.depth(),
+            "in_flight": self.in_flight,
+            "sent": self.sent,
+            "failed": self.failed,
+            "flood_waits": self.flood_waits,
+            "latency": latency,
+            "chats_tracked": len(self._chats),
+        }
+
+    # ----- scheduler -----
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > 10000:
+                now = time.monotonic()
+                self._chats = {c: b for c, b in self._chats.items() if not b.idle(now)}
+                self._flood_until = {c: u for c, u in self._flood_until.items() if u > now}
+            bucket = self._chats[chat_id] = TokenBucket(self._chat_rate, self._chat_burst)
+        return bucket
+
+    def _defer(self, item: _Item, not_before: float) -> None:
+        heapq.heappush(self._delayed, (not_before, next(self._seq), item))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, _, item = heapq.heappop(self._delayed)
+                    heapq.heappush(self._ready, (item.priority, next(self._seq), item))
+                if not self._ready:
+                    timeout = self._delayed[0][0] - now if self._delayed else None
+                    self._wake.clear()
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                _, _, item = heapq.heappop(self._ready)
+                if item.future.done():  # caller cancelled
+                    continue
+                flood_until = self._flood_until.get(item.chat_id, 0.0)
+                if flood_until > now:
+                    self._defer(item, flood_until)
+                    continue
+                chat_bucket = self._chat_bucket(item.chat_id)
+                wait = chat_bucket.wait_time(now)
+                if wait:
+                    self._defer(item, now + wait)
+                    continue
+                wait = self._global.take(now)
+                if wait:
+                    # Global budget exhausted: hold this item at the head and let tokens refill.
+                    heapq.heappush(self._ready, (item.priority, next(self._seq), item))
+                    await asyncio.sleep(wait)
+                    continue
+                chat_bucket.take(now)
+
+                await self._slots.acquire()
+                self.in_flight += 1
+                asyncio.create_task(self._deliver(item))
+            except Exception as e:
+                logging.error(f"Outbox scheduler error: {e}")
+                await asyncio.sleep(1)
+
+    async def _deliver(self, item: _Item) -> None:
+        try:
+            item.attempts += 1
+            result = await item.func(*item.args, **item.kwargs)
+        except FloodWait as e:
+            self.flood_waits += 1
+            until = time.monotonic() + float(e.value) + 1
+            self._flood_until[item.chat_id] = max(self._flood_until.get(item.chat_id, 0.0), until)
+            if item.retry_on_flood and item.attempts <= MAX_FLOOD_RETRIES:
+                logging.info(f"Outbox FloodWait {e.value}s for chat {item.chat_id}; rescheduled.")
+                self._defer(item, until)
+                self._wake.set()
+            else:
+                self.failed += 1
+                if not item.future.done():
+                    item.future.set_exception(e)
+        except Exception as e:
+            self.failed += 1
+            if not item.future.done():
+                item.future.set_exception(e)
+        else:
+            self.sent += 1
+            self._latency[item.priority if item.priority in self._latency else PRIORITY_BULK].append(
+                time.monotonic() - item.enqueued
+            )
+            if not item.future.done():
+                item.future.set_result(result)
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+
+outbox = Outbox()
+
+
+def _register_outbox_handlers() -> None:
+    from hybrid import Bot
+    from config import ADMINS
+
+    @Bot.on_message(filters.command("outbox") & filters.user(ADMINS))
+    async def cmd_outbox(_, message):
+        s = outbox.stats()
+        depth = s["depth"]
+        lines = [
+            "📤 <b>Outbox</b>\n",
+            f"• Queued: payment {depth['payment']} / notice {depth['notice']} / bulk {depth['bulk']}",
+            f"• Delayed (rate/flood): {depth['delayed']}",
+            f"• In flight: {s['in_flight']}",
+            f"• Sent: {s['sent']} | Failed: {s['failed']} | FloodWaits: {s['flood_waits']}",
+            f"• Chats tracked: {s['chats_tracked']}",
+        ]
+        for name, (p50, p95) in s["latency"].items():
+            lines.append(f"• Latency {name}: p50 {p50 * 1000:.0f}ms / p95 {p95 * 1000:.0f}ms")
+        await message.reply_text("\n".join(lines), parse_mode=ParseMode.HTML)
+
+
+# Register when module is loaded (hybrid/plugins is the plugin root, so this runs on import)
+try:
+    _register_outbox_handlers()
+except Exception as e:
+    logging.warning("Outbox handler registration failed: %s", e)
@@ -0,0 +1,68 @@
+# (©) @Hybrid_Vamp - https://github.com/hybridvamp
+# Canonical +888 number identity. Every module parses numbers through canonical() / parse_number()
+# so Redis keys, index keys, callback data and Fragment lookups all agree on one spelling:
+# "+888" followed by digits. Parses are memoized and the results interned, so repeated lookups of
+# the same number (callbacks, index hits, pool scans) cost one dict probe and share one string object.
+
+import sys
+from functools import lru_cache
+from typing import Optional
+
+PREFIX = "+888"
+
+# One pass: fullwidth / Arabic-Indic digits -> ASCII, look-alike plus signs -> "+",
+# separators (space, NBSP, dashes, dots, parentheses, BOM) dropped.
+_TRANSLATE = str.maketrans(
+    {
+        **{c: str(i) for i, c in enumerate("\uff10\uff11\uff12\uff13\uff14\uff15\uff16\uff17\uff18\uff19")},
+        **{c: str(i) for i, c in enumerate("\u0660\u0661\u0662\u0663\u0664\u0665\u0666\u0667\u0668\u0669")},
+        **{c: "+" for c in "\uff0b\u2795\ufe62\u2393\u066b\u066c"},
+        **{c: None for c in " \t\u00a0\u2009\u202f-\u2010\u2011\u2012\u2013\u2014\u2212.()\ufeff"},
+    }
+)
+
+
+@lru_cache(maxsize=65536)
+def _parse(raw: str, short: bool) -> Optional[str]:
+    s = raw.strip().translate(_TRANSLATE)
+    plus = s.startswith("+")
+    s = s.lstrip("+")
+    if not s.isdigit() or not s.isascii():
+        return None
+    if s.startswith("888") and len(s) >= 11:
+        return sys.intern("+" + s)
+    if short and not plus and len(s) == 8:
+        return sys.intern(PREFIX + s)
+    return None
+
+
+def canonical(number) -> Optional[str]:
+    """Canonical "+888XXXXXXXX" for a full number in any spelling (888…, +888 1234 5678, fullwidth), else None."""
+    if number.__class__ is str:
+        return _parse(number, False)
+    return None if number is None else _parse(str(number), False)
+
+
+def parse_number(number) -> Optional[str]:
+    """Like canonical(), but also accepts the bare 8-digit local part users type (12345678 -> +88812345678)."""
+    if number.__class__ is str:
+        return _parse(number, True)
+    return None if number is None else _parse(str(number), True)
+
+
+def digits(number) -> Optional[str]:
+    """Canonical number without the plus sign (Fragment API form), or None."""
+    n = parse_number(number)
+    return n[1:] if n else None
+
+
+def display(number) -> str:
+    """'+888 1234 5678' for a parseable number; the input unchanged otherwise."""
+    n = parse_number(number)
+    if not n:
+        return str(number or "")
+    return f"{n[:4]} {n[4:8]} {n[8:]}"
+
+
+def cache_info():
+    return _parse.cache_info()
@@ -0,0 +1,132 @@
+# (©) @Hybrid_Vamp - https://github.com/hybridvamp
+# In-memory number pool state. Every number gets a dense integer id on first sight and each status
+# (listed in the pool, available, rented, unavailable, restricted) is a bitset over those ids, held in
+# a Python int. Counts are popcounts and filters are AND/NOT. Readers take an immutable, versioned
+# PoolSnapshot and never lock; writers build the next snapshot synchronously (no await between read
+# and swap), so on the event loop every update is atomic.
+
+from itertools import compress
+from typing import Dict, Iterable, List, Optional, Tuple
+
+LISTED = 0        # currently in the Fragment pool
+AVAILABLE = 1     # listed as rentable
+RENTED = 2        # has an active rental (may include admin-assigned numbers outside the pool)
+UNAVAILABLE = 3   # disabled by an admin
+RESTRICTED = 4    # restricted by Fragment
+STATUSES = (LISTED, AVAILABLE, RENTED, UNAVAILABLE, RESTRICTED)
+LISTING_STATUSES = (LISTED, RENTED, UNAVAILABLE)  # the statuses the rent listing is derived from
+
+# bin() digits -> 0/1 bytes, so itertools.compress can walk a bitset in C.
+_BITS = bytes.maketrans(b"01", b"\x00\x01")
+
+
+class PoolSnapshot:
+    """Immutable view of the pool at one version. Ids are stable, so masks from one snapshot can be combined freely."""
+
+    __slots__ = ("version", "listing_version", "masks", "_numbers", "_ids", "_size", "_memo")
+
+    def __init__(self, version: int, listing_version: int, numbers: List[str], ids: Dict[str, int], masks: Tuple[int, ...]):
+        self.version = version
+        # Bumped only when LISTING_STATUSES change, so caches of rendered listing pages survive
+        # unrelated writes (availability flags, restrictions).
+        self.listing_version = listing_version
+        self.masks = masks
+        # numbers/ids are append-only and shared with the pool; _size pins what this snapshot can see.
+        self._numbers = numbers
+        self._ids = ids
+        self._size = len(numbers)
+        self._memo = {}
+
+    def has(self, status: int, number: str) -> bool:
+        i = self._ids.get(number)
+        return i is not None and i < self._size and bool(self.masks[status] >> i & 1)
+
+    def count(self, status: int) -> int:
+        return self.masks[status].bit_count()
+
+    def mask(self, numbers: Iterable[str]) -> int:
+        """Bitset of the given numbers (unknown numbers are ignored)."""
+        bits = 0
+        for n in numbers:
+            i = self._ids.get(n)
+            if i is not None and i < self._size:
+                bits |= 1 << i
+        return bits
+
+    def select(self, bits: int) -> List[str]:
+        """Numbers whose bit is set, in id (insertion) order."""
+        if not bits:
+            return []
+        return list(compress(self._numbers, bin(bits)[:1:-1].encode().translate(_BITS)))
+
+    def members(self, status: int) -> List[str]:
+        key = ("members", status)
+        if key not in self._memo:
+            self._memo[key] = self.select(self.masks[status])
+        return self._memo[key]
+
+    def listing(self) -> Tuple[List[str], List[str]]:
+        """(free, rented) numbers shown in the rent listing: listed and not disabled, free ones first."""
+        if "listing" not in self._memo:
+            shown = self.masks[LISTED] & ~self.masks[UNAVAILABLE]
+            self._memo["listing"] = (
+                self.select(shown & ~self.masks[RENTED]),
+                self.select(shown & self.masks[RENTED]),
+            )
+        return self._memo["listing"]
+
+    def rentable(self) -> int:
+        """Available, not rented and not disabled (the /stats "available" figure)."""
+        return (self.masks[AVAILABLE] & ~self.masks[RENTED] & ~self.masks[UNAVAILABLE]).bit_count()
+
+
+class NumberPool:
+    """Owns the id table and publishes a new PoolSnapshot on every change."""
+
+    def __init__(self):
+        self._numbers: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._snap = PoolSnapshot(0, 0, self._numbers, self._ids, (0,) * len(STATUSES))
+
+    def snapshot(self) -> PoolSnapshot:
+        return self._snap
+
+    def _bits(self, numbers: Iterable[str], assign: bool) -> int:
+        bits = 0
+        for n in numbers:
+            i = self._ids.get(n)
+            if i is None:
+                if not assign:
+                    continue
+                i = self._ids[n] = len(self._numbers)
+                self._numbers.append(n)
+            bits |= 1 << i
+        return bits
+
+    def apply(self, add: Optional[Dict[int, Iterable[str]]] = None,
+              remove: Optional[Dict[int, Iterable[str]]] = None,
+              replace: Optional[Dict[int, Iterable[str]]] = None) -> PoolSnapshot:
+        """Replace, then remove, then add per status, and publish the result as one new snapshot."""
+        masks = list(self._snap.masks)
+        for status, numbers in (replace or {}).items():
+            masks[status] = self._bits(numbers, True)
+        for status, numbers in (remove or {}).items():
+            masks[status] &= ~self._bits(numbers, False)
+        for status, numbers in (add or {}).items():
+            masks[status] |= self._bits(numbers, True)
+        masks = tuple(masks)
+        prev = self._snap
+        if masks != prev.masks or len(self._numbers) != prev._size:
+            same_listing = all(masks[s] == prev.masks[s] for s in LISTING_STATUSES)
+            self._snap = PoolSnapshot(
+                prev.version + 1, prev.listing_version + (not same_listing), self._numbers, self._ids, masks
+            )
+            if same_listing and "listing" in prev._memo:
+                self._snap._memo["listing"] = prev._memo["listing"]
+        return self._snap
+
+    def add(self, status: int, numbers: Iterable[str]) -> PoolSnapshot:
+        return self.apply(add={status: numbers})
+
+    def discard(self, status: int, numbers: Iterable[str]) -> PoolSnapshot:
+        return self.apply(remove={status: numbers})
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark the precompiled i18n templates against the former func.t(), which ran four re.sub passes and
+rebuilt its emoji map on every call. Checks both render identically for every lang.json key, then times a
+typical callback render (a handful of t() calls, with and without format kwargs).
+
+Usage:
+  python hybrid/plugins/scripts/bench_lang.py [--repeat N] [--lang-file lang.json]
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import importlib.util
+import string
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+
+
+# ----- legacy implementation, kept verbatim for comparison -----
+
+def legacy_md_to_html(text: str) -> str:
+    text = re.sub(r'\*\*(.+?)\*\*', r'<b>\1</b>', text)
+    text = re.sub(r'`(.+?)`', r'<code>\1</code>', text)
+    text = re.sub(r'__(.+?)__', r'<i>\1</i>', text)
+    return text
+
+
+def make_legacy_t(languages):
+    _EN = languages.get("en", {})
+
+    def t(user_id: int, key: str, **kwargs):
+        text = _EN.get(key, key)
+        _emoji_fallback = {"success":"<emoji id=\"5323628709469495421\">✅</emoji>","error":"<emoji id=\"5767151002666929821\">❌</emoji>","warning":"⚠️","phone":"<emoji id=\"5467539229468793355\">📞</emoji>","money":"<emoji id=\"5375296873982604963\">💰</emoji>","renew":"<emoji id=\"5264727218734524899\">🔄</emoji>","get_code":"<emoji id=\"5433811242135331842\">📨</emoji>","back":"⬅️","date":"<emoji id=\"5274055917766202507\">📅</emoji>","loading":"<emoji id=\"5451732530048802485\">⌛</emoji>","time":"<emoji id=\"5413704112220949842\">🕒</emoji>","timeout":"<emoji id=\"5242628160297641831\">⏰</emoji>"}
+        text = re.sub(r'\{\{e:(\w+)\}\}', lambda m: _emoji_fallback.get(m.group(1), ""), text)
+        text = legacy_md_to_html(text)
+        return text.format(**kwargs) if kwargs else text
+
+    return t
+
+
+def sample_kwargs(template: str) -> dict:
+    return {name: f"<{name}>" for _, name, _, _ in string.Formatter().parse(template) if name}
+
+
+def bench(fn, calls, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for key, kwargs in calls:
+            fn(12345, key, **kwargs)
+    return (time.perf_counter() - start) / (repeat * len(calls)) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark localized template rendering")
+    parser.add_argument("--repeat", type=int, default=5000)
+    parser.add_argument("--lang-file", default=os.path.join(ROOT, "lang.json"))
+    args = parser.parse_args()
+
+    with open(args.lang_file, encoding="utf-8") as f:
+        languages = json.load(f)
+
+    # Load i18n.py by path: it has no dependencies, and importing the hybrid package would start the bot config.
+    spec = importlib.util.spec_from_file_location("i18n", os.path.join(os.path.dirname(__file__), "..", "i18n.py"))
+    i18n = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(i18n)
+    t0 = time.perf_counter()
+    i18n.load(languages)
+    compile_ms = (time.perf_counter() - t0) * 1000
+    legacy_t = make_legacy_t(languages)
+
+    en = languages.get("en", {})
+    ok = True
+    for key, text in list(en.items()) + [("missing_key", None)]:
+        kwargs = sample_kwargs(text) if text else {}
+        old, new = legacy_t(1, key, **kwargs), i18n.t(1, key, **kwargs)
+        if old != new:
+            ok = False
+            print(f"MISMATCH {key!r}:\n  old {old!r}\n  new {new!r}")
+    print(f"templates: {len(en)} keys, {'all match' if ok else 'MISMATCHES above'} (compiled in {compile_ms:.1f} ms)")
+
+    # A /start + rent-listing render: buttons without kwargs, one formatted body.
+    calls = [(k, {}) for k in ("rent", "my_rentals", "profile", "help", "contact_support", "back", "next", "back_home")]
+    calls.append(("welcome", sample_kwargs(en.get("welcome", ""))))
+    calls.append(("rental_success", sample_kwargs(en.get("rental_success", ""))))
+    t_old = bench(legacy_t, calls, args.repeat)
+    t_new = bench(i18n.t, calls, args.repeat)
+    print(f"\nt() over {len(calls)} keys x {args.repeat}, ns/call")
+    print(f"  legacy re.sub : {t_old:8.0f}")
+    print(f"  precompiled   : {t_new:8.0f}  ({t_old / t_new if t_new else float('inf'):.1f}x)")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
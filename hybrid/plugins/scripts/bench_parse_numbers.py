@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark the single-pass Fragment number parser against the former BeautifulSoup parser.
+Checks both return the same numbers for every fixture, then times each.
+
+Usage:
+  python hybrid/plugins/scripts/bench_parse_numbers.py [page.html ...] [--repeat N] [--synthetic-rows N]
+  Save fixtures from the browser (View source on https://fragment.com/my/numbers). With no paths,
+  a synthetic /my/numbers-like page is generated.
+"""
+import os
+import re
+import sys
+import argparse
+import random
+import time
+
+
+def legacy_parse_numbers(html: str):
+    """The previous four-pass BeautifulSoup implementation, kept verbatim for comparison."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    found = set()
+    for match in re.findall(r"\+888\d{4,15}", soup.get_text(separator=" ")):
+        found.add(match)
+    for a in soup.select("a[href]"):
+        href = a["href"]
+        m = re.search(r"(?:/number/|\b)(\+?888\d{4,15})", href)
+        if m:
+            num = m.group(1)
+            if not num.startswith("+"):
+                num = "+" + num
+            found.add(num)
+        text = a.get_text(strip=True)
+        m2 = re.search(r"\+888\d{4,15}", text)
+        if m2:
+            found.add(m2.group(0))
+    for candidate in soup.select(".number, .tm-number, .number-item, .my-number, .phone"):
+        txt = candidate.get_text(" ", strip=True)
+        m = re.search(r"\+888\d{4,15}", txt)
+        if m:
+            found.add(m.group(0))
+    for tag in soup.find_all(attrs=True):
+        for attr_val in tag.attrs.values():
+            if isinstance(attr_val, (list, tuple)):
+                attr_val = " ".join(attr_val)
+            if isinstance(attr_val, str):
+                m = re.search(r"\+888\d{4,15}", attr_val)
+                if m:
+                    found.add(m.group(0))
+    return sorted({re.sub(r"\s+", "", n) for n in found})
+
+
+def synthetic_page(rows: int) -> str:
+    rnd = random.Random(888)
+    parts = [
+        "<!DOCTYPE html><html><head><title>My Numbers</title>",
+        "<script>window.Aj={state:{}};var x='<div>';</script><style>.tm-row{display:flex}</style></head><body>",
+        "<!-- header --><div class=\"tm-main\"><table class=\"table tm-table\"><tbody>",
+    ]
+    for _ in range(rows):
+        n = "888" + "".join(rnd.choice("0123456789") for _ in range(8))
+        parts.append(
+            f'<tr class="tm-row-selectable"><td><a href="/number/{n}" class="table-cell">'
+            f'<div class="table-cell-value tm-value">+{n[:3]} {n[3:7]} {n[7:]}</div>'
+            f'<div class="table-cell-desc">Anonymous number</div></a></td>'
+            f'<td><div class="tm-status" data-number="+{n}">Owned &middot; <span>Active</span></div></td></tr>'
+        )
+    parts.append("</tbody></table></div></body></html>")
+    return "".join(parts)
+
+
+def bench(fn, html: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(html)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Fragment number parsers")
+    parser.add_argument("fixtures", nargs="*", help="Saved HTML pages")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--synthetic-rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+    from hybrid.plugins.fragment import _parse_numbers_from_html
+
+    pages = []
+    for path in args.fixtures:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            pages.append((path, f.read()))
+    if not pages:
+        pages.append((f"synthetic ({args.synthetic_rows} rows)", synthetic_page(args.synthetic_rows)))
+
+    ok = True
+    for name, html in pages:
+        old, new = legacy_parse_numbers(html), _parse_numbers_from_html(html)
+        same = old == new
+        ok = ok and same
+        t_old = bench(legacy_parse_numbers, html, args.repeat)
+        t_new = bench(_parse_numbers_from_html, html, args.repeat)
+        print(f"{name}: {len(html) / 1024:.0f} KiB, {len(new)} numbers, match={same}")
+        print(f"  bs4 four-pass : {t_old:8.2f} ms")
+        print(f"  single-pass   : {t_new:8.2f} ms  ({t_old / t_new if t_new else float('inf'):.1f}x)")
+        if not same:
+            print(f"  only bs4   : {sorted(set(old) - set(new))[:10]}")
+            print(f"  only fast  : {sorted(set(new) - set(old))[:10]}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for hybrid.plugins.phone against the five number normalizers it replaced (db._norm_num,
+db._normalize_for_lookup, func.normalize_phone, guard.parse_anon_number and the ad hoc "+888" prefixing
+in callback.py). The equivalence corpus lives in tests/test_phone.py.
+
+Usage:
+  python hybrid/plugins/scripts/bench_phone.py [--repeat N] [--distinct N]
+"""
+import os
+import re
+import argparse
+import importlib.util
+import random
+import time
+
+# ----- legacy implementations, kept verbatim for comparison -----
+
+_DIGIT_TBL = str.maketrans("０１２３４５６７８９٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+
+
+def legacy_norm_num(n):
+    s = str(n or "").strip().replace(" ", "").replace("-", "")
+    if s.startswith("+888") and len(s) >= 12:
+        return s
+    if s.startswith("888") and len(s) >= 11:
+        return "+" + s
+    return s if s.startswith("+888") else None
+
+
+def legacy_normalize_for_lookup(s):
+    if s is None:
+        return None
+    s = str(s).strip().replace(" ", "").replace("-", "").replace("﻿", "")
+    s = s.lstrip("+٫٬⎓＋+")
+    s = s.translate(_DIGIT_TBL)
+    if not s or not s.isdigit():
+        return None
+    if s.startswith("888") and len(s) >= 11:
+        return "+" + s
+    if s.startswith("888") and len(s) == 8:
+        return "+888" + s
+    if len(s) == 8 and s.isdigit():
+        return "+888" + s
+    if s.startswith("+888") and len(s) >= 12:
+        return s
+    return None
+
+
+def legacy_normalize_phone(number):
+    if number is None:
+        return None
+    s = str(number).strip().replace(" ", "").replace("-", "")
+    if not s:
+        return None
+    if s.startswith("+888") and len(s) >= 12:
+        return s
+    if s.startswith("888") and len(s) >= 11:
+        return "+" + s
+    if s.isdigit() and len(s) == 8:
+        return "+888" + s
+    return None
+
+
+ANON_NUMBER_RE = re.compile(r"^\+?888[-\s]?\d{4}([-.\\s]?\d{4})?$")
+ANON_NUMBER_RAW_RE = re.compile(r"[^\d]")
+
+
+def legacy_parse_anon_number(raw):
+    if not raw or not isinstance(raw, str):
+        return None
+    s = raw.strip()
+    if not ANON_NUMBER_RE.match(s):
+        return None
+    digits = ANON_NUMBER_RAW_RE.sub("", s)
+    if digits.startswith("888") and len(digits) >= 11:
+        return digits
+    return None
+
+
+def legacy_callback_prefix(raw):
+    number = str(raw or "").strip().replace(" ", "")
+    if number.startswith("888") and not number.startswith("+888"):
+        number = "+" + number
+    return number if number.startswith("+888") else None
+
+
+LEGACY = {
+    "db._norm_num": legacy_norm_num,
+    "db._normalize_for_lookup": legacy_normalize_for_lookup,
+    "func.normalize_phone": legacy_normalize_phone,
+    "guard.parse_anon_number": lambda raw: ("+" + legacy_parse_anon_number(raw)) if legacy_parse_anon_number(raw) else None,
+    "callback +888 prefixing": legacy_callback_prefix,
+}
+
+
+def bench(fn, inputs, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for x in inputs:
+            fn(x)
+    return (time.perf_counter() - start) / (repeat * len(inputs)) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark canonical number parsing")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--distinct", type=int, default=2000, help="Distinct numbers in the benchmark set")
+    args = parser.parse_args()
+
+    # Load phone.py by path: it has no dependencies, and importing the hybrid package would start the bot config.
+    spec = importlib.util.spec_from_file_location("phone", os.path.join(os.path.dirname(__file__), "..", "phone.py"))
+    phone = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(phone)
+
+    rnd = random.Random(888)
+    pool = [f"+888{rnd.randrange(10 ** 8):08d}" for _ in range(args.distinct)]
+    spellings = [rnd.choice((n, n[1:], f"{n[:4]} {n[4:8]} {n[8:]}")) for n in pool for _ in range(5)]
+    print(f"\nbenchmark: {len(spellings)} lookups over {args.distinct} numbers, ns/call")
+    phone._parse.cache_clear()
+    for name, fn in [("phone.parse_number", phone.parse_number), ("phone.canonical", phone.canonical)] + list(LEGACY.items()):
+        print(f"  {name:26}: {bench(fn, spellings, args.repeat):8.0f}")
+    print(f"  {phone.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
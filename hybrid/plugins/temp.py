@@ -1,6 +1,6 @@
 #(©) @Hybrid_Vamp - https://github.com/hybridvamp
 
-import asyncio
+from hybrid.plugins.pool import NumberPool
 
 
 class temp(object):
@@ -8,15 +8,5 @@ class temp(object):
     PAID_LOCK = set()
     INV_DICT = {}
     PENDING_INV = set()
-    NUMBE_RS = []
-    NUMBE_RS_SET = set()  # O(1) membership; keep in sync with NUMBE_RS
-    AVAILABLE_NUM = set()
-    RENTED_NUMS = set()
-    UN_AV_NUMS = set()
-    RESTRICTED_NUMS = set()
-    _lock = asyncio.Lock()
-
-    @classmethod
-    def get_lock(cls):
-        return cls._lock
-    
+    POOL = NumberPool()  # number statuses as bitsets; read via POOL.snapshot(), never under a lock
+    ADMIN_IDS = set()  # O(1) admin checks; mirrors config.ADMINS + DB admins (filled at import/startup)
@@ -0,0 +1,33 @@
+# (©) @Hybrid_Vamp - https://github.com/hybridvamp
+import os
+import sys
+import types
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+
+def _plugins():
+    # Register hybrid / hybrid.plugins as bare packages so plugin modules import without running
+    # hybrid/__init__.py, which configures logging and builds the bot client.
+    for name, path in (("hybrid", "hybrid"), ("hybrid.plugins", os.path.join("hybrid", "plugins"))):
+        if name not in sys.modules:
+            pkg = types.ModuleType(name)
+            pkg.__path__ = [os.path.join(ROOT, path)]
+            sys.modules[name] = pkg
+
+
+@pytest.fixture(scope="session")
+def db():
+    _plugins()
+    from hybrid.plugins import db
+    return db
+
+
+@pytest.fixture(scope="session")
+def phone():
+    _plugins()
+    from hybrid.plugins import phone
+    return phone
@@ -0,0 +1,40 @@
+# (©) @Hybrid_Vamp - https://github.com/hybridvamp
+import asyncio
+
+import pytest
+
+pytest.importorskip("redis")
+pytest.importorskip("dotenv")
+pytest.importorskip("pyrogram")
+
+
+class _MemoryRedis:
+    """The two calls delete_all_data makes, over a dict."""
+
+    def __init__(self, keys):
+        self.keys = dict.fromkeys(keys, "")
+
+    async def scan_iter(self, match="*"):
+        for key in list(self.keys):
+            yield key
+
+    async def delete(self, *keys):
+        return sum(self.keys.pop(key, None) is not None for key in keys)
+
+
+def test_delete_all_data_flushes_near_cache(db, monkeypatch):
+    keys = ["number:+88800000001", "rental:+88800000001", "user:42"]
+    monkeypatch.setattr(db, "client", _MemoryRedis(keys))
+    for key in keys:
+        db._near.put(key, db._near.begin(key), {"key": key}, ttl=60)
+    pending = db._near.begin("user:43")
+    assert db._near.stats()["entries"] == len(keys)
+
+    stat, _ = asyncio.run(db.delete_all_data())
+
+    assert stat
+    assert db._near.stats()["entries"] == 0
+    assert all(db._near.get(key) is None for key in keys)
+    # A read that was in flight across the wipe must not repopulate the cache.
+    db._near.put("user:43", pending, {"user_id": "43"}, ttl=60)
+    assert db._near.get("user:43") is None
@@ -0,0 +1,51 @@
+# (©) @Hybrid_Vamp - https://github.com/hybridvamp
+# Equivalence corpus for hybrid.plugins.phone: every spelling the five legacy normalizers accepted
+# (see hybrid/plugins/scripts/bench_phone.py for the timing comparison) maps to one canonical form.
+import pytest
+
+# input -> (canonical(), parse_number())
+CORPUS = [
+    ("+88812345678", "+88812345678", "+88812345678"),
+    ("88812345678", "+88812345678", "+88812345678"),
+    ("+888 1234 5678", "+88812345678", "+88812345678"),
+    ("888 1234 5678", "+88812345678", "+88812345678"),
+    ("+888-1234-5678", "+88812345678", "+88812345678"),
+    ("+888.1234.5678", "+88812345678", "+88812345678"),
+    ("  +88812345678\n", "+88812345678", "+88812345678"),
+    ("﻿+88812345678", "+88812345678", "+88812345678"),
+    ("+888 1234 5678", "+88812345678", "+88812345678"),
+    ("＋８８８１２３４５６７８", "+88812345678", "+88812345678"),
+    ("٨٨٨١٢٣٤٥٦٧٨", "+88812345678", "+88812345678"),
+    ("+888 (1234) 5678", "+88812345678", "+88812345678"),
+    ("+8881234567890", "+8881234567890", "+8881234567890"),
+    (88812345678, "+88812345678", "+88812345678"),
+    ("12345678", None, "+88812345678"),
+    ("+12345678", None, None),
+    ("88812345", None, "+88888812345"),
+    ("+88812345", None, None),
+    ("+888abc12345", None, None),
+    ("+8881234567", None, None),
+    ("+79991234567", None, None),
+    ("1234567890", None, None),
+    ("", None, None),
+    ("   ", None, None),
+    (None, None, None),
+    ("+888", None, None),
+]
+
+
+@pytest.mark.parametrize("raw, want_canonical, want_parsed", CORPUS)
+def test_corpus(phone, raw, want_canonical, want_parsed):
+    assert phone.canonical(raw) == want_canonical
+    assert phone.parse_number(raw) == want_parsed
+
+
+@pytest.mark.parametrize("raw, want_canonical, want_parsed", CORPUS)
+def test_digits_and_display_follow_parse_number(phone, raw, want_canonical, want_parsed):
+    assert phone.digits(raw) == (want_parsed[1:] if want_parsed else None)
+    if want_parsed:
+        assert phone.display(raw) == f"{want_parsed[:4]} {want_parsed[4:8]} {want_parsed[8:]}"
+
+
+def test_equal_spellings_share_one_string(phone):
+    assert phone.parse_number("+888 1234 5678") is phone.parse_number("12345678")
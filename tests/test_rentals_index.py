@@ -0,0 +1,111 @@
+# (©) @Hybrid_Vamp - https://github.com/hybridvamp
+import asyncio
+
+import pytest
+
+pytest.importorskip("redis")
+pytest.importorskip("dotenv")
+pytest.importorskip("pyrogram")
+
+A = "+88800000001"
+B = "+88800000002"
+
+
+class _Pipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.keys = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def hgetall(self, key):
+        self.keys.append(key)
+
+    async def execute(self):
+        await asyncio.sleep(0.01)  # let writers run while the scan is in flight
+        return [dict(self.redis.hashes.get(key, {})) for key in self.keys]
+
+
+class _RentalsRedis:
+    """rentals:all + rental:{n} hashes, counting full scans."""
+
+    def __init__(self, numbers):
+        self.hashes = {}
+        self.scans = 0
+        for n in numbers:
+            self.rent(n, 1)
+
+    def rent(self, number, user_id):
+        self.hashes[f"rental:{number}"] = {"number": number, "user_id": str(user_id), "hours": "24"}
+
+    async def smembers(self, key):
+        self.scans += 1
+        await asyncio.sleep(0.01)
+        return [h["number"] for h in self.hashes.values()]
+
+    async def sismember(self, key, member):
+        return f"rental:{member}" in self.hashes
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def pipeline(self, transaction=False):
+        return _Pipeline(self)
+
+
+@pytest.fixture
+def index(db, monkeypatch):
+    redis = _RentalsRedis([A])
+    monkeypatch.setattr(db, "client", redis)
+    monkeypatch.setattr(db, "_rentals_by_number", {})
+    monkeypatch.setattr(db, "_rentals_by_user", {})
+    monkeypatch.setattr(db, "_rentals_index_ready", False)
+    monkeypatch.setattr(db, "_rentals_index_journal", None)
+    monkeypatch.setattr(db, "_rentals_index_lock", asyncio.Lock())
+    return redis
+
+
+def test_lookups_before_warm_share_one_scan(db, index):
+    async def main():
+        return await asyncio.gather(db.warm_rentals_index(), *[db.get_rental_doc(A) for _ in range(20)])
+
+    results = asyncio.run(main())
+    assert index.scans == 1
+    assert all(doc["user_id"] == 1 for doc in results[1:])
+
+
+def test_concurrent_resyncs_keep_writes_made_during_the_scan(db, index):
+    async def main():
+        await db.warm_rentals_index()
+        first = asyncio.create_task(db.resync_rentals_index())
+        second = asyncio.create_task(db.resync_rentals_index())
+        await asyncio.sleep(0.005)
+        # A rent lands while the first rebuild is scanning, the way the rent script + _index_put do it.
+        index.rent(B, 2)
+        db._index_put({"number": B, "user_id": 2, "hours": 24})
+        await asyncio.gather(first, second)
+        return await db.get_rental_doc(B)
+
+    doc = asyncio.run(main())
+    assert doc is not None and doc["user_id"] == 2
+    assert db._rentals_index_journal is None
+
+
+def test_get_number_data_sees_rentals_written_by_another_process(db, index):
+    async def main():
+        await db.warm_rentals_index()
+        assert await db.get_number_data(B) is None
+        index.rent(B, 2)  # another replica rents B; this process's index was never patched
+        rented = await db.get_number_data(B)
+        del index.hashes[f"rental:{A}"]  # ...and releases A
+        return rented, await db.get_number_data(A)
+
+    rented, released = asyncio.run(main())
+    assert rented is not None and rented["user_id"] == 2
+    assert db._rentals_by_number.get(B) is not None
+    assert released is None
+    assert A not in db._rentals_by_number